@@ -0,0 +1,88 @@
+# --- IMTIHON NATIJALARI ---
+# Natija brauzerda emas, serverda hisoblanadi: web app javoblarni yuboradi,
+# to'g'ri javoblar bazadan olinadi va urinish exam_attempts jadvaliga
+# yoziladi (faqat qo'shiladi, o'zgartirilmaydi). Imtihon oxirida bir vaqtda
+# kelgan yuzlab natijalar bitta tranzaksiyada yoziladi (group commit).
+
+import asyncio
+import logging
+
+import db
+
+log = logging.getLogger(__name__)
+
+EXAM_DURATION = 80 * 60
+
+
+def answer_letter(answer):
+    # "A", "a) ...", " B" -> "A"/"B" (web app ham xuddi shunday solishtiradi)
+    return (answer or "").strip()[:1].upper()
+
+
+def score_exam(questions, answers):
+    # questions: [{"id", "ans", ...}], answers: {question_id: "A"}
+    correct_answers = {q["id"]: answer_letter(q["ans"]) for q in questions}
+    correct = sum(1 for qid, letter in correct_answers.items()
+                  if answer_letter(answers.get(qid)) == letter)
+    return correct, correct_answers
+
+
+def format_duration(seconds):
+    h, rem = divmod(int(seconds), 3600)
+    m, s = divmod(rem, 60)
+    return f"{h:02d}:{m:02d}:{s:02d}" if h else f"{m:02d}:{s:02d}"
+
+
+class AttemptWriter:
+    def __init__(self, max_batch=200, max_delay=0.05):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.stats = {"written": 0, "batches": 0}
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            await self._queue.join()
+            self._task.cancel()
+            self._task = None
+
+    async def add(self, attempt):
+        # attempt: dict (db.insert_attempts ustunlari); yozilgan id qaytadi
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((attempt, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            # Qisqa vaqt kutib, shu paytda kelganlarni ham yig'amiz
+            deadline = asyncio.get_running_loop().time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                ids = await db.insert_attempts([a for a, _ in batch])
+                for (_, future), attempt_id in zip(batch, ids):
+                    if not future.done():
+                        future.set_result(attempt_id)
+                self.stats["written"] += len(batch)
+                self.stats["batches"] += 1
+            except Exception as e:
+                log.exception("Natijalarni yozishda xatolik")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
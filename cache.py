@@ -0,0 +1,90 @@
+# --- XOTIRADAGI KESH ---
+# Baza (savollar ro'yxati + nomi) o'zgarmas, shuning uchun har bir /get-tests
+# va sahifa ochilishida SQLite'ga borish shart emas. LRU + TTL + xotira limiti.
+
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    def __init__(self, max_bytes, ttl, sizeof=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof or (lambda value: 1)
+        self._data = OrderedDict()  # key -> (expires_at, size, value)
+        self._inflight = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _drop(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+        return entry
+
+    def peek(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            self._drop(key)
+            return None
+        self._data.move_to_end(key)
+        return entry[2]
+
+    def put(self, key, value):
+        self._drop(key)
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, size, value)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            old_key = next(iter(self._data))
+            self._drop(old_key)
+            self.evictions += 1
+
+    async def get(self, key, loader):
+        value = self.peek(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        # Bir vaqtda kelgan so'rovlar bitta yuklashni kutadi
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(loader(key))
+            self._inflight[key] = future
+            try:
+                value = await future
+            finally:
+                current = self._inflight.pop(key, None)
+            # Yuklash paytida invalidate() chaqirilgan bo'lsa, eskirgan qiymat saqlanmaydi
+            if current is future:
+                self.put(key, value)
+            return value
+        return await asyncio.shield(future)
+
+    def invalidate(self, key):
+        self._drop(key)
+        self._inflight.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+        self._inflight.clear()
+        self.bytes = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
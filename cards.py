@@ -0,0 +1,193 @@
+# --- NATIJA KARTOCHKALARI (RASM) ---
+# Inline ulashishda natija rasm sifatida yuboriladi. Rasm Pillow bilan
+# alohida jarayonda chiziladi (event loop band bo'lmaydi) va diskda
+# mazmun xeshi nomi bilan saqlanadi: bir xil (ball, jami, vaqt, baza)
+# uchun qayta chizilmaydi. Papka hajmi cheklangan, eng eski ishlatilgan
+# fayllar o'chiriladi. Papka barcha uvicorn workerlari uchun umumiy: hajm
+# hisobi har chizishdan keyin diskdan olinadi, "oxirgi ishlatilgan" - mtime.
+# CardCache main.lifespan da yaratiladi (import paytida emas). spawn qilingan jarayon yengil emas: u __main__ ni (main.py
+# va uning bog'liqliklari - aiogram, FastAPI, db ...) hamda shu modul bilan PIL ni
+# qayta import qiladi. Bot va server __name__ tekshiruvi ortida ishga tushmaydi,
+# lekin import narxi qoladi - shuning uchun pool oldindan isitiladi (CardCache.start).
+
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageDraw, ImageFont
+
+log = logging.getLogger(__name__)
+
+# Rasm shabloni o'zgarsa versiyani oshiring - eski fayllar ishlatilmaydi
+CARD_VERSION = 1
+CARD_SIZE = (800, 420)
+# Shundan eski .tmp fayllar - to'xtatilgan jarayondan qolgan (yangisini boshqa jarayon yozayotgan bo'lishi mumkin)
+STALE_TMP_SECONDS = 600
+FONT_PATHS = (
+    os.getenv("CARD_FONT", ""),
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf",
+)
+
+
+def card_key(correct, total, time_str, base_id, subject_name):
+    raw = f"{CARD_VERSION}\x00{correct}\x00{total}\x00{time_str}\x00{base_id}\x00{subject_name}"
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+
+def _font(size):
+    for path in FONT_PATHS:
+        if path and os.path.exists(path):
+            return ImageFont.truetype(path, size)
+    return ImageFont.load_default(size)
+
+
+def _fit(draw, text, size, width):
+    # Uzun fan nomi kartochkaga sig'guncha shrift kichraytiriladi, keyin qisqartiriladi
+    while size > 18:
+        font = _font(size)
+        if draw.textlength(text, font=font) <= width:
+            return text, font
+        size -= 4
+    font = _font(size)
+    while text and draw.textlength(text + "…", font=font) > width:
+        text = text[:-1]
+    return text + "…", font
+
+
+def render_card(path, correct, total, time_str, subject_name):
+    # Jarayonlar pool'ida ishlaydi; fayl avval vaqtinchalik nomga yoziladi
+    width, height = CARD_SIZE
+    percentage = round(correct / total * 100) if total else 0
+    color = (46, 160, 67) if percentage >= 80 else (230, 150, 30) if percentage >= 56 else (215, 58, 73)
+
+    image = Image.new("RGB", CARD_SIZE, (24, 28, 38))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, width, 12), fill=color)
+    draw.text((40, 40), "IMTIHON NATIJASI", font=_font(30), fill=(160, 170, 190))
+    subject, font = _fit(draw, subject_name, 40, width - 80)
+    draw.text((40, 85), subject, font=font, fill=(255, 255, 255))
+    draw.text((40, 160), f"{percentage}%", font=_font(120), fill=color)
+    stats_font = _font(34)
+    draw.text((440, 180), f"✓ {correct} / {total}", font=stats_font, fill=(255, 255, 255))
+    draw.text((440, 235), f"Vaqt: {time_str}", font=stats_font, fill=(255, 255, 255))
+    # Progress chizig'i
+    draw.rounded_rectangle((40, 330, width - 40, 350), radius=10, fill=(52, 58, 72))
+    if percentage:
+        draw.rounded_rectangle((40, 330, 40 + (width - 80) * percentage // 100, 350), radius=10, fill=color)
+    draw.text((40, 370), "@study_helperv3_bot", font=_font(24), fill=(160, 170, 190))
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    image.save(tmp, "JPEG", quality=85, optimize=True)
+    os.replace(tmp, path)
+    return os.path.getsize(path)
+
+
+class CardCache:
+    def __init__(self, directory, max_bytes, workers=1):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self._files = OrderedDict()  # nom -> hajm (eng eski ishlatilgan birinchi)
+        self._inflight = {}
+        self._pool = None
+        self.bytes = 0
+        self.stats = {"hits": 0, "rendered": 0, "evicted": 0, "errors": 0}
+
+    def open(self):
+        # Ishga tushganda (main.lifespan): eskirgan .tmp fayllar va mavjud fayllar hisobi
+        os.makedirs(self.directory, exist_ok=True)
+        stale = time.time() - STALE_TMP_SECONDS
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".tmp"):
+                try:
+                    if entry.stat().st_mtime < stale:
+                        os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+        self._files, _ = self._scan()
+        self.bytes = sum(self._files.values())
+
+    def start(self):
+        if self._pool is None:
+            # fork emas: asosiy jarayonda threadlar (SQLite pool) bor. spawn qilingan jarayon
+            # __main__ ni qayta import qiladi (main.py da ishga tushirish __name__ tekshiruvi ortida),
+            # shuning uchun pool oldindan isitiladi - birinchi kartochka bir necha soniya kutmaydi
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+            for _ in range(self.workers):
+                self._pool.submit(os.getpid)
+
+    def stop(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def get(self, correct, total, time_str, base_id, subject_name):
+        # Fayl nomi (static papkaga nisbatan) qaytadi
+        name = card_key(correct, total, time_str, base_id, subject_name) + ".jpg"
+        path = os.path.join(self.directory, name)
+        future = self._inflight.get(name)
+        if future is None:
+            try:
+                # Boshqa worker chizgan fayl ham (os.replace - chala fayl ko'rinmaydi)
+                os.utime(path)
+                if name in self._files:
+                    self._files.move_to_end(name)
+                self.stats["hits"] += 1
+                return name
+            except FileNotFoundError:
+                pass
+            self.start()
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._pool, render_card, path, correct, total, time_str, subject_name)
+            self._inflight[name] = future
+            try:
+                await future
+                self.stats["rendered"] += 1
+                await self._evict()
+            except Exception:
+                self.stats["errors"] += 1
+                raise
+            finally:
+                self._inflight.pop(name, None)
+            return name
+        await asyncio.shield(future)
+        return name
+
+    def info(self):
+        return {**self.stats, "files": len(self._files), "bytes": self.bytes, "max_bytes": self.max_bytes}
+
+    async def _evict(self):
+        # Boshqa jarayonlar ham shu papkaga yozadi: hisob har safar diskdan qayta olinadi
+        self._files, evicted = await asyncio.to_thread(self._scan, self.max_bytes)
+        self.bytes = sum(self._files.values())
+        self.stats["evicted"] += evicted
+
+    def _scan(self, max_bytes=None):
+        # (nom -> hajm, mtime bo'yicha eng eskisi birinchi; o'chirilganlar soni)
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".jpg"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        entries.sort()
+        total = sum(size for _, _, size in entries)
+        evicted = 0
+        while max_bytes is not None and total > max_bytes and len(entries) - evicted > 1:
+            _, old, size = entries[evicted]
+            total -= size
+            evicted += 1
+            try:
+                os.unlink(os.path.join(self.directory, old))
+            except FileNotFoundError:
+                pass
+        return OrderedDict((name, size) for _, name, size in entries[evicted:]), evicted
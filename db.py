@@ -0,0 +1,1078 @@
+# --- MA'LUMOTLAR BAZASI QATLAMI ---
+# Barcha SQLite so'rovlari shu yerda. Har bir so'rov funksiyasi birinchi
+# argument sifatida ulanishni (conn) oladi; @query dekoratori uni async
+# funksiyaga aylantiradi va pool'dagi alohida threadda ishga tushiradi,
+# shuning uchun aiogram polling va uvicorn event loop'i disk I/O kutib qolmaydi.
+
+import asyncio
+import functools
+import itertools
+import json
+import queue
+import re
+import sqlite3
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+import dedup
+import metrics
+import srs
+from parsing import APOSTROPHES, split_question
+
+POOL_SIZE = 4
+INSERT_BATCH = 500
+
+# Har bir yangi ulanish uchun sozlamalar
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=134217728",
+)
+
+
+# Apostrof variantlari qidiruv indeksida ham, so'rovda ham olib tashlanadi,
+# shunda "oʻzbek" va "o'zbek" bir xil topiladi
+def _sql_strip_apostrophes(expr):
+    for ch in APOSTROPHES:
+        expr = "replace({}, '{}', '')".format(expr, ch.replace("'", "''"))
+    return expr
+
+
+_APOSTROPHE_TABLE = {ord(ch): None for ch in APOSTROPHES}
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def fts_query(text):
+    # Har bir so'z prefiks bo'yicha qidiriladi: "poyt" -> "poyt"*
+    tokens = _TOKEN_RE.findall(text.translate(_APOSTROPHE_TABLE))
+    return " ".join(f'"{t}"*' for t in tokens)
+
+
+class ConnectionPool:
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._created = 0
+        self._lock = threading.Lock()
+        # Thread soni pool hajmiga teng: har bir ishchi uchun bitta ulanish bor
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="sqlite")
+
+    def _connect(self):
+        # cached_statements - sqlite3 modulining tayyorlangan so'rovlar keshi,
+        # bir xil SQL matni qayta kompilyatsiya qilinmaydi
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=256)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    conn = self._connect()
+            if conn is None:
+                conn = self._idle.get()
+        try:
+            yield conn
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def _call(self, fn, args, kwargs):
+        # Vaqt pool threadida o'lchanadi: navbatda kutish emas, so'rovning o'zi
+        started = time.perf_counter()
+        try:
+            with self.connection() as conn:
+                return fn(conn, *args, **kwargs)
+        except Exception as e:
+            metrics.db_errors.inc(query=fn.__name__, error=type(e).__name__)
+            raise
+        finally:
+            metrics.db_seconds.observe(time.perf_counter() - started, query=fn.__name__)
+
+    async def run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, fn, args, kwargs)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+
+
+def init(path, size=POOL_SIZE):
+    global _pool, _user_counts
+    _pool = ConnectionPool(path, size)
+    _user_counts = None
+    _settings_cache.clear()
+    _approval_cache.clear()
+    with _pool.connection() as conn:
+        init_schema(conn)
+    return _pool
+
+
+def is_open():
+    return _pool is not None
+
+
+def close():
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        _pool = None
+
+
+def _batched(iterable, size):
+    it = iter(iterable)
+    while batch := list(itertools.islice(it, size)):
+        yield batch
+
+
+def query(fn):
+    # Sinxron fn(conn, ...) -> await db.fn(...)
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await _pool.run(fn, *args, **kwargs)
+    wrapper.sync = fn
+    return wrapper
+
+
+def init_schema(conn):
+    cursor = conn.cursor()
+    # Bo'shagan sahifalarni qaytarish uchun (incremental_vacuum). Mavjud faylda
+    # rejimni almashtirish bir martalik to'liq VACUUM talab qiladi.
+    if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        cursor.execute("VACUUM")
+    cursor.execute('''CREATE TABLE IF NOT EXISTS test_bases (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        owner_id INTEGER,
+        created_at TIMESTAMP,
+        is_admin_base INTEGER DEFAULT 0,
+        is_ready INTEGER NOT NULL DEFAULT 1
+    )''')
+    # Yuklanayotgan baza (is_ready = 0) ro'yxat, sahifalar va qidiruvda ko'rinmaydi
+    if "is_ready" not in _columns(cursor, "test_bases"):
+        cursor.execute("ALTER TABLE test_bases ADD COLUMN is_ready INTEGER NOT NULL DEFAULT 1")
+    # Savol matni question_bodies da (bir xil savol bir marta); bu yerda faqat bazaga bog'lanish
+    cursor.execute('''CREATE TABLE IF NOT EXISTS questions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        base_id INTEGER,
+        body_id INTEGER,
+        FOREIGN KEY (base_id) REFERENCES test_bases(id) ON DELETE CASCADE
+    )''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS question_bodies (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        hash BLOB NOT NULL UNIQUE,
+        question_text TEXT,
+        full_text TEXT,
+        correct_answer TEXT,
+        stem TEXT,
+        options TEXT,
+        signature BLOB,
+        cluster_id INTEGER
+    )''')
+    # MinHash LSH: band kaliti -> savol (dedup.py)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS question_lsh (
+        key INTEGER NOT NULL,
+        body_id INTEGER NOT NULL,
+        PRIMARY KEY (key, body_id)
+    ) WITHOUT ROWID''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS users (
+        telegram_id INTEGER PRIMARY KEY,
+        full_name TEXT,
+        username TEXT,
+        phone_number TEXT,
+        is_approved INTEGER DEFAULT 0,
+        joined_at TIMESTAMP
+    )''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS settings (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )''')
+    # Umumiy kalit-qiymat (storage.SQLiteKV): FSM holati va keshlarni bekor qilish xabarlari
+    cursor.execute('''CREATE TABLE IF NOT EXISTS kv (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        expires_at REAL
+    ) WITHOUT ROWID''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_kv_expires ON kv(expires_at) WHERE expires_at IS NOT NULL")
+    # Imtihon urinishlari (faqat qo'shiladi)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS exam_attempts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        base_id INTEGER NOT NULL,
+        seed INTEGER,
+        correct INTEGER NOT NULL,
+        total INTEGER NOT NULL,
+        duration INTEGER,
+        answers TEXT,
+        created_at TIMESTAMP
+    )''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_attempts_user ON exam_attempts(user_id, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_attempts_base ON exam_attempts(base_id, id)")
+    # Yodlash rejimi: har bir (foydalanuvchi, savol) uchun SM-2 holati
+    cursor.execute('''CREATE TABLE IF NOT EXISTS reviews (
+        user_id INTEGER NOT NULL,
+        question_id INTEGER NOT NULL,
+        base_id INTEGER NOT NULL,
+        ease REAL NOT NULL,
+        interval INTEGER NOT NULL,
+        reps INTEGER NOT NULL,
+        lapses INTEGER NOT NULL DEFAULT 0,
+        due REAL NOT NULL,
+        PRIMARY KEY (user_id, question_id)
+    ) WITHOUT ROWID''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reviews_due ON reviews(user_id, base_id, due)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_questions_base ON questions(base_id)")
+    # Muddati o'tgan oddiy bazalarni topish uchun
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_test_bases_expiry ON test_bases(created_at) "
+                   "WHERE is_admin_base = 0")
+    # Foreign key'lar ilgari yoqilmagan edi: o'chirilgan bazalardan qolgan savollar
+    cursor.execute("DELETE FROM questions WHERE base_id NOT IN (SELECT id FROM test_bases)")
+    migrate_parsed_questions(cursor)
+    migrate_question_bodies(cursor)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_questions_body ON questions(body_id)")
+    # Bazaga cheklangan qidiruv: (base_id, body_id) + rowid - jadvalga murojaatsiz
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_questions_base_body ON questions(base_id, body_id)")
+    init_search_index(cursor)
+    init_attempt_stats(cursor)
+    migrate_body_hashes(cursor)
+    # Default sozlamalar
+    cursor.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('auto_approve', '0')")
+    conn.commit()
+
+
+def _columns(cursor, table):
+    return {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+
+
+def migrate_parsed_questions(cursor):
+    # stem/options ustunlari: savol matni va variantlar (JSON, {"A": ..., "E": ...})
+    columns = _columns(cursor, "questions")
+    if "full_text" not in columns:
+        # Yangi sxema: matn question_bodies da
+        return
+    if "stem" not in columns:
+        cursor.execute("ALTER TABLE questions ADD COLUMN stem TEXT")
+    if "options" not in columns:
+        cursor.execute("ALTER TABLE questions ADD COLUMN options TEXT")
+    # Eski savollarni bir marta parse qilib yozib qo'yish
+    rows = cursor.execute("SELECT id, full_text FROM questions WHERE stem IS NULL").fetchall()
+    updates = []
+    for qid, full_text in rows:
+        stem, options = split_question(full_text or "")
+        updates.append((stem, json.dumps(options, ensure_ascii=False), qid))
+    cursor.executemany("UPDATE questions SET stem = ?, options = ? WHERE id = ?", updates)
+
+
+def migrate_question_bodies(cursor):
+    # Eski sxemada matn har bir bazada alohida saqlangan: bir marta question_bodies
+    # ga ko'chiriladi (takrorlar birlashadi), eski ustunlar bo'shatiladi
+    columns = _columns(cursor, "questions")
+    if "body_id" not in columns:
+        cursor.execute("ALTER TABLE questions ADD COLUMN body_id INTEGER")
+    if "full_text" not in columns:
+        return
+    # Qidiruv indeksi endi question_bodies bo'yicha (init_search_index qayta quradi)
+    for trigger in ("questions_fts_ai", "questions_fts_ad", "questions_fts_au"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    if "questions_fts" in _tables(cursor) and not _trigger_exists(cursor, "bodies_fts_ai"):
+        cursor.execute("DROP TABLE questions_fts")
+    rows = cursor.execute('''SELECT id, question_text, full_text, correct_answer, stem, options
+                             FROM questions WHERE body_id IS NULL''').fetchall()
+    stats = {"duplicates": 0, "near_duplicates": 0}
+    for qid, question_text, full_text, answer, stem, options in rows:
+        body_id = _body_id(cursor, {"q": question_text, "full": full_text or "", "ans": answer,
+                                    "stem": stem, "options": json.loads(options or "{}")}, stats)
+        cursor.execute('''UPDATE questions SET body_id = ?, question_text = NULL, full_text = NULL,
+                          correct_answer = NULL, stem = NULL, options = NULL WHERE id = ?''', (body_id, qid))
+
+
+def migrate_body_hashes(cursor):
+    # dedup.content_hash o'zgarganda mavjud matnlar xeshi qayta hisoblanadi. Yangi xesh
+    # eskisidan aniqroq (farqli matnlar farqli qoladi), shuning uchun UNIQUE buzilmaydi
+    row = cursor.execute("SELECT value FROM settings WHERE key = 'body_hash_version'").fetchone()
+    if row and row[0] == str(dedup.HASH_VERSION):
+        return
+    rows = cursor.execute("SELECT id, full_text, correct_answer FROM question_bodies").fetchall()
+    cursor.executemany("UPDATE question_bodies SET hash = ? WHERE id = ?",
+                       [(dedup.content_hash(full_text, answer), body_id) for body_id, full_text, answer in rows])
+    cursor.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('body_hash_version', ?)",
+                   (str(dedup.HASH_VERSION),))
+
+
+def _trigger_exists(cursor, name):
+    return cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,)).fetchone()
+
+
+def init_attempt_stats(cursor):
+    # Statistika jadvallari har bir urinish yozilganda o'sha tranzaksiyada
+    # yangilanadi; so'rovlar exam_attempts ni to'liq o'qimaydi
+    created = "base_stats" not in _tables(cursor)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS base_stats (
+        base_id INTEGER PRIMARY KEY,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        sum_correct INTEGER NOT NULL DEFAULT 0,
+        sum_total INTEGER NOT NULL DEFAULT 0,
+        sum_duration INTEGER NOT NULL DEFAULT 0
+    )''')
+    # Har bir savol necha marta tushgan va necha marta xato qilingan
+    cursor.execute('''CREATE TABLE IF NOT EXISTS question_stats (
+        question_id INTEGER PRIMARY KEY,
+        base_id INTEGER NOT NULL,
+        seen INTEGER NOT NULL DEFAULT 0,
+        missed INTEGER NOT NULL DEFAULT 0
+    )''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_question_stats_base ON question_stats(base_id)")
+    # Vaqt taqsimoti (DURATION_BUCKET soniyali oraliqlar) - persentillar shundan
+    cursor.execute('''CREATE TABLE IF NOT EXISTS duration_hist (
+        base_id INTEGER NOT NULL,
+        bucket INTEGER NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (base_id, bucket)
+    ) WITHOUT ROWID''')
+    # Har bir foydalanuvchining shu bazadagi eng yaxshi natijasi
+    cursor.execute('''CREATE TABLE IF NOT EXISTS leaderboard (
+        base_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        score REAL NOT NULL,
+        correct INTEGER NOT NULL,
+        total INTEGER NOT NULL,
+        duration INTEGER NOT NULL,
+        attempt_id INTEGER NOT NULL,
+        PRIMARY KEY (base_id, user_id)
+    ) WITHOUT ROWID''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_leaderboard_rank ON leaderboard(base_id, score DESC, duration)")
+    if created:
+        # Jadvallardan oldin yozilgan urinishlar bir marta qayta hisoblanadi
+        rows = cursor.execute("SELECT id, user_id, base_id, correct, total, duration, answers FROM exam_attempts")
+        for attempt_id, user_id, base_id, correct, total, duration, answers in rows.fetchall():
+            answers = {int(k): v for k, v in json.loads(answers or "{}").items()}
+            correct_answers = dict(cursor.execute(
+                f"SELECT q.id, b.correct_answer FROM questions q JOIN question_bodies b ON b.id = q.body_id "
+                f"WHERE q.id IN ({','.join('?' * len(answers))})",
+                list(answers)).fetchall()) if answers else {}
+            missed = [qid for qid, letter in answers.items()
+                      if qid in correct_answers and (correct_answers[qid] or "").strip()[:1].upper() != letter]
+            _record_attempt_stats(cursor, attempt_id, {
+                "user_id": user_id, "base_id": base_id, "correct": correct, "total": total,
+                "duration": duration or 0, "answers": answers, "missed": missed,
+            })
+
+
+def _tables(cursor):
+    return {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def init_search_index(cursor):
+    # Contentless FTS5 jadvali: matn question_bodies jadvalida, bu yerda faqat indeks
+    # (rowid = body id, takror savol indeksga bir marta tushadi). Triggerlar savol
+    # qo'shilganda/o'chirilganda indeksni sinxron ushlab turadi.
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'questions_fts'").fetchone()
+    cursor.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+        full_text, content='', prefix='2 3', tokenize="unicode61 remove_diacritics 2"
+    )''')
+    new_text = _sql_strip_apostrophes("new.full_text")
+    old_text = _sql_strip_apostrophes("old.full_text")
+    cursor.execute(f'''CREATE TRIGGER IF NOT EXISTS bodies_fts_ai AFTER INSERT ON question_bodies BEGIN
+        INSERT INTO questions_fts (rowid, full_text) VALUES (new.id, {new_text});
+    END''')
+    cursor.execute(f'''CREATE TRIGGER IF NOT EXISTS bodies_fts_ad AFTER DELETE ON question_bodies BEGIN
+        INSERT INTO questions_fts (questions_fts, rowid, full_text) VALUES ('delete', old.id, {old_text});
+    END''')
+    if not exists:
+        # Mavjud savollarni bir marta indekslash
+        cursor.execute(f"INSERT INTO questions_fts (rowid, full_text) "
+                       f"SELECT id, {_sql_strip_apostrophes('full_text')} FROM question_bodies")
+
+
+# --- sozlamalar ---
+# Sozlamalar va foydalanuvchilarning ruxsat holati xotirada saqlanadi.
+# Yozish funksiyalari keshni ham yangilaydi (write-through), shuning uchun
+# /start va approval middleware'da har safar SQLite'ga murojaat qilinmaydi.
+_settings_cache = {}
+_approval_cache = {}  # telegram_id -> is_approved (None - ro'yxatdan o'tmagan)
+
+
+@query
+def _load_setting(conn, key):
+    res = conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+    return res[0] if res else None
+
+
+async def get_setting(key, default=None):
+    if key not in _settings_cache:
+        _settings_cache.setdefault(key, await _load_setting(key))
+    value = _settings_cache[key]
+    return default if value is None else value
+
+
+@query
+def set_setting(conn, key, value):
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, str(value)))
+    _settings_cache[key] = str(value)
+
+
+def forget_setting(key):
+    # Boshqa jarayon sozlamani o'zgartirdi: keyingi get_setting bazadan o'qiydi
+    _settings_cache.pop(key, None)
+
+
+# --- kalit-qiymat (storage.SQLiteKV) ---
+# Muddati o'tgan yozuvlar o'qishda ko'rinmaydi, purge_kv ularni fon vazifasida o'chiradi
+
+@query
+def kv_get(conn, key):
+    res = conn.execute("SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                       (key, time.time())).fetchone()
+    return res[0] if res else None
+
+
+@query
+def kv_set(conn, key, value, ttl=None):
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                     (key, value, time.time() + ttl if ttl else None))
+
+
+@query
+def kv_delete(conn, keys):
+    with conn:
+        conn.executemany("DELETE FROM kv WHERE key = ?", [(k,) for k in keys])
+
+
+@query
+def kv_take(conn, key):
+    # O'qish va o'chirish bitta so'rovda: bir martalik tokenni ikki jarayon ham ola olmaydi
+    with conn:
+        res = conn.execute("DELETE FROM kv WHERE key = ? RETURNING value, expires_at", (key,)).fetchone()
+    return res[0] if res and (res[1] is None or res[1] > time.time()) else None
+
+
+@query
+def kv_incr(conn, key):
+    with conn:
+        return conn.execute('''INSERT INTO kv (key, value) VALUES (?, '1')
+                               ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+                               RETURNING CAST(value AS INTEGER)''', (key,)).fetchone()[0]
+
+
+@query
+def purge_kv(conn, limit=5000):
+    with conn:
+        return conn.execute('''DELETE FROM kv WHERE key IN (
+                                   SELECT key FROM kv WHERE expires_at <= ? LIMIT ?)''',
+                            (time.time(), limit)).rowcount
+
+
+# --- foydalanuvchilar ---
+# Admin panel statistikasi (jami / ruxsat berilgan) har safar COUNT(*) bilan
+# hisoblanmaydi: birinchi marta o'qiladi, keyin yozish funksiyalari uni
+# o'zgartiradi. Qulf yozish tranzaksiyasi va hisoblagichni birga o'raydi.
+_user_counts = None
+_user_counts_lock = threading.Lock()
+
+
+def _adjust_user_counts(total=0, approved=0):
+    if _user_counts is not None:
+        _user_counts[0] += total
+        _user_counts[1] += approved
+
+
+@query
+def _load_approval(conn, telegram_id):
+    res = conn.execute("SELECT is_approved FROM users WHERE telegram_id = ?", (telegram_id,)).fetchone()
+    return res[0] if res else None
+
+
+async def get_approval(telegram_id):
+    if telegram_id not in _approval_cache:
+        # Yuklash paytida yozish bo'lgan bo'lsa, o'sha yangi qiymat qoladi
+        _approval_cache.setdefault(telegram_id, await _load_approval(telegram_id))
+    return _approval_cache[telegram_id]
+
+
+def forget_user(telegram_id=None):
+    # Boshqa jarayon ruxsatni o'zgartirdi (None - hammasi): holat va hisoblagich qayta o'qiladi
+    global _user_counts
+    if telegram_id is None:
+        _approval_cache.clear()
+    else:
+        _approval_cache.pop(telegram_id, None)
+    with _user_counts_lock:
+        _user_counts = None
+
+
+@query
+def get_user(conn, telegram_id):
+    return conn.execute("SELECT * FROM users WHERE telegram_id = ?", (telegram_id,)).fetchone()
+
+
+@query
+def upsert_user(conn, user_id, full_name, username, is_approved=0):
+    with _user_counts_lock, conn:
+        exists = conn.execute("SELECT 1 FROM users WHERE telegram_id = ?", (user_id,)).fetchone()
+        # Mavjud foydalanuvchining is_approved va joined_at qiymatlari saqlanadi
+        conn.execute('''INSERT INTO users (telegram_id, full_name, username, is_approved, joined_at)
+                        VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT(telegram_id) DO UPDATE SET
+                            full_name = excluded.full_name,
+                            username = excluded.username''',
+                     (user_id, full_name, username, is_approved, datetime.now().isoformat()))
+        if not exists:
+            _adjust_user_counts(total=1, approved=int(is_approved == 1))
+            _approval_cache[user_id] = is_approved
+
+
+@query
+def set_approval(conn, telegram_id, status):
+    with _user_counts_lock, conn:
+        old = conn.execute("SELECT is_approved FROM users WHERE telegram_id = ?", (telegram_id,)).fetchone()
+        conn.execute("UPDATE users SET is_approved = ? WHERE telegram_id = ?", (status, telegram_id))
+        if old is not None:
+            _adjust_user_counts(approved=int(status == 1) - int(old[0] == 1))
+            _approval_cache[telegram_id] = status
+
+
+@query
+def set_all_approval(conn, status, except_id=None):
+    # Holati haqiqatan o'zgargan foydalanuvchilar qaytariladi (xabar yuborish uchun)
+    with _user_counts_lock, conn:
+        rows = conn.execute(
+            "SELECT telegram_id, is_approved FROM users WHERE is_approved != ? AND telegram_id IS NOT ?",
+            (status, except_id)).fetchall()
+        conn.execute("UPDATE users SET is_approved = ? WHERE telegram_id IS NOT ?", (status, except_id))
+        _adjust_user_counts(approved=sum(int(status == 1) - int(old == 1) for _, old in rows))
+        for telegram_id, _ in rows:
+            _approval_cache[telegram_id] = status
+    return [r[0] for r in rows]
+
+
+@query
+def users_page(conn, after_id=None, before_id=None, limit=20):
+    # Keyset pagination: OFFSET o'rniga telegram_id bo'yicha davom etamiz
+    if before_id is not None:
+        rows = conn.execute('''SELECT telegram_id, full_name, is_approved FROM users
+                               WHERE telegram_id < ? ORDER BY telegram_id DESC LIMIT ?''',
+                            (before_id, limit + 1)).fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit][::-1]
+        return rows, has_more, True
+    rows = conn.execute('''SELECT telegram_id, full_name, is_approved FROM users
+                           WHERE telegram_id > ? ORDER BY telegram_id LIMIT ?''',
+                        (after_id if after_id is not None else -2**63, limit + 1)).fetchall()
+    has_more = len(rows) > limit
+    return rows[:limit], after_id is not None, has_more
+
+
+@query
+def search_users(conn, text, limit=20):
+    text = text.strip().lstrip("@")
+    if text.isdigit():
+        return conn.execute("SELECT telegram_id, full_name, is_approved FROM users WHERE telegram_id = ?",
+                            (int(text),)).fetchall()
+    pattern = f"%{text}%"
+    return conn.execute('''SELECT telegram_id, full_name, is_approved FROM users
+                           WHERE full_name LIKE ? OR username LIKE ? ORDER BY telegram_id LIMIT ?''',
+                        (pattern, pattern, limit)).fetchall()
+
+
+@query
+def count_users(conn):
+    global _user_counts
+    with _user_counts_lock:
+        if _user_counts is None:
+            total, approved = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(is_approved = 1), 0) FROM users").fetchone()
+            _user_counts = [total, approved]
+        return tuple(_user_counts)
+
+
+# --- bazalar va savollar ---
+
+@query
+def create_base(conn, name, owner_id, is_admin, tests, progress=None, on_created=None):
+    # tests - generator bo'lishi mumkin: savollar INSERT_BATCH tadan o'qilib,
+    # har bir partiya alohida tranzaksiyada yoziladi (yozish qulfi uzoq ushlanmaydi).
+    # Baza yashirin (is_ready = 0) yaratiladi va oxirgi partiya bilan birga ko'rinadi;
+    # on_created(base_id) - xatoda chaqiruvchi keshlarni tozalashi uchun
+    batches = _batched(tests, INSERT_BATCH)
+    first = next(batches, None)
+    if not first:
+        return None, 0, {}
+    with conn:
+        cursor = conn.execute(
+            "INSERT INTO test_bases (name, owner_id, created_at, is_admin_base, is_ready) VALUES (?, ?, ?, ?, 0)",
+            (name, owner_id, datetime.now().isoformat(), is_admin))
+        base_id = cursor.lastrowid
+    if on_created:
+        on_created(base_id)
+    count = 0
+    # duplicates - matni boshqa bazada (yoki shu faylda) bor, near_duplicates - deyarli bir xil
+    stats = {"duplicates": 0, "near_duplicates": 0}
+    try:
+        batch = first
+        while batch:
+            # Keyingi partiya oldindan o'qiladi: shu partiya oxirgimi - bilish uchun
+            following = next(batches, None)
+            # Xesh va MinHash yozish tranzaksiyasidan oldin hisoblanadi (qulf qisqa ushlanadi)
+            fingerprints = _fingerprints(conn, batch)
+            with conn:
+                # Yozish qulfi darhol olinadi: parallel yuklashda _body_id dagi o'qishdan keyin
+                # qulfni "ko'tarish" SQLITE_BUSY beradi (busy_timeout kutmaydi)
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany("INSERT INTO questions (base_id, body_id) VALUES (?, ?)",
+                                 [(base_id, _body_id(conn, t, stats, fp)) for t, fp in zip(batch, fingerprints)])
+                if following is None:
+                    conn.execute("UPDATE test_bases SET is_ready = 1 WHERE id = ?", (base_id,))
+            count += len(batch)
+            if progress:
+                progress(count)
+            batch = following
+    except Exception:
+        # Chala yozilgan bazani qoldirmaymiz
+        delete_base.sync(conn, base_id)
+        raise
+    return base_id, count, stats
+
+
+def _fingerprints(conn, batch):
+    # [(xesh, imzo)]; bazada allaqachon bor savollar uchun imzo hisoblanmaydi (None)
+    digests = [dedup.content_hash(t['full'], t['ans']) for t in batch]
+    known = {r[0] for r in conn.execute(
+        f"SELECT hash FROM question_bodies WHERE hash IN ({','.join('?' * len(digests))})", digests)}
+    return [(d, None if d in known else dedup.signature(t['full'])) for t, d in zip(batch, digests)]
+
+
+def _body_id(conn, t, stats, fingerprint=None):
+    # Bir xil savol (normallashtirilgan matn + javob) bo'lsa mavjud matn qayta ishlatiladi
+    digest, sig = fingerprint or (dedup.content_hash(t['full'], t['ans']), None)
+    row = conn.execute("SELECT id FROM question_bodies WHERE hash = ?", (digest,)).fetchone()
+    if row:
+        stats["duplicates"] += 1
+        return row[0]
+    sig = sig or dedup.signature(t['full'])
+    keys = dedup.lsh_keys(sig)
+    # Deyarli bir xil savollar bitta klasterga yoziladi (qidiruvda bittasi ko'rsatiladi)
+    cluster_id = None
+    candidates = conn.execute(
+        f'''SELECT DISTINCT b.id, b.signature, b.cluster_id FROM question_lsh l
+            JOIN question_bodies b ON b.id = l.body_id
+            WHERE l.key IN ({",".join("?" * len(keys))}) LIMIT 50''', keys)
+    for candidate_id, candidate_sig, candidate_cluster in candidates:
+        if dedup.similarity(sig, dedup.unpack(candidate_sig)) >= dedup.NEAR_DUP_THRESHOLD:
+            cluster_id = candidate_cluster or candidate_id
+            stats["near_duplicates"] += 1
+            break
+    cursor = conn.execute(
+        '''INSERT INTO question_bodies (hash, question_text, full_text, correct_answer, stem, options,
+                                        signature, cluster_id)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+        (digest, t['q'], t['full'], t['ans'], t['stem'], json.dumps(t['options'], ensure_ascii=False),
+         dedup.pack(sig), cluster_id))
+    body_id = cursor.lastrowid
+    conn.executemany("INSERT OR IGNORE INTO question_lsh (key, body_id) VALUES (?, ?)",
+                     [(key, body_id) for key in keys])
+    return body_id
+
+
+def _delete_unused_bodies(conn, body_ids):
+    # Boshqa bazada ishlatilmayotgan matnlar o'chiriladi (trigger FTS dan ham oladi)
+    for batch in _batched(body_ids, INSERT_BATCH):
+        placeholders = ",".join("?" * len(batch))
+        unused = conn.execute(
+            f'''SELECT id, signature FROM question_bodies b WHERE id IN ({placeholders})
+                AND NOT EXISTS (SELECT 1 FROM questions q WHERE q.body_id = b.id)''', batch).fetchall()
+        if not unused:
+            continue
+        conn.executemany("DELETE FROM question_lsh WHERE key = ? AND body_id = ?",
+                         [(key, body_id) for body_id, sig in unused for key in dedup.lsh_keys(dedup.unpack(sig))])
+        conn.executemany("DELETE FROM question_bodies WHERE id = ?", [(body_id,) for body_id, _ in unused])
+
+
+@query
+def list_bases(conn):
+    return conn.execute("SELECT id, name, is_admin_base FROM test_bases WHERE is_ready = 1").fetchall()
+
+
+@query
+def expire_bases(conn, older_than, limit=50):
+    # Bir chaqiruvda ko'pi bilan `limit` ta baza: yozish qulfi qisqa ushlanadi
+    # Yuklash paytida to'xtagan jarayondan qolgan yashirin bazalar ham (admin bazasi bo'lsa ham)
+    expired = [r[0] for r in conn.execute(
+        '''SELECT id FROM test_bases WHERE is_admin_base = 0 AND created_at < ?
+           UNION SELECT id FROM test_bases WHERE is_ready = 0 AND created_at < ? LIMIT ?''',
+        (older_than, older_than, limit))]
+    if not expired:
+        return [], 0
+    placeholders = ",".join("?" * len(expired))
+    with conn:
+        # Savollar shu tranzaksiyada o'chiriladi; boshqa bazada yo'q matnlar ham
+        body_ids = [r[0] for r in conn.execute(
+            f"SELECT DISTINCT body_id FROM questions WHERE base_id IN ({placeholders})", expired)]
+        deleted = conn.execute(f"DELETE FROM questions WHERE base_id IN ({placeholders})", expired).rowcount
+        _delete_unused_bodies(conn, body_ids)
+        conn.execute(f"DELETE FROM test_bases WHERE id IN ({placeholders})", expired)
+        _delete_base_rows(conn, expired)
+    return expired, deleted
+
+
+@query
+def incremental_vacuum(conn, pages=2000):
+    before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    # execute() pragma'ni faqat bir qadam bajaradi (1 sahifa); executescript oxirigacha
+    conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+    after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return before - after
+
+
+@query
+def get_base_name(conn, base_id):
+    res = conn.execute("SELECT name FROM test_bases WHERE id = ? AND is_ready = 1", (base_id,)).fetchone()
+    return res[0] if res else None
+
+
+@query
+def delete_base(conn, base_id):
+    with conn:
+        body_ids = [r[0] for r in conn.execute("SELECT DISTINCT body_id FROM questions WHERE base_id = ?",
+                                               (base_id,))]
+        conn.execute("DELETE FROM questions WHERE base_id = ?", (base_id,))
+        _delete_unused_bodies(conn, body_ids)
+        conn.execute("DELETE FROM test_bases WHERE id = ?", (base_id,))
+        _delete_base_rows(conn, [base_id])
+
+
+@query
+def get_base(conn, base_id):
+    # Nomi va savollari bitta chaqiruvda (kesh uchun); yo'q yoki hali yuklanayotgan baza - (None, [])
+    name = get_base_name.sync(conn, base_id)
+    if name is None:
+        return None, []
+    return name, get_base_questions.sync(conn, base_id)
+
+
+@query
+def get_base_meta(conn, base_id):
+    # idx_questions_base indeksida id ham bor, jadvalning o'ziga murojaat qilinmaydi
+    name = get_base_name.sync(conn, base_id)
+    if name is None:
+        return None, []
+    ids = [r[0] for r in conn.execute("SELECT id FROM questions WHERE base_id = ? ORDER BY id", (base_id,))]
+    return name, ids
+
+
+QUESTION_COLUMNS = "q.id, b.stem, b.options, b.correct_answer"
+
+
+@query
+def get_base_questions(conn, base_id):
+    return conn.execute(f'''SELECT {QUESTION_COLUMNS} FROM questions q JOIN question_bodies b ON b.id = q.body_id
+                            WHERE q.base_id = ? ORDER BY q.id''', (base_id,)).fetchall()
+
+
+@query
+def get_questions_by_ids(conn, ids):
+    if not ids:
+        return []
+    placeholders = ",".join("?" * len(ids))
+    return conn.execute(f'''SELECT {QUESTION_COLUMNS} FROM questions q JOIN question_bodies b ON b.id = q.body_id
+                            WHERE q.id IN ({placeholders})''', list(ids)).fetchall()
+
+
+# --- imtihon urinishlari ---
+
+ATTEMPT_COLUMNS = "id, user_id, base_id, seed, correct, total, duration, created_at"
+
+
+@query
+def insert_attempts(conn, attempts):
+    # Bir nechta urinish bitta tranzaksiyada; har biriga id qaytariladi
+    ids = []
+    created_at = datetime.now().isoformat()
+    with conn:
+        for a in attempts:
+            cursor = conn.execute(
+                "INSERT INTO exam_attempts (user_id, base_id, seed, correct, total, duration, answers, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (a["user_id"], a["base_id"], a["seed"], a["correct"], a["total"], a["duration"],
+                 json.dumps(a["answers"]), created_at))
+            ids.append(cursor.lastrowid)
+            _record_attempt_stats(conn, cursor.lastrowid, a)
+    return ids
+
+
+@query
+def get_attempt(conn, attempt_id):
+    return conn.execute(f"SELECT {ATTEMPT_COLUMNS} FROM exam_attempts WHERE id = ?", (attempt_id,)).fetchone()
+
+
+@query
+def list_attempts(conn, user_id=None, base_id=None, before_id=None, limit=20):
+    # Keyset: eng yangilari birinchi; keyingi sahifa uchun before_id = oxirgi id
+    where, params = [], []
+    if user_id is not None:
+        where.append("user_id = ?")
+        params.append(user_id)
+    if base_id is not None:
+        where.append("base_id = ?")
+        params.append(base_id)
+    if before_id is not None:
+        where.append("id < ?")
+        params.append(before_id)
+    sql = f"SELECT {ATTEMPT_COLUMNS} FROM exam_attempts"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id DESC LIMIT ?"
+    return conn.execute(sql, params + [limit]).fetchall()
+
+
+# --- statistika (insert_attempts bilan birga yangilanadi) ---
+
+DURATION_BUCKET = 30
+
+
+def _record_attempt_stats(conn, attempt_id, a):
+    # a["answers"]: {savol_id: harf} - imtihonda chiqqan barcha savollar, a["missed"]: xato qilinganlari
+    base_id, duration = a["base_id"], a["duration"]
+    conn.execute('''INSERT INTO base_stats (base_id, attempts, sum_correct, sum_total, sum_duration)
+                    VALUES (?, 1, ?, ?, ?)
+                    ON CONFLICT(base_id) DO UPDATE SET
+                        attempts = attempts + 1,
+                        sum_correct = sum_correct + excluded.sum_correct,
+                        sum_total = sum_total + excluded.sum_total,
+                        sum_duration = sum_duration + excluded.sum_duration''',
+                 (base_id, a["correct"], a["total"], duration))
+    conn.execute('''INSERT INTO duration_hist (base_id, bucket, count) VALUES (?, ?, 1)
+                    ON CONFLICT(base_id, bucket) DO UPDATE SET count = count + 1''',
+                 (base_id, duration // DURATION_BUCKET))
+    missed = set(a["missed"])
+    conn.executemany('''INSERT INTO question_stats (question_id, base_id, seen, missed) VALUES (?, ?, 1, ?)
+                        ON CONFLICT(question_id) DO UPDATE SET
+                            seen = seen + 1, missed = missed + excluded.missed''',
+                     [(int(qid), base_id, int(int(qid) in missed)) for qid in a["answers"]])
+    # Yangi natija faqat yaxshiroq bo'lsa (teng ball - tezroq) eng yaxshisi o'rnini egallaydi
+    score = a["correct"] / a["total"] if a["total"] else 0
+    conn.execute('''INSERT INTO leaderboard (base_id, user_id, score, correct, total, duration, attempt_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(base_id, user_id) DO UPDATE SET
+                        score = excluded.score, correct = excluded.correct, total = excluded.total,
+                        duration = excluded.duration, attempt_id = excluded.attempt_id
+                    WHERE excluded.score > leaderboard.score
+                       OR (excluded.score = leaderboard.score AND excluded.duration < leaderboard.duration)''',
+                 (base_id, a["user_id"], score, a["correct"], a["total"], duration, attempt_id))
+
+
+def _delete_base_rows(conn, base_ids):
+    placeholders = ",".join("?" * len(base_ids))
+    for table in ("base_stats", "question_stats", "duration_hist", "leaderboard", "reviews"):
+        conn.execute(f"DELETE FROM {table} WHERE base_id IN ({placeholders})", list(base_ids))
+
+
+def _percentiles(hist, total, points):
+    # hist: [(bucket, count)] tartiblangan; oraliqning yuqori chegarasi qaytadi
+    result, seen, i = {}, 0, 0
+    for p in points:
+        target = total * p / 100
+        while i < len(hist) and seen + hist[i][1] < target:
+            seen += hist[i][1]
+            i += 1
+        bucket = hist[min(i, len(hist) - 1)][0]
+        result[f"p{p}"] = (bucket + 1) * DURATION_BUCKET
+    return result
+
+
+@query
+def get_base_stats(conn, base_id, top=10, hardest=10):
+    row = conn.execute("SELECT attempts, sum_correct, sum_total, sum_duration FROM base_stats WHERE base_id = ?",
+                       (base_id,)).fetchone()
+    if not row or not row[0]:
+        return None
+    attempts, sum_correct, sum_total, sum_duration = row
+    hist = conn.execute("SELECT bucket, count FROM duration_hist WHERE base_id = ? ORDER BY bucket",
+                        (base_id,)).fetchall()
+    leaders = conn.execute('''SELECT l.user_id, u.full_name, l.correct, l.total, l.duration, l.attempt_id
+                              FROM leaderboard l LEFT JOIN users u ON u.telegram_id = l.user_id
+                              WHERE l.base_id = ? ORDER BY l.score DESC, l.duration LIMIT ?''',
+                           (base_id, top)).fetchall()
+    hard = conn.execute('''SELECT s.question_id, b.question_text, s.seen, s.missed
+                           FROM question_stats s JOIN questions q ON q.id = s.question_id
+                           JOIN question_bodies b ON b.id = q.body_id
+                           WHERE s.base_id = ? AND s.missed > 0
+                           ORDER BY s.missed * 1.0 / s.seen DESC, s.seen DESC LIMIT ?''',
+                        (base_id, hardest)).fetchall()
+    return {
+        "attempts": attempts,
+        "mean_correct": round(sum_correct / attempts, 2),
+        "mean_score": round(sum_correct * 100 / sum_total, 1) if sum_total else 0,
+        "mean_duration": round(sum_duration / attempts),
+        "duration_percentiles": _percentiles(hist, attempts, (50, 90, 95)),
+        "leaderboard": [
+            {"user_id": r[0], "name": r[1], "correct": r[2], "total": r[3], "duration": r[4], "attempt_id": r[5]}
+            for r in leaders
+        ],
+        "hardest": [
+            {"question_id": r[0], "question": r[1], "seen": r[2], "missed": r[3],
+             "miss_rate": round(r[3] / r[2], 3)}
+            for r in hard
+        ],
+    }
+
+
+# --- takrorlash (srs.py) ---
+
+@query
+def review_batch(conn, user_id, base_id, limit=20, now=None):
+    # Avval vaqti kelganlar (eng eskisi birinchi), joy qolsa hali ko'rilmagan savollar
+    if get_base_name.sync(conn, base_id) is None:
+        return [], [], 0
+    now = now or time.time()
+    due_ids = [r[0] for r in conn.execute(
+        "SELECT question_id FROM reviews WHERE user_id = ? AND base_id = ? AND due <= ? ORDER BY due LIMIT ?",
+        (user_id, base_id, now, limit))]
+    due_total = conn.execute("SELECT count(*) FROM reviews WHERE user_id = ? AND base_id = ? AND due <= ?",
+                             (user_id, base_id, now)).fetchone()[0]
+    new_ids = []
+    if len(due_ids) < limit:
+        new_ids = [r[0] for r in conn.execute(
+            '''SELECT id FROM questions WHERE base_id = ? AND id NOT IN
+                   (SELECT question_id FROM reviews WHERE user_id = ? AND base_id = ?)
+               ORDER BY id LIMIT ?''',
+            (base_id, user_id, base_id, limit - len(due_ids)))]
+    return due_ids, new_ids, due_total
+
+
+@query
+def apply_reviews(conn, user_id, base_id, outcomes, now=None):
+    # outcomes: [(savol_id, baho 0-5)] - bitta tranzaksiyada yangilanadi
+    now = now or time.time()
+    ids = list({qid for qid, _ in outcomes})
+    if not ids:
+        return 0
+    placeholders = ",".join("?" * len(ids))
+    # Faqat shu bazaga tegishli savollar qabul qilinadi
+    valid = {r[0] for r in conn.execute(
+        f"SELECT id FROM questions WHERE base_id = ? AND id IN ({placeholders})", [base_id] + ids)}
+    states = {r[0]: r[1:] for r in conn.execute(
+        f"SELECT question_id, ease, interval, reps, lapses FROM reviews WHERE user_id = ? AND question_id IN ({placeholders})",
+        [user_id] + ids)}
+    for qid, quality in outcomes:
+        if qid not in valid:
+            continue
+        ease, interval, reps, lapses = states.get(qid, (srs.DEFAULT_EASE, 0, 0, 0))
+        ease, interval, reps, delay = srs.sm2(ease, interval, reps, quality)
+        states[qid] = (ease, interval, reps, lapses + (quality < 3), now + delay)
+    rows = [(user_id, qid, base_id) + states[qid] for qid in ids if qid in valid]
+    with conn:
+        conn.executemany('''INSERT INTO reviews (user_id, question_id, base_id, ease, interval, reps, lapses, due)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                            ON CONFLICT(user_id, question_id) DO UPDATE SET
+                                ease = excluded.ease, interval = excluded.interval, reps = excluded.reps,
+                                lapses = excluded.lapses, due = excluded.due''', rows)
+    return len(rows)
+
+
+@query
+def search_questions(conn, text, limit=10, base_id=None, after=None, before=None):
+    # Keyset pagination (rank, body_id) bo'yicha: after/before - oldingi sahifaning
+    # oxirgi/birinchi natijasi. Qaytadi: (rows, has_prev, has_next);
+    # row = (savol_id, question_text, full_text, correct_answer, rank, body_id)
+    match = fts_query(text)
+    if not match:
+        return [], False, False
+    if before is not None:
+        keyset = "AND (questions_fts.rank, questions_fts.rowid) < (?, ?)"
+        order = "5 DESC, 6 DESC"
+        keyset_params = list(before)
+    else:
+        keyset = "AND (questions_fts.rank, questions_fts.rowid) > (?, ?)"
+        order = "5, 6"
+        keyset_params = list(after) if after is not None else [float("-inf"), -1]
+    if base_id is not None:
+        # FTS MATCH butun korpusni emas, faqat shu baza matnlari (body id) oraliqlarini
+        # o'qiydi; oraliqdagi boshqa bazalarniki EXISTS bilan chiqariladi
+        if get_base_name.sync(conn, base_id) is None:
+            return [], False, False
+        question_id = "(SELECT min(q.id) FROM questions q WHERE q.base_id = ? AND q.body_id = b.id)"
+        scope = ("AND questions_fts.rowid BETWEEN ? AND ? "
+                 "AND EXISTS (SELECT 1 FROM questions q WHERE q.base_id = ? AND q.body_id = questions_fts.rowid)")
+        ranges = _base_body_ranges(conn, base_id)
+        if not ranges:
+            return [], False, False
+        parts = [[base_id, match, lo, hi, base_id] + keyset_params for lo, hi in ranges]
+    else:
+        # Faqat ko'rinadigan (yuklanib bo'lgan) bazalardagi savollar. Yuklanayotgan bazalar kam:
+        # faqat ulargagina tegishli matnlar bir marta yig'iladi, har bir natija uchun so'rov yo'q
+        ready = "FROM questions q JOIN test_bases t ON t.id = q.base_id AND t.is_ready = 1"
+        question_id = f"(SELECT min(q.id) {ready} WHERE q.body_id = b.id)"
+        scope = f'''AND questions_fts.rowid NOT IN (
+                        SELECT h.body_id FROM questions h
+                        WHERE h.base_id IN (SELECT id FROM test_bases WHERE is_ready = 0)
+                          AND NOT EXISTS (SELECT 1 {ready} WHERE q.body_id = h.body_id))'''
+        parts = [[match] + keyset_params]
+    # rank = bm25(): eng mos savollar birinchi. Bir xil matn (hash UNIQUE) indeksda bir marta;
+    # deyarli bir xillar (bitta cluster) alohida savollar - javobi boshqa bo'lishi mumkin
+    select = f'''SELECT {question_id}, b.question_text, b.full_text, b.correct_answer,
+                        questions_fts.rank, questions_fts.rowid
+                 FROM questions_fts JOIN question_bodies b ON b.id = questions_fts.rowid
+                 WHERE questions_fts MATCH ? {scope} {keyset}'''
+    rows = conn.execute(" UNION ALL ".join([select] * len(parts)) + f" ORDER BY {order} LIMIT ?",
+                        [p for part in parts for p in part] + [limit + 1]).fetchall()
+    results = rows[:limit]
+    has_more = len(rows) > limit
+    if before is not None:
+        return results[::-1], has_more, True
+    return results, after is not None, has_more
+
+
+# Bazaning matnlari odatda bir necha uzluksiz body id oraliqlarida (yuklashda ketma-ket
+# yoziladi; boshqa bazadan qayta ishlatilganlari alohida). Oraliqlar ko'p bo'lsa eng yaqinlari
+# birlashtiriladi: har bir oraliq alohida FTS so'rovi
+MAX_SEARCH_RANGES = 8
+
+
+def _base_body_ranges(conn, base_id, max_ranges=MAX_SEARCH_RANGES):
+    ranges = [list(r) for r in conn.execute('''
+        SELECT min(body_id), max(body_id) FROM (
+            SELECT body_id, body_id - row_number() OVER (ORDER BY body_id) AS run
+            FROM (SELECT DISTINCT body_id FROM questions WHERE base_id = ?))
+        GROUP BY run ORDER BY 1''', (base_id,))]
+    while len(ranges) > max_ranges:
+        # Orasidagi bo'shliq eng kichik ikki qo'shni oraliq birlashtiriladi
+        i = min(range(len(ranges) - 1), key=lambda i: ranges[i + 1][0] - ranges[i][1])
+        ranges[i][1] = ranges.pop(i + 1)[1]
+    return ranges
+
+
+@query
+def get_question(conn, question_id):
+    return conn.execute('''SELECT b.full_text, b.correct_answer FROM questions q
+                           JOIN question_bodies b ON b.id = q.body_id
+                           JOIN test_bases t ON t.id = q.base_id AND t.is_ready = 1 WHERE q.id = ?''',
+                        (question_id,)).fetchone()
@@ -0,0 +1,90 @@
+# --- TAKRORIY SAVOLLARNI ANIQLASH ---
+# Bir xil savollar to'plami turli fan nomlari bilan qayta-qayta yuklanadi.
+# Aniq takrorlar matn xeshi bo'yicha topiladi va savol matni bazada bir marta
+# saqlanadi (question_bodies). Xeshda faqat ma'noni o'zgartirmaydigan farqlar
+# (bo'shliq, katta-kichik harf, apostrof turi) e'tiborga olinmaydi: "x+3" va
+# "x-3" boshqa-boshqa savol. Deyarli bir xillari
+# (tinish belgisi, bitta so'z farqi) MinHash + LSH bilan topiladi: har bir
+# savol BANDS ta kalitga yoziladi, yangi savol faqat shu kalitlar bo'yicha
+# nomzodlar bilan solishtiriladi - butun jadval ko'rib chiqilmaydi.
+# Deyarli takrorlar faqat belgilanadi (cluster_id, yuklash hisoboti): qidiruv
+# va imtihonda ular alohida savol, chunki javobi boshqa bo'lishi mumkin.
+
+import hashlib
+import re
+import struct
+
+from parsing import APOSTROPHES
+
+NUM_PERM = 16
+BANDS = 4
+ROWS = NUM_PERM // BANDS
+# Taxminiy Jaccard o'xshashligi shundan yuqori bo'lsa - deyarli takror
+NEAR_DUP_THRESHOLD = 0.8
+SHINGLE_WORDS = 3
+
+# Xesh versiyasi: o'zgarsa db mavjud yozuvlar xeshini qayta hisoblaydi
+HASH_VERSION = 2
+
+_APOSTROPHE_TABLE = {ord(ch): None for ch in APOSTROPHES}
+_CANONICAL_APOSTROPHE = {ord(ch): "'" for ch in APOSTROPHES}
+_NON_WORD_RE = re.compile(r"[^\w]+")
+_SIGNATURE = struct.Struct(f"<{NUM_PERM}Q")
+# Har bir "permutatsiya" - 64 bitli xeshni XOR qiluvchi tasodifiy niqob
+_MASKS = [int.from_bytes(hashlib.blake2b(f"minhash:{i}".encode(), digest_size=8).digest(), "little")
+          for i in range(NUM_PERM)]
+
+
+def normalize(text):
+    # Faqat MinHash uchun (yo'qotishli): tinish belgilari va belgilar ham tashlanadi
+    text = (text or "").lower().translate(_APOSTROPHE_TABLE)
+    return " ".join(_NON_WORD_RE.sub(" ", text).split())
+
+
+def canonical(text):
+    # Aniq takror uchun (yo'qotishsiz): bo'shliqlar, katta-kichik harf va apostrof turlari
+    return " ".join((text or "").lower().translate(_CANONICAL_APOSTROPHE).split())
+
+
+def content_hash(full_text, answer):
+    # Javob ham xeshga kiradi: matni bir xil, lekin javobi boshqa savol alohida saqlanadi
+    letter = (answer or "").strip()[:1].upper()
+    return hashlib.blake2b(f"{canonical(full_text)}\x00{letter}".encode(), digest_size=16).digest()
+
+
+def _shingle_hashes(text):
+    words = normalize(text).split()
+    if len(words) <= SHINGLE_WORDS:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    # hash() jarayonga bog'liq (PYTHONHASHSEED) - imzolar bazada saqlangani uchun blake2b
+    return [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "little") for s in shingles]
+
+
+def signature(text):
+    hashes = _shingle_hashes(text)
+    return tuple(min(map(mask.__xor__, hashes)) for mask in _MASKS)
+
+
+def lsh_keys(sig):
+    # Har bir band uchun bitta kalit (SQLite INTEGER - ishorali 64 bit)
+    keys = []
+    packed = _SIGNATURE.pack(*sig)
+    for band in range(BANDS):
+        chunk = packed[band * ROWS * 8:(band + 1) * ROWS * 8]
+        digest = hashlib.blake2b(bytes([band]) + chunk, digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+def similarity(sig_a, sig_b):
+    return sum(a == b for a, b in zip(sig_a, sig_b)) / NUM_PERM
+
+
+def pack(sig):
+    return _SIGNATURE.pack(*sig)
+
+
+def unpack(blob):
+    return _SIGNATURE.unpack(blob)
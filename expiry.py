@@ -0,0 +1,79 @@
+# --- ESKIRGAN BAZALARNI TOZALASH (FON VAZIFASI) ---
+# Oddiy (admin bo'lmagan) bazalar max_age_days kundan keyin o'chadi.
+# Ilgari bu "📚 Mavjud bazalar" bosilganda handler ichida bajarilardi;
+# endi davriy vazifa kichik partiyalar bilan o'chiradi va o'qish yo'li
+# hech narsa yozmaydi.
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+import db
+
+log = logging.getLogger(__name__)
+
+
+class ExpiryJob:
+    def __init__(self, max_age_days=3, interval=600, batch_size=50, on_expired=None):
+        self.max_age = timedelta(days=max_age_days)
+        self.interval = interval
+        self.batch_size = batch_size
+        # Kesh va boshqa yordamchi ma'lumotlarni tozalash uchun: await on_expired(base_id)
+        self.on_expired = on_expired
+        self.stats = {
+            "runs": 0,
+            "bases_expired": 0,
+            "questions_deleted": 0,
+            "pages_reclaimed": 0,
+            "kv_purged": 0,
+            "last_run_at": None,
+            "last_run_seconds": None,
+            "errors": 0,
+        }
+        self._task = None
+
+    async def run_once(self):
+        started = time.perf_counter()
+        older_than = (datetime.now() - self.max_age).isoformat()
+        total = 0
+        while True:
+            expired, deleted = await db.expire_bases(older_than, self.batch_size)
+            if not expired:
+                break
+            total += len(expired)
+            self.stats["bases_expired"] += len(expired)
+            self.stats["questions_deleted"] += deleted
+            if self.on_expired:
+                for base_id in expired:
+                    await self.on_expired(base_id)
+            # Boshqa yozuvchilarga navbat berish
+            await asyncio.sleep(0)
+        # Muddati o'tgan FSM holatlari va kesh xabarlari (kv jadvali)
+        self.stats["kv_purged"] += await db.purge_kv()
+        if total:
+            self.stats["pages_reclaimed"] += await db.incremental_vacuum()
+        self.stats["runs"] += 1
+        self.stats["last_run_at"] = datetime.now().isoformat(timespec="seconds")
+        self.stats["last_run_seconds"] = round(time.perf_counter() - started, 4)
+        if total:
+            log.info("Expiry: %d ta baza o'chirildi", total)
+        return total
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                self.stats["errors"] += 1
+                log.exception("Expiry vazifasida xatolik")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,82 @@
+# --- OFFLAYN TELEGRAM (SINOV UCHUN) ---
+# Bot(session=FakeSession()) - Telegram API'ga hech qanday so'rov ketmaydi.
+# Har bir chaqiruv requests ro'yxatiga yoziladi va oddiy javob qaytariladi,
+# shuning uchun handlerlar, webhook va navbatlarni internetsiz sinash mumkin.
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import get_args
+
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import GetUpdates
+from aiogram.types import File, Message, User
+
+FAKE_TOKEN = "123456:FAKE-TOKEN-FOR-OFFLINE-TESTS"
+
+
+class FakeSession(BaseSession):
+    def __init__(self, latency=0.0, log=True):
+        super().__init__()
+        self.latency = latency
+        self.log = log
+        self.requests = []
+        # Yuklab olinadigan fayllar: {file_path: bytes} (download_file/stream_content uchun)
+        self.files = {}
+        self._errors = []
+        self._message_id = 0
+
+    def fail_next(self, *errors):
+        # Keyingi chaqiruvlarda shu xatolar ko'tariladi (masalan TelegramRetryAfter)
+        self._errors.extend(errors)
+
+    async def make_request(self, bot, method, timeout=None):
+        if isinstance(method, GetUpdates):
+            # Polling bo'sh aylanmasligi uchun
+            await asyncio.sleep(1)
+            return []
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.requests.append((time.monotonic(), method))
+        if self.log:
+            logging.info("FAKE %s %s", type(method).__name__, method.model_dump(exclude_none=True))
+        if self._errors:
+            raise self._errors.pop(0)
+        return self._result(bot, method)
+
+    def _result(self, bot, method):
+        returning = method.__returning__
+        types_ = get_args(returning) or (returning,)
+        if Message in types_:
+            self._message_id += 1
+            chat_id = getattr(method, "chat_id", None) or 0
+            return Message.model_validate({
+                "message_id": getattr(method, "message_id", None) or self._message_id,
+                "date": datetime.now(),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": getattr(method, "text", None) or getattr(method, "caption", None),
+            }, context={"bot": bot})
+        if User in types_:
+            return User(id=int(bot.token.split(":")[0]), is_bot=True, first_name="Fake", username="fake_bot")
+        if File in types_:
+            file_id = getattr(method, "file_id", "file")
+            content = self.files.get(file_id)
+            return File(file_id=file_id, file_unique_id=file_id, file_path=file_id,
+                        file_size=len(content) if content is not None else None)
+        if bool in types_:
+            return True
+        return None
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        content = self.files.get(url.rsplit("/", 1)[-1], b"")
+        for i in range(0, len(content), chunk_size):
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            yield content[i:i + chunk_size]
+
+    async def close(self):
+        pass
+
+    def sent(self, method_type=None):
+        return [m for _, m in self.requests if method_type is None or isinstance(m, method_type)]
@@ -0,0 +1,76 @@
+# --- JAVOBLARNI SIQISH VA HTTP KESH ---
+# Web app asosan mobil internetda ochiladi: baza JSON'i bir marta siqiladi
+# (gzip, brotli o'rnatilgan bo'lsa br ham) va keshda saqlanadi. ETag
+# javob tarkibidan hisoblanadi - baza o'zgarmasa brauzer 304 oladi.
+
+import gzip
+import hashlib
+import json
+
+from fastapi import Request
+from fastapi.responses import Response
+from fastapi.staticfiles import StaticFiles
+
+try:
+    # Ixtiyoriy: pip install brotli
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bundan kichik javoblarni siqishga arzimaydi
+MIN_SIZE = 500
+
+
+def make_payload(body, media_type="application/json", quality=9):
+    # body: bytes; qaytadi: {"etag", "media_type", "identity", "gzip", "br"}
+    payload = {
+        "etag": '"' + hashlib.sha1(body).hexdigest() + '"',
+        "media_type": media_type,
+        "identity": body,
+        "gzip": None,
+        "br": None,
+    }
+    if len(body) >= MIN_SIZE:
+        payload["gzip"] = gzip.compress(body, compresslevel=6, mtime=0)
+        if brotli is not None:
+            payload["br"] = brotli.compress(body, quality=quality)
+    return payload
+
+
+def json_payload(data, quality=9):
+    # FastAPI'ning JSONResponse'i bilan bir xil (ensure_ascii=False), lekin probelsiz
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+    return make_payload(body, quality=quality)
+
+
+def payload_size(payload):
+    return 200 + sum(len(payload[k] or b"") for k in ("identity", "gzip", "br"))
+
+
+def _accepts(request, encoding):
+    accept = request.headers.get("accept-encoding", "")
+    return any(part.split(";")[0].strip() == encoding for part in accept.split(","))
+
+
+def respond(request: Request, payload, cache_control="no-cache"):
+    headers = {"ETag": payload["etag"], "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and payload["etag"] in {tag.strip() for tag in if_none_match.split(",")}:
+        return Response(status_code=304, headers=headers)
+    for encoding in ("br", "gzip"):
+        if payload[encoding] is not None and _accepts(request, encoding):
+            headers["Content-Encoding"] = encoding
+            return Response(payload[encoding], media_type=payload["media_type"], headers=headers)
+    return Response(payload["identity"], media_type=payload["media_type"], headers=headers)
+
+
+class CachedStaticFiles(StaticFiles):
+    # /static fayllari nomida versiya yo'q, shuning uchun bir kun + ETag bilan tekshirish
+    def __init__(self, *args, max_age=86400, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_control = f"public, max-age={max_age}"
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers.setdefault("Cache-Control", self.cache_control)
+        return response
@@ -0,0 +1,291 @@
+# --- FAYL FORMATLARI (IMPORT) ---
+# Har bir fayl turi uchun alohida parser: hammasi bir xil yozuvlar
+# ({"q", "full", "ans", "stem", "options"}) beradi va ImportReport ga
+# yaroqsiz savollarni joyi (qator / element / paragraf) bilan yozadi.
+# Parserlar generator: db.create_base ularni pool threadida partiyalab o'qiydi.
+#
+#   .txt/.text - savol, A)-D) variantlar (yoki bir qatorda), "ANSWER: X"
+#   .docx      - xuddi shu format Word hujjatida (tashqi kutubxonasiz)
+#   .csv       - savol, A, B, C, D, javob (sarlavha ixtiyoriy; , ; yoki TAB)
+#   .json      - [{"question", "options", "answer"}] ; .jsonl - har qatorda bitta
+
+import csv
+import itertools
+import json
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+from parsing import (OPTION_LETTERS, OPTION_RE, ParseError, iter_chunks, iter_lines, iter_tests, iter_text,
+                     make_test)
+
+PARSERS = {}
+
+
+def register(*extensions):
+    def decorator(fn):
+        for ext in extensions:
+            PARSERS[ext] = fn
+        return fn
+    return decorator
+
+
+def parser_for(filename):
+    name = (filename or "").lower()
+    for ext, fn in PARSERS.items():
+        if name.endswith(ext):
+            return fn
+    return None
+
+
+def supported_extensions():
+    return sorted(PARSERS)
+
+
+def iter_file(filename, fileobj, report):
+    parser = parser_for(filename)
+    if parser is None:
+        raise ParseError(f"Qo'llab-quvvatlanmaydigan fayl turi. Mumkin: {', '.join(supported_extensions())}")
+    return parser(fileobj, report)
+
+
+# --- javob va variantlarni moslashtirish ---
+
+STEM_KEYS = ("question", "savol", "stem", "text", "q", "вопрос", "savol matni")
+ANSWER_KEYS = ("answer", "javob", "correct", "ans", "correct_answer", "to'g'ri javob", "ответ")
+OPTION_KEYS = ("options", "variants", "variantlar", "choices", "answers")
+_OPTION_HEADER_RE = re.compile(r"^(?:option|variant|javob)?[ _]?([a-h])\)?$")
+_LETTER_RE = re.compile(r"^([A-Ha-h])[.)]?$")
+
+
+def answer_letter_of(value, options):
+    # "b", "B)", raqam (2 yoki "2" - 1 dan, ikkalasi bir xil) yoki variant matnining o'zi;
+    # aniqlanmasa None (0 ham - xato sifatida ImportReport ga tushadi)
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, int):
+        return OPTION_LETTERS[value - 1] if 1 <= value <= len(OPTION_LETTERS) else None
+    text = str(value).strip()
+    if m := _LETTER_RE.match(text):
+        return m.group(1).upper()
+    if text.isdigit() and 1 <= int(text) <= len(OPTION_LETTERS):
+        return OPTION_LETTERS[int(text) - 1]
+    for L, option in options.items():
+        if option and str(option).strip().lower() == text.lower():
+            return L
+    return None
+
+
+def structured_test(stem, options, answer):
+    letter = answer_letter_of(answer, options)
+    if letter is None:
+        raise ValueError(f"javob aniqlanmadi: {answer!r}" if answer not in (None, "") else "javob ko'rsatilmagan")
+    return make_test(stem, options, letter)
+
+
+# --- .txt ---
+
+@register(".txt", ".text")
+def parse_text(fileobj, report):
+    return iter_tests(iter_lines(iter_chunks(fileobj)), report)
+
+
+# --- .csv ---
+
+def _csv_header(row):
+    # Sarlavha qatori bo'lsa {ustun: maydon}, aks holda None
+    mapping = {}
+    for i, cell in enumerate(row):
+        key = cell.strip().lower()
+        if key in STEM_KEYS:
+            mapping[i] = "stem"
+        elif key in ANSWER_KEYS:
+            mapping[i] = "ans"
+        elif m := _OPTION_HEADER_RE.match(key):
+            mapping[i] = m.group(1).upper()
+    values = set(mapping.values())
+    return mapping if "stem" in values and "ans" in values else None
+
+
+@register(".csv")
+def parse_csv(fileobj, report):
+    lines = iter_lines(iter_chunks(fileobj))
+    first = next(lines, "")
+    try:
+        dialect = csv.Sniffer().sniff(first, delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel
+    # Qatorlar \n bilan qaytariladi: qo'shtirnoq ichidagi ko'p qatorli katakchalar uchun
+    reader = csv.reader((line + "\n" for line in itertools.chain([first], lines)), dialect)
+    header = None
+    for row in reader:
+        where = f"{reader.line_num}-qator"
+        if not any(cell.strip() for cell in row):
+            continue
+        if reader.line_num == 1 and header is None:
+            header = _csv_header(row)
+            if header:
+                continue
+        if header:
+            fields = {}
+            for i, cell in enumerate(row):
+                if i in header:
+                    fields[header[i]] = cell
+            stem, answer = fields.pop("stem", ""), fields.pop("ans", "")
+            options = fields
+        else:
+            # Sarlavhasiz: savol, variantlar..., javob
+            if len(row) < 4:
+                report.error(where, f"ustunlar kam ({len(row)}): savol, variantlar, javob kerak")
+                continue
+            stem, answer = row[0], row[-1]
+            options = dict(zip(OPTION_LETTERS, row[1:-1]))
+        try:
+            test = structured_test(stem, options, answer)
+        except ValueError as e:
+            report.error(where, str(e))
+            continue
+        if report.check(where, test):
+            yield test
+
+
+# --- .json / .jsonl ---
+
+def _first(item, keys):
+    for key in keys:
+        for k in (key, key.capitalize(), key.upper()):
+            if k in item:
+                return item[k]
+    return None
+
+
+def json_test(item):
+    # Turli tizimlar eksporti: variantlar dict, ro'yxat, {"text", "correct"} ro'yxati yoki A/B/C/D kalitlari
+    if not isinstance(item, dict):
+        raise ValueError("obyekt kutilgan")
+    stem = _first(item, STEM_KEYS)
+    raw = _first(item, OPTION_KEYS)
+    answer = _first(item, ANSWER_KEYS)
+    options = {}
+    if isinstance(raw, dict):
+        for key, value in raw.items():
+            options[answer_letter_of(key, {}) or str(key)] = value
+    elif isinstance(raw, list):
+        for letter, value in zip(OPTION_LETTERS, raw):
+            if isinstance(value, dict):
+                if answer is None and (value.get("correct") or value.get("is_correct")):
+                    answer = letter
+                value = _first(value, ("text", "option", "value"))
+            options[letter] = value
+    else:
+        options = {L: item.get(L, item.get(L.lower())) for L in OPTION_LETTERS}
+    options = {L: v for L, v in options.items() if L in OPTION_LETTERS and v is not None}
+    return structured_test(str(stem or ""), options, answer)
+
+
+def _json_items(data):
+    if isinstance(data, dict):
+        data = _first(data, ("questions", "tests", "items", "savollar"))
+    if not isinstance(data, list):
+        raise ParseError("JSON'da savollar ro'yxati topilmadi")
+    return data
+
+
+@register(".json")
+def parse_json(fileobj, report):
+    # Butun hujjat bir marta o'qiladi (hajm UPLOAD_MAX_MB bilan cheklangan); katta banklar uchun .jsonl
+    try:
+        data = json.loads("".join(iter_text(iter_chunks(fileobj))))
+    except ValueError as e:
+        raise ParseError(f"JSON xato: {e}")
+    for number, item in enumerate(_json_items(data), 1):
+        where = f"{number}-element"
+        try:
+            test = json_test(item)
+        except ValueError as e:
+            report.error(where, str(e))
+            continue
+        if report.check(where, test):
+            yield test
+
+
+@register(".jsonl")
+def parse_jsonl(fileobj, report):
+    for number, line in enumerate(iter_lines(iter_chunks(fileobj)), 1):
+        if not line.strip():
+            continue
+        where = f"{number}-qator"
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            report.error(where, f"JSON xato: {e.msg}")
+            continue
+        try:
+            test = json_test(item)
+        except ValueError as e:
+            report.error(where, str(e))
+            continue
+        if report.check(where, test):
+            yield test
+
+
+# --- .docx ---
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def docx_paragraphs(fileobj):
+    # word/document.xml oqim sifatida o'qiladi: (paragraf matni, ro'yxat darajasi yoki None)
+    try:
+        archive = zipfile.ZipFile(fileobj)
+        xml = archive.open("word/document.xml")
+    except (zipfile.BadZipFile, KeyError):
+        raise ParseError("docx faylni o'qib bo'lmadi (Word hujjati emas yoki buzilgan)")
+    with archive, xml:
+        parts = []
+        level = None
+        for event, el in ET.iterparse(xml, events=("end",)):
+            tag = el.tag
+            if tag == W + "t":
+                parts.append(el.text or "")
+            elif tag == W + "tab":
+                parts.append("\t")
+            elif tag in (W + "br", W + "cr"):
+                parts.append("\n")
+            elif tag == W + "ilvl":
+                level = int(el.get(W + "val", 0))
+            elif tag == W + "p":
+                yield "".join(parts), level
+                parts = []
+                level = None
+                el.clear()
+
+
+def docx_lines(paragraphs):
+    # Word'ning avtomatik raqamlangan ro'yxati (a., b., ...) matnda harfsiz keladi: savoldan
+    # keyingi ro'yxat bandlari (savol ham ro'yxatda bo'lsa - undan chuqurroq daraja) A), B), ... deb olinadi
+    letter = 0
+    stem_level = None
+    open_question = False
+    for text, level in paragraphs:
+        for line in text.split("\n"):
+            stripped = line.strip()
+            if not stripped:
+                yield line
+            elif "ANSWER:" in stripped:
+                open_question = False
+                yield line
+            elif level is not None and open_question and (stem_level is None or level > stem_level):
+                if not OPTION_RE.match(stripped) and letter < len(OPTION_LETTERS):
+                    line = f"{OPTION_LETTERS[letter]}) {stripped}"
+                    letter += 1
+                yield line
+            else:
+                if not open_question:
+                    open_question, stem_level, letter = True, level, 0
+                yield line
+
+
+@register(".docx")
+def parse_docx(fileobj, report):
+    return iter_tests(docx_lines(docx_paragraphs(fileobj)), report, unit="paragraf")
@@ -1,25 +1,50 @@
 import asyncio
+import hashlib
 import logging
-import sqlite3
 import random
-import re
+import secrets
+import tempfile
+from array import array
+import json
 import os
-from datetime import datetime, timedelta
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
 
 # Aiogram kutubxonalari
-from aiogram import Bot, Dispatcher, types, F, html
-from aiogram.filters import Command
+from aiogram import BaseMiddleware, Bot, Dispatcher, types, F, html
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command, CommandObject
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import WebAppInfo
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.utils.web_app import safe_parse_webapp_init_data
 
 # FastAPI va Web server kutubxonalari
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
+from pydantic import BaseModel
 import uvicorn
 
+import db
+import metrics
+import storage
+from fakebot import FAKE_TOKEN, FakeSession
+from attempts import EXAM_DURATION, AttemptWriter, answer_letter, format_duration, score_exam
+from cache import LRUCache
+from httpcache import CachedStaticFiles, json_payload, make_payload, payload_size, respond
+from srs import quality_of
+from expiry import ExpiryJob
+from notify import Notifier
+from uploads import UploadError, UploadQueue, download_to
+from parsing import ImportReport, ParseError
+from importers import iter_file, parser_for, supported_extensions
+from snapshots import MEDIA_TYPE as SNAPSHOT_MEDIA_TYPE, SNAPSHOT_VERSION, SnapshotStore, encode as encode_snapshot
+
 # --- KONFIGURATSIYA ---
 # Railway Environment Variables
 TOKEN = os.getenv("BOT_TOKEN")
@@ -53,148 +78,293 @@ if not os.path.exists(DATA_DIR):
 
 DB_PATH = os.path.join(DATA_DIR, "test_bot.db")
 
+# Bot rejimi: "polling" (standart) yoki "webhook" (Telegram yangilanishlarni
+# WEB_APP_URL + WEBHOOK_PATH ga POST qiladi, bir nechta uvicorn worker mumkin)
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or hashlib.sha256((TOKEN or "").encode()).hexdigest()[:32]
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", 1))
+# FAKE_TELEGRAM=1 - Telegram API'siz lokal sinov (fakebot.FakeSession)
+FAKE_TELEGRAM = os.getenv("FAKE_TELEGRAM") == "1"
+
+# Bazalar keshi (MB va soniya)
+CACHE_MAX_MB = int(os.getenv("CACHE_MAX_MB", 64))
+CACHE_TTL = int(os.getenv("CACHE_TTL", 600))
+
+# Fayl yuklash: hajm chegarasi (MB, Bot API getFile ham 20 MB gacha beradi),
+# bir vaqtda yuklab olinadigan/tahlil qilinadigan fayllar va navbat uzunligi
+UPLOAD_MAX_MB = int(os.getenv("UPLOAD_MAX_MB", 20))
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", 2))
+UPLOAD_QUEUE_SIZE = int(os.getenv("UPLOAD_QUEUE_SIZE", 100))
+
+# Natija kartochkalari uchun disk keshi (MB) va rasm chizuvchi jarayonlar soni
+CARD_CACHE_MB = int(os.getenv("CARD_CACHE_MB", 50))
+CARD_WORKERS = int(os.getenv("CARD_WORKERS", 1))
+
+# Imtihondagi savollar soni
+EXAM_SIZE = 50
+
+# Eskirgan bazalarni tozalash oralig'i (soniya)
+EXPIRY_INTERVAL = int(os.getenv("EXPIRY_INTERVAL", 600))
+
+# FSM holati va keshlarni bekor qilish xabarlari uchun umumiy saqlash:
+# sqlite (standart, bot bazasi), redis://host:6379/0 yoki local:// (sinov)
+STORAGE_URL = os.getenv("STORAGE_URL", "sqlite")
+# Tashlab ketilgan FSM holati (chala yuklash, qidiruv) shuncha soniyadan keyin o'chadi
+FSM_TTL = int(os.getenv("FSM_TTL", 2 * 24 * 3600))
+
 logging.basicConfig(level=logging.INFO)
-bot = Bot(token=TOKEN)
-dp = Dispatcher()
+if FAKE_TELEGRAM:
+    bot = Bot(token=TOKEN or FAKE_TOKEN, session=FakeSession())
+else:
+    bot = Bot(token=TOKEN)
+kv = storage.open_kv(STORAGE_URL)
+# Holat restartdan keyin ham, boshqa workerga tushgan update uchun ham saqlanadi
+dp = Dispatcher(storage=storage.KVStorage(kv, ttl=FSM_TTL))
+invalidator = storage.CacheInvalidator(kv)
+invalidator.on("users", db.forget_user)
+invalidator.on("settings", db.forget_setting)
+notifier = Notifier(bot)
+attempt_writer = AttemptWriter()
+upload_queue = UploadQueue(UPLOAD_CONCURRENCY, UPLOAD_QUEUE_SIZE)
+# Yodlash rejimi uchun ixcham binar nusxalar (baza yuklanganda yoziladi)
+snapshot_store = SnapshotStore(os.path.join(DATA_DIR, "snapshots"))
+loop_monitor = metrics.LoopLagMonitor()
+
+# --- METRIKALAR ---
+# Handler va route'lar alohida o'zgartirilmaydi: vaqt middleware'larda o'lchanadi
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    # Bot API chaqiruvlari (sessiya darajasida, Notifier orqali yuborilganlar ham)
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            metrics.telegram_errors.inc(method=name, error=type(e).__name__)
+            raise
+        finally:
+            metrics.telegram_seconds.observe(time.perf_counter() - started, method=name)
+
+bot.session.middleware(TelegramMetricsMiddleware())
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    # Inner middleware: filtrlar o'tgan, handler aniq (data["handler"])
+    def __init__(self, event_name):
+        self.event_name = event_name
+
+    async def __call__(self, handler, event, data):
+        name = data["handler"].callback.__name__
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            metrics.handler_errors.inc(event=self.event_name, handler=name, error=type(e).__name__)
+            raise
+        finally:
+            metrics.handler_seconds.observe(time.perf_counter() - started, event=self.event_name, handler=name)
+
+for event_name in ("message", "callback_query", "inline_query"):
+    dp.observers[event_name].middleware(HandlerMetricsMiddleware(event_name))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global card_cache
+    # Har bir uvicorn worker o'z DB pool'ini ochadi
+    init_db()
+    await invalidator.start()
+    snapshot_store.prune()
+    loop_monitor.start()
+    notifier.start()
+    attempt_writer.start()
+    expiry_job.start()
+    # Kartochka keshi shu yerda: spawn qilingan render jarayonlari main ni import qilganda papkaga tegmaydi
+    card_cache = CardCache(CARD_DIR, CARD_CACHE_MB * 1024 * 1024, workers=CARD_WORKERS)
+    card_cache.open()
+    if WEB_APP_URL:
+        card_cache.start()
+    if BOT_MODE == "webhook":
+        await bot.set_webhook(f"{WEB_APP_URL}{WEBHOOK_PATH}", secret_token=WEBHOOK_SECRET,
+                              allowed_updates=dp.resolve_used_update_types())
+    yield
+    await expiry_job.stop()
+    await attempt_writer.stop()
+    await notifier.stop()
+    await loop_monitor.stop()
+    await invalidator.stop()
+    await dp.storage.close()
+    card_cache.stop()
+    db.close()
 
 # FastAPI ilovasi
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+# Qolgan JSON javoblar (statistika, review-batch ...) uchun; oldindan siqilganlarga tegmaydi
+app.add_middleware(GZipMiddleware, minimum_size=500)
+
+@app.middleware("http")
+async def http_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Route shabloni ("/exam/{base_id}") bo'yicha, aks holda label'lar cheksiz ko'payadi
+        route = request.scope.get("route")
+        metrics.http_seconds.observe(time.perf_counter() - started, method=request.method,
+                                     route=getattr(route, "path", "unmatched"), status=status)
 templates = Jinja2Templates(directory="templates")
+# Shablon bir marta kompilyatsiya qilinadi, fayl o'zgarishi har so'rovda tekshirilmaydi
+templates.env.auto_reload = False
+page_template = templates.get_template("index.html")
 
 # --- MA'LUMOTLAR BAZASI ---
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''CREATE TABLE IF NOT EXISTS test_bases (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT,
-        owner_id INTEGER,
-        created_at TIMESTAMP,
-        is_admin_base INTEGER DEFAULT 0
-    )''')
-    cursor.execute('''CREATE TABLE IF NOT EXISTS questions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        base_id INTEGER,
-        question_text TEXT,
-        full_text TEXT,
-        correct_answer TEXT,
-        FOREIGN KEY (base_id) REFERENCES test_bases(id) ON DELETE CASCADE
-    )''')
-    # Yangi jadvallar
-    cursor.execute('''CREATE TABLE IF NOT EXISTS users (
-        telegram_id INTEGER PRIMARY KEY,
-        full_name TEXT,
-        username TEXT,
-        phone_number TEXT,
-        is_approved INTEGER DEFAULT 0,
-        joined_at TIMESTAMP
-    )''')
-    cursor.execute('''CREATE TABLE IF NOT EXISTS settings (
-        key TEXT PRIMARY KEY,
-        value TEXT
-    )''')
-    # Default sozlamalar
-    cursor.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('auto_approve', '0')")
-    conn.commit()
-    conn.close()
-
-# --- database helpers ---
-
-def db_get_setting(key, default=None):
-    conn = sqlite3.connect("test_bot.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT value FROM settings WHERE key = ?", (key,))
-    res = cursor.fetchone()
-    conn.close()
-    return res[0] if res else default
-
-def db_set_setting(key, value):
-    conn = sqlite3.connect("test_bot.db")
-    cursor = conn.cursor()
-    cursor.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, str(value)))
-    conn.commit()
-    conn.close()
-
-def db_get_user(telegram_id):
-    conn = sqlite3.connect("test_bot.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE telegram_id = ?", (telegram_id,))
-    res = cursor.fetchone()
-    conn.close()
-    return res
-
-def db_upsert_user(user: types.User, is_approved=0):
-    conn = sqlite3.connect("test_bot.db")
-    cursor = conn.cursor()
-    # Check if user exists to preserve is_approved if we are just updating info
-    cursor.execute("SELECT is_approved FROM users WHERE telegram_id = ?", (user.id,))
-    res = cursor.fetchone()
-    
-    current_approved = res[0] if res else is_approved
-    
-    joined_at = datetime.now().isoformat()
-    cursor.execute('''INSERT OR REPLACE INTO users (telegram_id, full_name, username, is_approved, joined_at)
-                      VALUES (?, ?, ?, ?, COALESCE((SELECT joined_at FROM users WHERE telegram_id=?), ?))''',
-                   (user.id, user.full_name, user.username, current_approved, user.id, joined_at))
-    conn.commit()
-    conn.close()
-
-def db_set_approval(telegram_id, status):
-    conn = sqlite3.connect("test_bot.db")
-    cursor = conn.cursor()
-    cursor.execute("UPDATE users SET is_approved = ? WHERE telegram_id = ?", (status, telegram_id))
-    conn.commit()
-    conn.close()
-
-def db_get_all_users():
-    conn = sqlite3.connect("test_bot.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT telegram_id, full_name, is_approved FROM users")
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    if not db.is_open():
+        db.init(DB_PATH)
+
+def base_size(base):
+    # Taxminiy hajm: matnlar uzunligi + har bir savol uchun obyekt xarajati
+    size = 200 + len(base["name"] or "")
+    for q in base["questions"]:
+        size += 300 + len(q["question"]) + len(q["ans"] or "") + sum(len(v) for v in q["options"].values())
+    return size
+
+base_cache = LRUCache(CACHE_MAX_MB * 1024 * 1024, CACHE_TTL, sizeof=base_size)
+# Imtihon uchun yengil kesh: baza nomi va savol id'lari (array, 8 bayt/savol)
+meta_cache = LRUCache(CACHE_MAX_MB * 1024 * 1024 // 8, CACHE_TTL,
+                      sizeof=lambda meta: 200 + len(meta["name"] or "") + meta["ids"].itemsize * len(meta["ids"]))
+
+def question_dict(row):
+    # row: (id, stem, options_json, correct_answer)
+    return {"id": row[0], "question": row[1], "options": json.loads(row[2]), "ans": row[3]}
+
+async def load_base(base_id):
+    name, rows = await db.get_base(base_id)
+    return {"name": name, "questions": [question_dict(r) for r in rows]}
+
+async def load_base_meta(base_id):
+    name, ids = await db.get_base_meta(base_id)
+    return {"name": name, "ids": array("q", ids)}
+
+# Siqilgan javoblar: ("tests", base_id) - yodlash JSON'i, ("exam"/"memorize", base_id) - sahifa
+payload_cache = LRUCache(CACHE_MAX_MB * 1024 * 1024 // 2, CACHE_TTL, sizeof=payload_size)
+
+async def load_tests_payload(key):
+    base = await base_cache.get(key[1], load_base)
+    return json_payload(base["questions"])
+
+async def load_snapshot_payload(key):
+    # Odatda tayyor fayl o'qiladi; eski (snapshotsiz) bazalar uchun bir marta yozib qo'yiladi
+    base_id = key[1]
+    data = await asyncio.to_thread(snapshot_store.read, base_id)
+    if data is None:
+        base = await base_cache.get(base_id, load_base)
+        if base["name"] is None:
+            data = encode_snapshot([])
+        else:
+            data = await asyncio.to_thread(snapshot_store.write, base_id, base["questions"])
+    return make_payload(data, media_type=SNAPSHOT_MEDIA_TYPE)
+
+async def write_snapshot(base_id):
+    base = await base_cache.get(base_id, load_base)
+    await asyncio.to_thread(snapshot_store.write, base_id, base["questions"])
+
+async def load_page_payload(key):
+    mode, base_id = key
+    name = (await meta_cache.get(base_id, load_base_meta))["name"]
+    html_text = page_template.render(base_id=base_id, mode=mode,
+                                     subject_name=name or ("Imtihon" if mode == "exam" else "Yodlash"))
+    return make_payload(html_text.encode(), media_type="text/html; charset=utf-8")
+
+def forget_base(base_id):
+    base_cache.invalidate(base_id)
+    meta_cache.invalidate(base_id)
+    for kind in ("tests", "snapshot", "exam", "memorize"):
+        payload_cache.invalidate((kind, base_id))
+
+invalidator.on("base", forget_base)
+
+async def invalidate_base(base_id):
+    # Shu jarayonda darhol, boshqa workerlarda CacheInvalidator orqali
+    forget_base(base_id)
+    await invalidator.publish("base", base_id)
+
+async def drop_base(base_id):
+    # Baza o'chirilganda: keshlar va snapshot fayli
+    await invalidate_base(base_id)
+    await asyncio.to_thread(snapshot_store.delete, base_id)
+
+expiry_job = ExpiryJob(max_age_days=3, interval=EXPIRY_INTERVAL, on_expired=drop_base)
+
+async def sample_questions(base_id, count, seed=None):
+    # Faqat kerakli id'lar tanlanadi va shu savollar o'qiladi; seed berilsa
+    # tanlov takrorlanadi (bir xil urinishni qayta ochish uchun)
+    meta = await meta_cache.get(base_id, load_base_meta)
+    ids = meta["ids"]
+    rng = random.Random(f"{base_id}:{seed}") if seed is not None else random
+    picked = rng.sample(range(len(ids)), min(count, len(ids)))
+    return await fetch_questions(base_id, [ids[i] for i in picked])
+
+async def fetch_questions(base_id, ids):
+    # Baza keshda bo'lsa o'sha yerdan, bo'lmasa faqat kerakli savollar o'qiladi
+    full = base_cache.peek(base_id)
+    if full is not None:
+        by_id = {q["id"]: q for q in full["questions"]}
+    else:
+        by_id = {r[0]: question_dict(r) for r in await db.get_questions_by_ids(ids)}
+    return [by_id[qid] for qid in ids if qid in by_id]
 
 class BotStates(StatesGroup):
     searching = State()
     uploading = State()
     subject_name = State()
+    user_search = State()
+
+# --- BOT HANDLERLARI ---
 
-def parse_test_file(content):
-    tests = []
-    lines = content.split('\n')
-    current_q = ""
-    full_text = ""
-    for line in lines:
-        if "ANSWER:" in line:
-            correct = line.split("ANSWER:")[1].strip()
-            first_line = full_text.strip().split('\n')[0] if full_text.strip() else "Savol"
-            q_title = first_line[:50]
-            tests.append({"q": q_title, "full": full_text.strip(), "ans": correct})
-            current_q = ""
-            full_text = ""
+NOT_APPROVED_TEXT = "🚫 <b>Sizga tizimdan foydalanish uchun ruxsat berilmagan.</b>\n\nIltimos, admin ruxsatini kuting."
+
+class ApprovalMiddleware(BaseMiddleware):
+    # Ruxsat berilmagan foydalanuvchilar /start dan boshqa hech qaysi handlerga
+    # yetib bormaydi. Holat db keshidan olinadi, odatda I/O yo'q.
+    async def __call__(self, handler, event, data):
+        user = data.get("event_from_user")
+        if user is None or user.id == ADMIN_ID:
+            return await handler(event, data)
+        if isinstance(event, types.Message) and (event.text or "").startswith("/start"):
+            return await handler(event, data)
+        if await db.get_approval(user.id):
+            return await handler(event, data)
+        if isinstance(event, types.CallbackQuery):
+            await event.answer("🚫 Sizga ruxsat berilmagan.", show_alert=True)
         else:
-            if not current_q and line.strip():
-                current_q = line
-            full_text += line + "\n"
-    return tests
+            await event.answer(NOT_APPROVED_TEXT, parse_mode="HTML")
 
-# --- BOT HANDLERLARI ---
+dp.message.outer_middleware(ApprovalMiddleware())
+dp.callback_query.outer_middleware(ApprovalMiddleware())
 
 @dp.message(Command("start"))
 async def start_cmd(message: types.Message, state: FSMContext):
     await state.clear()
     
     # Avto-ruxsat sozlamasini tekshirish
-    auto_approve = db_get_setting("auto_approve", "0") == "1"
+    auto_approve = await db.get_setting("auto_approve", "0") == "1"
     
     # Foydalanuvchini bazaga yozish (agar yangi bo'lsa)
-    user = db_get_user(message.from_user.id)
-    is_new = user is None
+    is_approved = await db.get_approval(message.from_user.id)
+    is_new = is_approved is None
     
     if is_new:
         # Yangi foydalanuvchi uchun status
         initial_status = 1 if (auto_approve or message.from_user.id == ADMIN_ID) else 0
-        db_upsert_user(message.from_user, is_approved=initial_status)
+        await db.upsert_user(message.from_user.id, message.from_user.full_name,
+                             message.from_user.username, is_approved=initial_status)
+        # Boshqa workerlarda "ro'yxatdan o'tmagan" deb keshlangan bo'lishi mumkin
+        await invalidator.publish("users", message.from_user.id)
+        is_approved = initial_status
         
         # Adminga xabar berish
         if message.from_user.id != ADMIN_ID:
@@ -215,15 +385,20 @@ async def start_cmd(message: types.Message, state: FSMContext):
                 kb.button(text="✅ Ruxsat berish", callback_data=f"approve_{message.from_user.id}")
                 kb.button(text="🚫 Bloklash", callback_data=f"block_{message.from_user.id}")
             kb.adjust(1)
+            # Digest xabarida har bir foydalanuvchiga bitta qator: tugmada ismi ko'rinadi
+            short_name = message.from_user.full_name[:20]
+            digest_row = [types.InlineKeyboardButton(text=f"{b.text.split()[0]} {short_name}", callback_data=b.callback_data)
+                          for b in kb.buttons]
             
-            await bot.send_message(ADMIN_ID, admin_msg, reply_markup=kb.as_markup(), parse_mode="HTML")
+            # Ko'p yangi foydalanuvchi bo'lsa adminga bitta jamlangan xabar boradi
+            notifier.send_digest(
+                ADMIN_ID, "new_user",
+                line=f"• {html.quote(message.from_user.full_name)} (<code>{message.from_user.id}</code>) — {status_text}",
+                text=admin_msg, title="🆕 <b>Yangi foydalanuvchilar</b>", buttons=digest_row,
+                reply_markup=kb.as_markup(), parse_mode="HTML")
             
-    # Hozirgi statusni olish
-    user_data = db_get_user(message.from_user.id)
-    is_approved = user_data[4] # is_approved index
-    
     if not is_approved and message.from_user.id != ADMIN_ID:
-        await message.answer("🚫 <b>Sizga tizimdan foydalanish uchun ruxsat berilmagan.</b>\n\nIltimos, admin ruxsatini kuting.")
+        await message.answer(NOT_APPROVED_TEXT, parse_mode="HTML")
         return
 
     kb = [
@@ -238,7 +413,7 @@ async def start_cmd(message: types.Message, state: FSMContext):
     keyboard = types.ReplyKeyboardMarkup(keyboard=kb, resize_keyboard=True)
     text = (
         f"Xush kelibsiz! Bot rejimini tanlang:\n\n"
-        f"1. <b>Test yuklash</b> - .txt fayl yuboring.\n"
+        f"1. <b>Test yuklash</b> - .txt, .docx, .csv yoki .json fayl yuboring.\n"
         f"2. <b>Test izlash</b> - Bazadan qidirish.\n"
         f"3. <b>Imtihon topshirish</b> - 50 ta savol, vaqtga.\n"
         f"4. <b>Yodlash rejimi</b> - Barcha savollar, o'rgatuvchi rejim.\n\n"
@@ -251,24 +426,20 @@ async def info(message: types.Message, state: FSMContext):
     await state.clear()
     text = (
         "⚠️ <b>Qoidalar:</b>\n"
-        "• Faqat .txt fayllar qabul qilinadi.\n"
-        "• Format: Savol matni va tagida <code>ANSWER: A</code>.\n"
+        f"• Fayl turlari: {', '.join(supported_extensions())}.\n"
+        "• .txt/.docx: savol, A) B) C) D) variantlar va tagida <code>ANSWER: A</code>.\n"
+        "• .csv: <code>savol, A, B, C, D, javob</code> ustunlari.\n"
+        "• .json: <code>[{\"question\", \"options\", \"answer\"}]</code>.\n"
         "• Oddiy bazalar 3 kunda o'chib ketadi."
     )
     await message.answer(text, parse_mode="HTML")
 
-def get_admin_content():
-    auto_approve = db_get_setting("auto_approve", "0") == "1"
+async def get_admin_content():
+    auto_approve = await db.get_setting("auto_approve", "0") == "1"
     status_emoji = "✅ YONIQ" if auto_approve else "🔴 O'CHIQ"
     
     # Statistikani olish
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM users")
-    total_users = cursor.fetchone()[0]
-    cursor.execute("SELECT COUNT(*) FROM users WHERE is_approved = 1")
-    approved_users = cursor.fetchone()[0]
-    conn.close()
+    total_users, approved_users = await db.count_users()
     
     blocked_users = total_users - approved_users
     
@@ -294,57 +465,104 @@ def get_admin_content():
 async def admin_panel(message: types.Message):
     if message.from_user.id != ADMIN_ID:
         return
-    text, reply_markup = get_admin_content()
+    text, reply_markup = await get_admin_content()
     await message.answer(text, reply_markup=reply_markup, parse_mode="HTML")
 
 @dp.callback_query(F.data == "admin_main")
 async def back_to_admin(call: types.CallbackQuery):
-    text, reply_markup = get_admin_content()
+    text, reply_markup = await get_admin_content()
     await call.message.edit_text(text, reply_markup=reply_markup, parse_mode="HTML")
 
 @dp.callback_query(F.data == "toggle_auto")
 async def toggle_auto_callback(call: types.CallbackQuery):
-    current = db_get_setting("auto_approve", "0")
+    current = await db.get_setting("auto_approve", "0")
     new_val = "1" if current == "0" else "0"
-    db_set_setting("auto_approve", new_val)
+    await db.set_setting("auto_approve", new_val)
+    await invalidator.publish("settings", "auto_approve")
     
     status_msg = "✅ Yoqildi" if new_val == "1" else "🔴 O'chirildi"
     await call.answer(f"Avto-ruxsat {status_msg}")
     
     # Xabarni yangilash (edit)
-    text, reply_markup = get_admin_content()
+    text, reply_markup = await get_admin_content()
     try:
         await call.message.edit_text(text, reply_markup=reply_markup, parse_mode="HTML")
     except Exception:
         pass
 
-@dp.callback_query(F.data == "user_list")
-async def show_users(call: types.CallbackQuery):
-    users = db_get_all_users()
+USERS_PAGE_SIZE = 20
+
+def user_buttons(kb, users):
+    for u in users:
+        # u: (telegram_id, full_name, is_approved)
+        status = "✅" if u[2] else "🚫"
+        kb.button(text=f"{status} {u[1]}", callback_data=f"manage_{u[0]}")
+
+async def render_users_page(call: types.CallbackQuery, after_id=None, before_id=None):
+    users, has_prev, has_next = await db.users_page(after_id, before_id, USERS_PAGE_SIZE)
+    total, _ = await db.count_users()
     kb = InlineKeyboardBuilder()
     
     # Bulk actions in list view
     kb.button(text="✅ Hammaga ruxsat", callback_data="users_manage_approve_all")
     kb.button(text="🚫 Hammani bloklash", callback_data="users_manage_revoke_all")
-
-    if not users:
-        # Agar userlar bo'lmasa ham bulk actionlar turgani ma'qul, yoki msg qaytarish mumkin
+    user_buttons(kb, users)
+
+    nav = []
+    if has_prev and users:
+        nav.append(types.InlineKeyboardButton(text="⬅️ Oldingi", callback_data=f"ulist_prev_{users[0][0]}"))
+    if has_next and users:
+        nav.append(types.InlineKeyboardButton(text="Keyingi ➡️", callback_data=f"ulist_next_{users[-1][0]}"))
+    kb.adjust(2)
+    if nav:
+        kb.row(*nav)
+    kb.row(types.InlineKeyboardButton(text="🔎 Qidirish", callback_data="user_search"),
+           types.InlineKeyboardButton(text="🔙 Orqaga", callback_data="admin_main"))
+
+    text = f"👥 <b>Foydalanuvchilar ro'yxati:</b> (jami {total})\nTanlash uchun bosing:"
+    try:
+        await call.message.edit_text(text, reply_markup=kb.as_markup(), parse_mode="HTML")
+    except Exception:
         pass
 
-    text = "👥 <b>Foydalanuvchilar ro'yxati:</b>\nTanlash uchun bosing:"
-    
-    for u in users:
-        # u: (telegram_id, full_name, is_approved)
-        status = "✅" if u[2] else "🚫"
-        kb.button(text=f"{status} {u[1]}", callback_data=f"manage_{u[0]}")
-    
-    kb.button(text="🔙 Orqaga", callback_data="admin_main")
-    kb.adjust(2, 1)
-    
-    await call.message.edit_text(text, reply_markup=kb.as_markup(), parse_mode="HTML")
+@dp.callback_query(F.data == "user_list")
+async def show_users(call: types.CallbackQuery):
+    await render_users_page(call)
+
+@dp.callback_query(F.data.startswith("ulist_"))
+async def users_page_nav(call: types.CallbackQuery):
+    _, direction, user_id = call.data.split("_")
+    if direction == "next":
+        await render_users_page(call, after_id=int(user_id))
+    else:
+        await render_users_page(call, before_id=int(user_id))
+    await call.answer()
+
+@dp.callback_query(F.data == "user_search")
+async def user_search_start(call: types.CallbackQuery, state: FSMContext):
+    if call.from_user.id != ADMIN_ID:
+        return
+    await state.set_state(BotStates.user_search)
+    await call.message.answer("🔎 Foydalanuvchi ismi, @username yoki ID sini yozing:")
+    await call.answer()
+
+@dp.message(BotStates.user_search)
+async def user_search_process(message: types.Message, state: FSMContext):
+    if message.from_user.id != ADMIN_ID:
+        return
+    await state.clear()
+    users = await db.search_users(message.text or "")
+    if not users:
+        await message.answer("❌ Foydalanuvchi topilmadi.")
+        return
+    kb = InlineKeyboardBuilder()
+    user_buttons(kb, users)
+    kb.button(text="🔙 Ro'yxatga qaytish", callback_data="user_list")
+    kb.adjust(2)
+    await message.answer(f"👥 {len(users)} ta foydalanuvchi topildi:", reply_markup=kb.as_markup())
 
-def get_user_detail_content(user_id):
-    user = db_get_user(user_id)
+async def get_user_detail_content(user_id):
+    user = await db.get_user(user_id)
     if not user:
         return None, None
     
@@ -371,7 +589,7 @@ def get_user_detail_content(user_id):
 @dp.callback_query(F.data.startswith("manage_"))
 async def manage_user(call: types.CallbackQuery):
     user_id = int(call.data.split("_")[1])
-    text, reply_markup = get_user_detail_content(user_id)
+    text, reply_markup = await get_user_detail_content(user_id)
     
     if not text:
         await call.answer("Foydalanuvchi topilmadi")
@@ -385,9 +603,10 @@ async def change_user_status(call: types.CallbackQuery):
     user_id = int(user_id)
     
     is_approve = action == "approve"
-    db_set_approval(user_id, 1 if is_approve else 0)
+    await db.set_approval(user_id, 1 if is_approve else 0)
+    await invalidator.publish("users", user_id)
     
-    user = db_get_user(user_id)
+    user = await db.get_user(user_id)
     
     # Adminga yangilash
     await call.answer("Status o'zgardi!")
@@ -397,53 +616,56 @@ async def change_user_status(call: types.CallbackQuery):
     msg_text = call.message.text or ""
     if "Holat:" in msg_text or "Foydalanuvchi" in msg_text:
          # Refresh detail view
-         text, reply_markup = get_user_detail_content(user_id)
+         text, reply_markup = await get_user_detail_content(user_id)
          if text:
              await call.message.edit_text(text, reply_markup=reply_markup, parse_mode="HTML")
     else:
         # Agar bildirishnomadagi tugma bo'lsa
         new_status_text = "✅ Ruxsat berildi" if is_approve else "🚫 Bloklandi"
+        # Tugmalarni olib tashlash; digest xabarida faqat shu foydalanuvchi qatori
+        markup = call.message.reply_markup
+        rows = [row for row in (markup.inline_keyboard if markup else [])
+                if not any(b.callback_data in (f"approve_{user_id}", f"block_{user_id}") for b in row)]
         try:
-            await call.message.edit_reply_markup(reply_markup=None) # Tugmalarni olib tashlash
+            await call.message.edit_reply_markup(reply_markup=types.InlineKeyboardMarkup(inline_keyboard=rows) if rows else None)
             await call.message.reply(f"Foydalanuvchi <b>{user[1]}</b> statusi o'zgardi: {new_status_text}", parse_mode="HTML")
         except:
             pass
 
-    # Foydalanuvchiga xabar yuborish
-    try:
-        if is_approve:
-             await bot.send_message(user_id, "✅ <b>Tabriklaymiz!</b> Sizga admin tomonidan ruxsat berildi.\n\n/start ni bosing.", parse_mode="HTML")
-        else:
-             await bot.send_message(user_id, "🚫 <b>Sizning ruxsatingiz admin tomonidan bekor qilindi.</b>", parse_mode="HTML")
-    except Exception as e:
-        # print(f"Foydalanuvchiga xabar yetib bormadi: {str(e)}")
-        pass
+    # Foydalanuvchiga xabar yuborish (navbat orqali)
+    notify_status_change(user_id, is_approve)
+
+APPROVED_TEXT = "✅ <b>Tabriklaymiz!</b> Sizga admin tomonidan ruxsat berildi.\n\n/start ni bosing."
+REVOKED_TEXT = "🚫 <b>Sizning ruxsatingiz admin tomonidan bekor qilindi.</b>"
+
+def notify_status_change(user_id, is_approve):
+    notifier.send(user_id, APPROVED_TEXT if is_approve else REVOKED_TEXT, parse_mode="HTML")
 
 @dp.callback_query(F.data.startswith("users_manage_"))
 async def bulk_users_manage(call: types.CallbackQuery):
     action = call.data.replace("users_manage_", "")
     
     if action == "approve_all":
-        conn = sqlite3.connect(DB_PATH)
-        conn.execute("UPDATE users SET is_approved = 1")
-        conn.commit()
-        conn.close()
+        changed = await db.set_all_approval(1)
+        await invalidator.publish("users")
         await call.answer("Barcha foydalanuvchilarga ruxsat berildi!", show_alert=True)
-        # Barchaga xabar (ixtiyoriy, hozircha o'chirib turamiz spam bo'lmasligi uchun)
+        # Barchaga xabar: navbat Telegram limitlariga rioya qilib yuboradi
+        for user_id in changed:
+            notify_status_change(user_id, True)
         
     elif action == "revoke_all":
-        conn = sqlite3.connect(DB_PATH)
-        conn.execute("UPDATE users SET is_approved = 0 WHERE telegram_id != ?", (ADMIN_ID,))
-        conn.commit()
-        conn.close()
+        changed = await db.set_all_approval(0, except_id=ADMIN_ID)
+        await invalidator.publish("users")
         await call.answer("Barcha foydalanuvchilar bloklandi!", show_alert=True)
+        for user_id in changed:
+            notify_status_change(user_id, False)
     
     # Check context: if we came from User List, refresh User List
     msg_text = call.message.text or ""
     if "Foydalanuvchilar ro'yxati" in msg_text:
         await show_users(call)
     else:
-        text, reply_markup = get_admin_content()
+        text, reply_markup = await get_admin_content()
         try:
             await call.message.edit_text(text, reply_markup=reply_markup, parse_mode="HTML")
         except:
@@ -458,91 +680,174 @@ async def upload_mode(message: types.Message, state: FSMContext):
 async def receive_subject_name(message: types.Message, state: FSMContext):
     await state.update_data(subject_name=message.text)
     await state.set_state(BotStates.uploading)
-    await message.answer(f"✅ Fan nomi: <b>{message.text}</b> qabul qilindi.\n\nEndi test faylini (.txt) yuboring.")
+    await message.answer(f"✅ Fan nomi: <b>{message.text}</b> qabul qilindi.\n\nEndi test faylini ({', '.join(supported_extensions())}) yuboring.")
 
 @dp.message(BotStates.uploading, F.document)
 async def process_file(message: types.Message, state: FSMContext):
-    if not message.document.file_name.endswith(('.txt', '.text')):
-        await message.answer("❌ Faqat .txt fayl yuklashingiz mumkin!")
+    if parser_for(message.document.file_name) is None:
+        await message.answer(f"❌ Bu fayl turi qabul qilinmaydi. Mumkin: {', '.join(supported_extensions())}")
         return
 
     data = await state.get_data()
     subject_name = data.get("subject_name", message.document.file_name)
 
-    file = await bot.get_file(message.document.file_id)
-    downloaded = await bot.download_file(file.file_path)
-    content = downloaded.read().decode('utf-8')
-    
-    tests = parse_test_file(content)
-    if not tests:
-        await message.answer("❌ Xatolik: ANSWER: A formati topilmadi.")
+    if (message.document.file_size or 0) > UPLOAD_MAX_MB * 1024 * 1024:
+        await message.answer(f"❌ Fayl juda katta (ko'pi bilan {UPLOAD_MAX_MB} MB).")
         return
 
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    is_admin = 1 if message.from_user.id == ADMIN_ID else 0
-    
-    created_at = datetime.now().isoformat()
-    cursor.execute("INSERT INTO test_bases (name, owner_id, created_at, is_admin_base) VALUES (?, ?, ?, ?)",
-                   (subject_name, message.from_user.id, created_at, is_admin))
-    base_id = cursor.lastrowid
-    
-    for t in tests:
-        cursor.execute("INSERT INTO questions (base_id, question_text, full_text, correct_answer) VALUES (?, ?, ?, ?)",
-                       (base_id, t['q'], t['full'], t['ans']))
-    conn.commit()
-    conn.close()
+    status = await message.answer("⏳ Fayl yuklab olinmoqda...")
+    queued = False
+
+    async def show_position(position):
+        nonlocal queued
+        queued = True
+        await status.edit_text(f"⏳ Navbatdasiz: {position}-o'rin...")
+
+    try:
+        # Bir vaqtda UPLOAD_CONCURRENCY ta fayl; qolganlar navbatda, xotirada emas
+        async with upload_queue.slot(message.from_user.id, on_wait=show_position):
+            if queued:
+                await status.edit_text("⏳ Fayl yuklab olinmoqda...")
+            with tempfile.TemporaryFile() as downloaded:
+                started = time.perf_counter()
+                await download_to(bot, message.document.file_id, downloaded, UPLOAD_MAX_MB * 1024 * 1024)
+                download_time = time.perf_counter() - started
+                downloaded.seek(0)
+
+                # Tahlil va bazaga yozish pool threadida bajariladi, event loop band bo'lmaydi;
+                # fayl diskdan bo'laklab o'qiladi, kodlash (UTF-8/UTF-16/cp1251) avtomatik
+                progress = {"count": 0}
+                reporter = asyncio.create_task(report_progress(status, progress))
+                is_admin = 1 if message.from_user.id == ADMIN_ID else 0
+                report = ImportReport()
+                tests = iter_file(message.document.file_name, downloaded, report)
+                started = time.perf_counter()
+                created = {}
+                try:
+                    base_id, count, dups = await db.create_base(subject_name, message.from_user.id, is_admin,
+                                                                tests, progress=lambda n: progress.update(count=n),
+                                                                on_created=lambda b: created.update(base_id=b))
+                except Exception:
+                    # Chala baza db da o'chirildi; keshlar, snapshot va boshqa workerlar - o'chirishdagi kabi
+                    if "base_id" in created:
+                        await drop_base(created["base_id"])
+                    raise
+                finally:
+                    reporter.cancel()
+                save_time = time.perf_counter() - started
+    except (UploadError, ParseError) as e:
+        await status.edit_text(f"❌ {html.quote(str(e))}", parse_mode="HTML")
+        return
+
+    if not base_id:
+        if report.error_count:
+            await status.edit_text("❌ Birorta ham to'g'ri savol topilmadi.\n\n" + format_import_errors(report),
+                                   parse_mode="HTML")
+        else:
+            await status.edit_text("❌ Xatolik: ANSWER: A formati topilmadi.")
+        return
+    await invalidate_base(base_id)
+    try:
+        await write_snapshot(base_id)
+    except OSError:
+        # Birinchi so'rovda qayta urinib ko'riladi
+        logging.exception("Snapshot yozilmadi: baza %s", base_id)
     
-    await message.answer(f"✅ <b>{subject_name}</b> bazasi saqlandi!\n{len(tests)} ta savol qo'shildi.", parse_mode="HTML")
+    dup_text = ""
+    if dups["duplicates"] or dups["near_duplicates"]:
+        dup_text = (f"♻️ {dups['duplicates']} ta savol boshqa bazalarda ham bor (qayta saqlanmadi), "
+                    f"{dups['near_duplicates']} tasi juda o'xshash.\n")
+    error_text = f"\n⚠️ {report.error_count} ta savol o'tkazib yuborildi:\n{format_import_errors(report)}\n" \
+        if report.error_count else ""
+    await status.edit_text(
+        f"✅ <b>{html.quote(subject_name)}</b> bazasi saqlandi!\n{count} ta savol qo'shildi.\n{dup_text}{error_text}\n"
+        f"⏱ Yuklab olish: {download_time:.2f} s | Tahlil va saqlash: {save_time:.2f} s",
+        parse_mode="HTML")
     await state.clear()
 
+def format_import_errors(report, limit=10):
+    lines = [f"• {where}: {html.quote(message)}" for where, message in report.errors[:limit]]
+    if report.error_count > limit:
+        lines.append(f"… va yana {report.error_count - limit} ta")
+    return "\n".join(lines)
+
+async def report_progress(status: types.Message, progress: dict, interval: float = 1.5):
+    shown = 0
+    while True:
+        await asyncio.sleep(interval)
+        if progress["count"] != shown:
+            shown = progress["count"]
+            try:
+                await status.edit_text(f"⏳ Tahlil qilinmoqda... {shown} ta savol saqlandi")
+            except Exception:
+                pass
+
+SEARCH_PAGE_SIZE = 10
+
 @dp.message(F.text == "🔍 Test izlash")
 async def search_mode(message: types.Message, state: FSMContext):
     await state.set_state(BotStates.searching)
+    # Umumiy qidiruv: avval tanlangan baza unutiladi
+    await state.set_data({})
     await message.answer("🔎 Izlayotgan savolingizdan parcha yozing:")
 
-@dp.message(BotStates.searching)
-async def searching_process(message: types.Message):
-    query = message.text
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, question_text, full_text, correct_answer FROM questions WHERE full_text LIKE ? LIMIT 15", (f'%{query}%',))
-    results = cursor.fetchall()
-    
+async def render_search_page(data: dict, after=None, before=None):
+    # data: FSM dagi search_query va search_base_id (None - barcha bazalar)
+    results, has_prev, has_next = await db.search_questions(
+        data["search_query"], SEARCH_PAGE_SIZE, data.get("search_base_id"), after, before)
     if not results:
-        await message.answer("❌ Hech narsa topilmadi.")
+        return "❌ Hech narsa topilmadi.", None
+    builder = InlineKeyboardBuilder()
+    for r in results:
+        builder.button(text=f"🔹 {r[1][:40]}...", callback_data=f"q_{r[0]}")
+    builder.adjust(1)
+    # Sahifa chegarasi: (rank, body_id) - callback_data 64 baytdan oshmaydi
+    nav = []
+    if has_prev:
+        nav.append(types.InlineKeyboardButton(text="⬅️ Oldingi", callback_data=f"sr_prev_{results[0][4]!r}_{results[0][5]}"))
+    if has_next:
+        nav.append(types.InlineKeyboardButton(text="Keyingi ➡️", callback_data=f"sr_next_{results[-1][4]!r}_{results[-1][5]}"))
+    if nav:
+        builder.row(*nav)
+    where = f" ({html.quote(data['search_base_name'])})" if data.get("search_base_id") else ""
+    return f"📚 Natijalar{where}:", builder.as_markup()
+
+@dp.message(BotStates.searching)
+async def searching_process(message: types.Message, state: FSMContext):
+    await state.update_data(search_query=message.text or "")
+    text, markup = await render_search_page(await state.get_data())
+    await message.answer(text, reply_markup=markup, parse_mode="HTML")
+
+@dp.callback_query(F.data.startswith("sr_"))
+async def search_page_nav(call: types.CallbackQuery, state: FSMContext):
+    _, direction, rank, body_id = call.data.split("_")
+    data = await state.get_data()
+    if not data.get("search_query"):
+        await call.answer("Qidiruv eskirgan, qaytadan yozing.", show_alert=True)
+        return
+    cursor = (float(rank), int(body_id))
+    if direction == "next":
+        text, markup = await render_search_page(data, after=cursor)
     else:
-        builder = InlineKeyboardBuilder()
-        for r in results:
-            builder.button(text=f"🔹 {r[1][:40]}...", callback_data=f"q_{r[0]}")
-        builder.adjust(1)
-        await message.answer(f"📚 {len(results)} ta natija:", reply_markup=builder.as_markup())
-    conn.close()
+        text, markup = await render_search_page(data, before=cursor)
+    try:
+        await call.message.edit_text(text, reply_markup=markup, parse_mode="HTML")
+    except TelegramBadRequest:
+        pass
+    await call.answer()
 
 @dp.callback_query(F.data.startswith("q_"))
 async def show_q(call: types.CallbackQuery):
     q_id = call.data.split("_")[1]
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT full_text, correct_answer FROM questions WHERE id = ?", (q_id,))
-    res = cursor.fetchone()
+    res = await db.get_question(q_id)
     if res:
         await call.message.answer(f"✅ <b>Savol:</b>\n\n{html.quote(res[0])}\n\n🎯 <b>Javob: {res[1]}</b>", parse_mode="HTML")
-    conn.close()
 
 @dp.message(F.text == "📚 Mavjud bazalar")
 async def list_bases(message: types.Message, state: FSMContext):
     await state.clear()
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    # 3 kundan oshgan oddiy bazalarni tozalash
-    limit = (datetime.now() - timedelta(days=3)).isoformat()
-    cursor.execute("DELETE FROM test_bases WHERE is_admin_base = 0 AND created_at < ?", (limit,))
-    conn.commit()
-    
-    cursor.execute("SELECT id, name, is_admin_base FROM test_bases")
-    bases = cursor.fetchall()
-    conn.close()
+    # 3 kundan oshgan bazalarni fon vazifasi (expiry.ExpiryJob) o'chiradi
+    bases = await db.list_bases()
 
     if not bases:
         await message.answer("Bazalar mavjud emas.")
@@ -560,43 +865,35 @@ async def base_options(call: types.CallbackQuery, state: FSMContext):
     base_id = call.data.split("_")[1]
     
     # Bazani nomini olish (chiroyli ko'rinishi uchun)
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM test_bases WHERE id = ?", (base_id,))
-    res = cursor.fetchone()
-    conn.close()
-    
-    base_name = res[0] if res else "Tanlangan baza"
+    base_name = await db.get_base_name(base_id) or "Tanlangan baza"
 
     # Agar admin bo'lsa, tanlov beramiz
     if call.from_user.id == ADMIN_ID:
         text = f"📂 <b>{base_name}</b>\n\nNima qilmoqchisiz?"
         kb = InlineKeyboardBuilder()
         kb.button(text="🔍 Qidirish", callback_data=f"searchbase_{base_id}")
+        kb.button(text="📊 Statistika", callback_data=f"bstats_{base_id}")
         kb.button(text="🗑 O'chirib tashlash", callback_data=f"delbase_{base_id}")
         kb.adjust(1)
         await call.message.edit_text(text, reply_markup=kb.as_markup(), parse_mode="HTML")
     else:
         # Oddiy foydalanuvchi uchun to'g'ridan-to'g'ri qidirish
-        await start_search_flow(call.message, state, base_name)
+        await start_search_flow(call.message, state, int(base_id), base_name)
         await call.answer()
 
 @dp.callback_query(F.data.startswith("searchbase_"))
 async def search_base_callback(call: types.CallbackQuery, state: FSMContext):
     base_id = call.data.split("_")[1]
     # Bazani nomini olish
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM test_bases WHERE id = ?", (base_id,))
-    res = cursor.fetchone()
-    conn.close()
-    base_name = res[0] if res else "Baza"
-    
-    await start_search_flow(call.message, state, base_name)
+    base_name = await db.get_base_name(base_id) or "Baza"
+    
+    await start_search_flow(call.message, state, int(base_id), base_name)
     await call.message.delete()
 
-async def start_search_flow(message: types.Message, state: FSMContext, base_name: str):
+async def start_search_flow(message: types.Message, state: FSMContext, base_id: int, base_name: str):
     await state.set_state(BotStates.searching)
+    # Qidiruv shu baza bilan cheklanadi (searching_process FSM dan oladi)
+    await state.set_data({"search_base_id": base_id, "search_base_name": base_name})
     await message.answer(f"🔎 <b>{base_name}</b> bo'yicha qidirishingiz mumkin.\n\nSavoldan parcha yozing:", parse_mode="HTML")
 
 @dp.callback_query(F.data.startswith("delbase_"))
@@ -620,25 +917,77 @@ async def cancel_delete(call: types.CallbackQuery):
 async def delete_base_handler(call: types.CallbackQuery):
     base_id = call.data.split("_")[1]
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    # Savollarni o'chirish
-    cursor.execute("DELETE FROM questions WHERE base_id = ?", (base_id,))
-    # Bazani o'chirish
-    cursor.execute("DELETE FROM test_bases WHERE id = ?", (base_id,))
-    conn.commit()
-    conn.close()
+    # Savollar va bazani o'chirish
+    await db.delete_base(base_id)
+    await drop_base(int(base_id))
     
     await call.message.edit_text("✅ <b>Baza muvaffaqiyatli o'chirildi!</b>", parse_mode="HTML")
 
+# --- STATISTIKA ---
+# Reyting va o'rtacha ko'rsatkichlar db dagi yig'ma jadvallardan olinadi
+# (har bir urinish yozilganda yangilanadi), shuning uchun "Yangilash" arzon.
+
+async def render_base_stats(base_id: int):
+    base_name = await db.get_base_name(base_id)
+    if base_name is None:
+        return "❌ Baza topilmadi.", None
+    stats = await db.get_base_stats(base_id)
+    kb = InlineKeyboardBuilder()
+    kb.button(text="🔄 Yangilash", callback_data=f"bstats_{base_id}")
+    if not stats:
+        return f"📊 <b>{html.quote(base_name)}</b>\n\nHali hech kim imtihon topshirmagan.", kb.as_markup()
+
+    p = stats["duration_percentiles"]
+    text = (
+        f"📊 <b>{html.quote(base_name)}</b>\n\n"
+        f"📝 Urinishlar: {stats['attempts']} ta\n"
+        f"✅ O'rtacha natija: {stats['mean_score']}% ({stats['mean_correct']} ta to'g'ri)\n"
+        f"⏱ Vaqt: o'rtacha {format_duration(stats['mean_duration'])}, "
+        f"p50 ≤ {format_duration(p['p50'])}, p90 ≤ {format_duration(p['p90'])}\n"
+    )
+    if stats["leaderboard"]:
+        text += "\n🏆 <b>Reyting:</b>\n"
+        for i, r in enumerate(stats["leaderboard"], 1):
+            name = html.quote(r["name"] or str(r["user_id"]))
+            text += f"{i}. {name} — {r['correct']}/{r['total']} ({format_duration(r['duration'])})\n"
+    if stats["hardest"]:
+        text += "\n❗ <b>Eng ko'p xato qilingan savollar:</b>\n"
+        for r in stats["hardest"][:5]:
+            question = html.quote((r["question"] or "")[:60])
+            text += f"• {question} — {round(r['miss_rate'] * 100)}% ({r['missed']}/{r['seen']})\n"
+    return text, kb.as_markup()
+
+@dp.message(Command("stats"))
+async def stats_cmd(message: types.Message, command: CommandObject):
+    # /stats 12 - bitta baza; /stats - bazalar ro'yxati
+    if command.args and command.args.strip().isdigit():
+        text, markup = await render_base_stats(int(command.args.strip()))
+        await message.answer(text, reply_markup=markup, parse_mode="HTML")
+        return
+    bases = await db.list_bases()
+    if not bases:
+        await message.answer("Bazalar mavjud emas.")
+        return
+    builder = InlineKeyboardBuilder()
+    for b in bases:
+        builder.button(text=f"📊 {b[1]}", callback_data=f"bstats_{b[0]}")
+    builder.adjust(1)
+    await message.answer("Statistikasini ko'rish uchun bazani tanlang:", reply_markup=builder.as_markup())
+
+@dp.callback_query(F.data.startswith("bstats_"))
+async def base_stats_callback(call: types.CallbackQuery):
+    text, markup = await render_base_stats(int(call.data.split("_")[1]))
+    try:
+        await call.message.edit_text(text, reply_markup=markup, parse_mode="HTML")
+    except TelegramBadRequest:
+        # "message is not modified" - statistika o'zgarmagan
+        pass
+    await call.answer()
+
 @dp.message(F.text == "📝 Imtihon topshirish")
 async def start_exam_list(message: types.Message, state: FSMContext):
     await state.clear()
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name FROM test_bases")
-    bases = cursor.fetchall()
-    conn.close()
+    bases = await db.list_bases()
 
     if not bases:
         await message.answer("Imtihon uchun bazalar yo'q.")
@@ -654,11 +1003,7 @@ async def start_exam_list(message: types.Message, state: FSMContext):
 @dp.message(F.text == "🧠 Yodlash rejimi")
 async def start_memorize_list(message: types.Message, state: FSMContext):
     await state.clear()
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name FROM test_bases")
-    bases = cursor.fetchall()
-    conn.close()
+    bases = await db.list_bases()
 
     if not bases:
         await message.answer("Bazalar mavjud emas.")
@@ -673,122 +1018,124 @@ async def start_memorize_list(message: types.Message, state: FSMContext):
 
 # --- IMAGE GENERATION VA ULASHISH ---
 
-from PIL import Image, ImageDraw, ImageFont
-import os
-from aiogram.types import InlineQueryResultPhoto
-from fastapi.staticfiles import StaticFiles
 import uuid
+from aiogram.types import InlineQueryResultPhoto
+from cards import CARD_SIZE, CardCache
 
 # Statik fayllar uchun papka (Kerak bo'lsa)
 if not os.path.exists("static"):
     os.makedirs("static")
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", CachedStaticFiles(directory="static"), name="static")
+
+# Natija kartochkalari: static/cards/<xesh>.jpg, nomi mazmundan - o'zgarmaydi (CardCache lifespan'da)
+CARD_DIR = os.path.join("static", "cards")
+card_cache = None
+# Urinish natijasi o'zgarmaydi, Telegram inline javobni shuncha soniya keshlaydi
+SHARE_CACHE_TIME = 300
 
 from aiogram.types import InlineQueryResultArticle, InputTextMessageContent
 
-@dp.inline_query(F.query.startswith("res_"))
+async def resolve_share(token: str, user: types.User):
+    # att_{attempt_id} - serverda hisoblangan natija (faqat egasi ulasha oladi).
+    # Eski res_{correct}_{total}_... tokenlari qabul qilinmaydi: ularni istalgan kishi yozib qo'ya oladi
+    parts = token.split('_')
+    if parts[0] != "att" or len(parts) < 2 or not parts[1].isdigit():
+        return None
+    attempt = await db.get_attempt(int(parts[1]))
+    if not attempt or attempt[1] != user.id:
+        return None
+    # attempt: (id, user_id, base_id, seed, correct, total, duration, created_at)
+    return attempt[4], attempt[5], format_duration(attempt[6] or 0), attempt[2]
+
+async def build_result_text(user_name: str, correct: int, total: int, time_str: str, base_id):
+    percentage = round((correct / total) * 100)
+    subject_name = await db.get_base_name(base_id) or "Noma'lum fan"
+    current_date = datetime.now().strftime("%d.%m.%Y %H:%M")
+
+    # Chiroyli matn shakllantirish
+    result_text = (
+        f"🎓 <b>IMTIHON NATIJASI</b>\n\n"
+        f"👤 <b>Talaba:</b> {html.quote(user_name)}\n"
+        f"📚 <b>Fan:</b> {html.quote(subject_name)}\n"
+        f"📅 <b>Sana:</b> {current_date}\n"
+        f"----------------------------------------\n"
+        f"✅ <b>To'g'ri javoblar:</b> {correct} ta\n"
+        f"❌ <b>Xatolar:</b> {total - correct} ta\n"
+        f"📊 <b>Samaradorlik:</b> {percentage}%\n"
+        f"⏱ <b>Sarflangan vaqt:</b> {time_str}\n"
+        f"----------------------------------------\n"
+        f"🤖 <b>Bot orqali test ishlang:</b>\n"
+        f"👉 @study_helperv3_bot"
+    )
+    return result_text, subject_name, percentage
+
+@dp.inline_query(F.query.startswith("att_"))
 async def inline_result_share(inline_query: types.InlineQuery):
-    # Format: res_{correct}_{total}_{time_str}_{base_id}
     try:
-        parts = inline_query.query.split('_')
-        correct = parts[1]
-        total = parts[2]
-        time_str = parts[3]
-        base_id = parts[4]
-        percentage = round((int(correct) / int(total)) * 100)
-        
-        user_name = inline_query.from_user.full_name
-        
-        # Bazani nomini olish
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM test_bases WHERE id = ?", (base_id,))
-        base_res = cursor.fetchone()
-        conn.close()
-        
-        subject_name = base_res[0] if base_res else "Noma'lum fan"
-        current_date = datetime.now().strftime("%d.%m.%Y %H:%M")
-
-        # Chiroyli matn shakllantirish
-        result_text = (
-            f"🎓 <b>IMTIHON NATIJASI</b>\n\n"
-            f"👤 <b>Talaba:</b> {html.quote(user_name)}\n"
-            f"📚 <b>Fan:</b> {html.quote(subject_name)}\n"
-            f"📅 <b>Sana:</b> {current_date}\n"
-            f"----------------------------------------\n"
-            f"✅ <b>To'g'ri javoblar:</b> {correct} ta\n"
-            f"❌ <b>Xatolar:</b> {int(total) - int(correct)} ta\n"
-            f"📊 <b>Samaradorlik:</b> {percentage}%\n"
-            f"⏱ <b>Sarflangan vaqt:</b> {time_str}\n"
-            f"----------------------------------------\n"
-            f"🤖 <b>Bot orqali test ishlang:</b>\n"
-            f"👉 @study_helperv3_bot\n"
-            f"👉 @study_helperv3_bot"
-        )
+        share = await resolve_share(inline_query.query, inline_query.from_user)
+        if share is None:
+            return
+        correct, total, time_str, base_id = share
+        result_text, subject_name, percentage = await build_result_text(
+            inline_query.from_user.full_name, correct, total, time_str, base_id)
         
-        # Natija obyekti (Maqola ko'rinishida)
-        result = InlineQueryResultArticle(
-            id=str(uuid.uuid4()),
-            title=f"✅ Natija: {percentage}%",
-            description=f"{subject_name} | {correct}/{total} to'g'ri",
-            input_message_content=InputTextMessageContent(
-                message_text=result_text,
+        title = f"✅ Natija: {percentage}%"
+        description = f"{subject_name} | {correct}/{total} to'g'ri"
+        card = None
+        if WEB_APP_URL:
+            # Telegram rasmni URL orqali oladi, shuning uchun ochiq WEB_APP_URL kerak
+            try:
+                card = await card_cache.get(correct, total, time_str, base_id, subject_name)
+            except Exception:
+                logging.exception("Natija kartochkasini chizishda xatolik")
+        if card:
+            card_url = f"{WEB_APP_URL}/static/cards/{card}"
+            result = InlineQueryResultPhoto(
+                id=card[:-4],
+                photo_url=card_url,
+                thumbnail_url=card_url,
+                photo_width=CARD_SIZE[0],
+                photo_height=CARD_SIZE[1],
+                title=title,
+                description=description,
+                caption=result_text,
                 parse_mode="HTML"
-            ),
-            thumbnail_url="https://cdn-icons-png.flaticon.com/512/2995/2995620.png" # Test icon
-        )
+            )
+        else:
+            # Rasm bo'lmasa - matnli natija (Maqola ko'rinishida)
+            result = InlineQueryResultArticle(
+                id=str(uuid.uuid4()),
+                title=title,
+                description=description,
+                input_message_content=InputTextMessageContent(
+                    message_text=result_text,
+                    parse_mode="HTML"
+                )
+            )
         
-        await bot.answer_inline_query(inline_query.id, results=[result], cache_time=1)
+        # Matnda foydalanuvchi ismi bor - natija faqat shu foydalanuvchi uchun keshlanadi
+        await bot.answer_inline_query(inline_query.id, results=[result], cache_time=SHARE_CACHE_TIME,
+                                      is_personal=True)
     except Exception as e:
-        print(f"ERROR in inline handler: {e}")
-        # import traceback
-        # traceback.print_exc()
+        logging.exception("Inline natijani tayyorlashda xatolik")
+        metrics.handler_errors.inc(event="inline_query", handler="inline_result_share", error=type(e).__name__)
 
-@dp.message(F.text.startswith("res_") | F.text.contains("res_"))
+@dp.message(F.text.contains("att_"))
 async def text_fallback(message: types.Message):
     # Agar foydalanuvchi adashib matnni yuborib qo'ysa
     try:
         text = message.text
-        if "@" in text:
-            parts = text.split()
-            for p in parts:
-                if p.startswith("res_"):
-                    text = p
-                    break
-        
-        parts = text.split('_')
-        correct = parts[1]
-        total = parts[2]
-        time_str = parts[3]
-        base_id = parts[4]
-        percentage = round((int(correct) / int(total)) * 100)
-        
-        user_name = message.from_user.full_name
-        
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM test_bases WHERE id = ?", (base_id,))
-        base_res = cursor.fetchone()
-        conn.close()
-        subject_name = base_res[0] if base_res else "Noma'lum fan"
-        current_date = datetime.now().strftime("%d.%m.%Y %H:%M")
-
-        result_text = (
-            f"🎓 <b>IMTIHON NATIJASI</b>\n\n"
-            f"👤 <b>Talaba:</b> {html.quote(user_name)}\n"
-            f"📚 <b>Fan:</b> {html.quote(subject_name)}\n"
-            f"� <b>Sana:</b> {current_date}\n"
-            f"----------------------------------------\n"
-            f"✅ <b>To'g'ri javoblar:</b> {correct} ta\n"
-            f"❌ <b>Xatolar:</b> {int(total) - int(correct)} ta\n"
-            f"📊 <b>Samaradorlik:</b> {percentage}%\n"
-            f"⏱ <b>Sarflangan vaqt:</b> {time_str}\n"
-            f"----------------------------------------\n"
-            f"🤖 <b>Bot orqali test ishlang:</b>\n"
-            f"👉 @study_helperv3_bot"
-        )
+        for p in text.split():
+            if p.startswith("att_"):
+                text = p
+                break
         
+        share = await resolve_share(text, message.from_user)
+        if share is None:
+            await message.answer("❌ Natija topilmadi.")
+            return
+        result_text, _, _ = await build_result_text(message.from_user.full_name, *share)
         await message.answer(result_text, parse_mode="HTML")
         
     except Exception as e:
@@ -797,81 +1144,254 @@ async def text_fallback(message: types.Message):
 # --- WEB SERVER QISMI ---
 
 @app.get("/get-tests")
-async def get_tests(base_id: int, mode: str = "exam"):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT full_text, correct_answer FROM questions WHERE base_id = ?", (base_id,))
-    rows = cursor.fetchall()
-    conn.close()
-    
+async def get_tests(request: Request, base_id: int, mode: str = "exam", token: str | None = None,
+                    format: str = "json"):
+    # Savol va variantlar yuklash paytida ajratilgan (parsing.split_question)
+    if mode == "memorize" and format == "bin":
+        # Ixcham binar snapshot (snapshots.py), diskdan; brauzerda decodeSnapshot o'qiydi
+        return respond(request, await payload_cache.get(("snapshot", base_id), load_snapshot_payload))
     if mode == "memorize":
-        selected = rows
-    else:
-        count = min(len(rows), 50)
-        selected = random.sample(rows, count) if rows else []
-    
-    results = []
-    for r in selected:
-        full_text = r[0]
-        # Savol va variantlarni ajratish mantiqi
-        lines = full_text.split('\n')
-        q_text = ""
-        options = {"A": "", "B": "", "C": "", "D": ""}
-        
-        for line in lines:
-            line = line.strip()
-            # Variantlarni aniqlash (A. yoki A) shaklida)
-            if re.match(r'^[A][.)]', line): 
-                options["A"] = re.sub(r'^[A][.)]', '', line).strip()
-            elif re.match(r'^[B][.)]', line): 
-                options["B"] = re.sub(r'^[B][.)]', '', line).strip()
-            elif re.match(r'^[C][.)]', line): 
-                options["C"] = re.sub(r'^[C][.)]', '', line).strip()
-            elif re.match(r'^[D][.)]', line): 
-                options["D"] = re.sub(r'^[D][.)]', '', line).strip()
-            elif line: 
-                # Agar ANSWER: qatori bo'lsa uni savol matniga qo'shmaymiz
-                if "ANSWER:" not in line:
-                    q_text += line + " "
-            
-        results.append({
-            "question": q_text.strip(),
-            "options": options,
-            "ans": r[1]
-        })
-    return results
+        # Butun baza bir marta siqilib keshlanadi; qayta yuklashda ETag -> 304
+        return respond(request, await payload_cache.get(("tests", base_id), load_tests_payload))
+    # Imtihon savollari urinish tokeni bo'yicha (seed serverda qoladi); to'g'ri javoblar
+    # brauzerga yuborilmaydi, natija /submit-exam da hisoblanadi
+    attempt = await exam_attempt(token)
+    if attempt is None or attempt["base_id"] != base_id:
+        return JSONResponse({"error": "invalid attempt"}, status_code=409)
+    questions = await sample_questions(base_id, EXAM_SIZE, attempt["seed"])
+    payload = json_payload([{k: v for k, v in q.items() if k != "ans"} for q in questions], quality=5)
+    return respond(request, payload, "no-store")
+
+class ExamStart(BaseModel):
+    init_data: str
+    base_id: int
+
+class ExamSubmission(BaseModel):
+    init_data: str
+    base_id: int
+    token: str
+    duration: int = 0
+    answers: dict[int, str] = {}
+
+def webapp_user_id(init_data: str | None):
+    # Telegram WebApp initData imzosini bot tokeni bilan tekshirish
+    if not init_data:
+        return None
+    try:
+        data = safe_parse_webapp_init_data(bot.token, init_data)
+    except ValueError:
+        return None
+    return data.user.id if data.user else None
+
+# Urinish tokeni: seed serverda tanlanadi va brauzerga berilmaydi, natija bir marta
+# topshiriladi. Aks holda javoblarni (correct_answers) bir marta ko'rib, xuddi shu
+# savollarni qayta topshirish yoki seed bo'yicha oldindan tanlash mumkin edi
+EXAM_TOKEN_TTL = EXAM_DURATION + 600
+
+async def new_exam_attempt(user_id, base_id):
+    token = secrets.token_urlsafe(18)
+    await kv.set(f"exam:{token}", json.dumps({"user_id": user_id, "base_id": base_id,
+                                              "seed": secrets.randbelow(2 ** 31), "started": time.time()}),
+                 EXAM_TOKEN_TTL)
+    return token
+
+async def exam_attempt(token):
+    value = await kv.get(f"exam:{token}") if token else None
+    return json.loads(value) if value else None
+
+@app.post("/exam-start")
+async def exam_start(start: ExamStart):
+    user_id = webapp_user_id(start.init_data)
+    if user_id is None:
+        return JSONResponse({"error": "unauthorized"}, status_code=401)
+    return {"token": await new_exam_attempt(user_id, start.base_id)}
+
+@app.post("/submit-exam")
+async def submit_exam(submission: ExamSubmission):
+    user_id = webapp_user_id(submission.init_data)
+    if user_id is None:
+        return JSONResponse({"error": "unauthorized"}, status_code=401)
+    key = f"exam:{submission.token}"
+    attempt = await exam_attempt(submission.token)
+    if not attempt or attempt["user_id"] != user_id or attempt["base_id"] != submission.base_id:
+        return JSONResponse({"error": "invalid attempt"}, status_code=409)
+    if "result" in attempt:
+        # Qayta yuborish (javob yo'qolgan bo'lsa ham) - birinchi natija, qayta baholanmaydi
+        return attempt["result"]
+    # Token faqat shu so'rovga olinadi (bir vaqtda ikkinchisi yozolmaydi). Natija yozilsa
+    # token o'rnida saqlanadi, yozilmasa (404, xatolik) token qaytadi - qayta urinish mumkin
+    if await kv.take(key) is None:
+        return JSONResponse({"error": "invalid attempt"}, status_code=409)
+    response = None
+    try:
+        response = await record_exam(user_id, submission, attempt)
+    finally:
+        if isinstance(response, dict):
+            attempt["result"] = response
+        await kv.set(key, json.dumps(attempt), EXAM_TOKEN_TTL)
+    return response
+
+async def record_exam(user_id, submission, attempt):
+    # Seed bo'yicha aynan shu urinishdagi savollar qayta tanlanadi
+    questions = await sample_questions(submission.base_id, EXAM_SIZE, attempt["seed"])
+    if not questions:
+        return JSONResponse({"error": "not found"}, status_code=404)
+    correct, correct_answers = score_exam(questions, submission.answers)
+    # Vaqt ham server soati bilan cheklanadi
+    elapsed = int(time.time() - attempt["started"])
+    duration = max(0, min(submission.duration, EXAM_DURATION, elapsed))
+    attempt_id = await attempt_writer.add({
+        "user_id": user_id,
+        "base_id": submission.base_id,
+        "seed": attempt["seed"],
+        "correct": correct,
+        "total": len(questions),
+        "duration": duration,
+        # Barcha chiqqan savollar (javobsizlari "") - savol statistikasi uchun
+        "answers": {qid: answer_letter(submission.answers.get(qid)) for qid in correct_answers},
+        "missed": [qid for qid, letter in correct_answers.items()
+                   if answer_letter(submission.answers.get(qid)) != letter],
+    })
+    return {
+        "attempt_id": attempt_id,
+        "correct": correct,
+        "total": len(questions),
+        "duration": duration,
+        "correct_answers": correct_answers,
+    }
+
+@app.get("/attempts")
+async def attempts_history(request: Request, user_id: int | None = None, base_id: int | None = None,
+                           before_id: int | None = None, limit: int = 20):
+    # Oddiy foydalanuvchi faqat o'z tarixini ko'radi, admin - hammasini
+    viewer = webapp_user_id(request.headers.get("X-Telegram-Init-Data"))
+    if viewer is None:
+        return JSONResponse({"error": "unauthorized"}, status_code=401)
+    if viewer != ADMIN_ID:
+        user_id = viewer
+    limit = max(1, min(limit, 100))
+    rows = await db.list_attempts(user_id, base_id, before_id, limit)
+    keys = ("id", "user_id", "base_id", "seed", "correct", "total", "duration", "created_at")
+    items = [dict(zip(keys, r)) for r in rows]
+    return {"items": items, "next_before_id": items[-1]["id"] if len(items) == limit else None}
+
+class ReviewItem(BaseModel):
+    question_id: int
+    correct: bool = False
+    quality: int | None = None
+
+class ReviewSubmission(BaseModel):
+    init_data: str
+    base_id: int
+    reviews: list[ReviewItem]
+
+@app.get("/review-batch")
+async def review_batch(request: Request, base_id: int, limit: int = 20, ids_only: bool = False):
+    # Yodlash rejimi: butun baza emas, faqat takrorlash vaqti kelgan savollar.
+    # ids_only - baza brauzerda (IndexedDB) bor, savollar matni yuborilmaydi
+    user_id = webapp_user_id(request.headers.get("X-Telegram-Init-Data"))
+    if user_id is None:
+        return JSONResponse({"error": "unauthorized"}, status_code=401)
+    due_ids, new_ids, due_total = await db.review_batch(user_id, base_id, max(1, min(limit, 100)))
+    if ids_only:
+        return {"ids": due_ids + new_ids, "due": due_total, "new": len(new_ids)}
+    return {
+        "questions": await fetch_questions(base_id, due_ids + new_ids),
+        "due": due_total,
+        "new": len(new_ids),
+    }
+
+@app.post("/reviews")
+async def submit_reviews(submission: ReviewSubmission):
+    user_id = webapp_user_id(submission.init_data)
+    if user_id is None:
+        return JSONResponse({"error": "unauthorized"}, status_code=401)
+    outcomes = [(r.question_id, quality_of(r.correct, r.quality)) for r in submission.reviews[:500]]
+    updated = await db.apply_reviews(user_id, submission.base_id, outcomes)
+    return {"updated": updated}
+
+@app.get("/stats/{base_id}")
+async def base_stats(request: Request, base_id: int, top: int = 10, hardest: int = 10):
+    # Reytingda ism va user_id bor - faqat Telegram foydalanuvchilariga (bot /stats kabi)
+    if webapp_user_id(request.headers.get("X-Telegram-Init-Data")) is None:
+        return JSONResponse({"error": "unauthorized"}, status_code=401)
+    base_name = await db.get_base_name(base_id)
+    if base_name is None:
+        return JSONResponse({"error": "not found"}, status_code=404)
+    stats = await db.get_base_stats(base_id, max(1, min(top, 100)), max(1, min(hardest, 100)))
+    return {"base_id": base_id, "name": base_name, **(stats or {"attempts": 0})}
+
+def cache_metrics(key):
+    caches = {"bases": base_cache, "base_meta": meta_cache, "payloads": payload_cache}
+    return lambda: {(name, ): cache.stats()[key] for name, cache in caches.items()}
+
+metrics.Gauge("cache_hit_ratio", "Kesh hit ulushi", ("cache",), collect=cache_metrics("hit_ratio"))
+metrics.Counter("cache_hits_total", "Kesh hitlari", ("cache",), collect=cache_metrics("hits"))
+metrics.Counter("cache_misses_total", "Kesh misslari", ("cache",), collect=cache_metrics("misses"))
+metrics.Counter("cache_evictions_total", "Keshdan chiqarilganlar", ("cache",), collect=cache_metrics("evictions"))
+metrics.Gauge("cache_bytes", "Keshning taxminiy hajmi", ("cache",), collect=cache_metrics("bytes"))
+metrics.Gauge("upload_queue_waiting", "Navbatda kutayotgan fayl yuklashlar", collect=lambda: {(): upload_queue.pending()})
+metrics.Gauge("upload_active", "Yuklanayotgan/tahlil qilinayotgan fayllar", collect=lambda: {(): upload_queue.active()})
+metrics.Gauge("notify_queue_pending", "Yuborilishini kutayotgan xabarlar", collect=lambda: {(): notifier.pending()})
+metrics.Counter("notify_messages_total", "Notifier hodisalari", ("result",),
+                collect=lambda: {(k,): v for k, v in notifier.stats.items()})
+metrics.Counter("exam_attempts_written_total", "Yozilgan imtihon natijalari",
+                collect=lambda: {(): attempt_writer.stats["written"]})
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache-stats")
+async def cache_stats():
+    return {"bases": base_cache.stats(), "base_meta": meta_cache.stats(), "payloads": payload_cache.stats(),
+            "invalidation": invalidator.stats,
+            "cards": card_cache.info(), "snapshots": snapshot_store.info()}
+
+@app.get("/expiry-stats")
+async def expiry_stats():
+    return expiry_job.stats
+
+# Sahifalar bazaga bog'liq holda bir marta render qilinadi (shablon yangilansa ETag o'zgaradi)
+PAGE_CACHE_CONTROL = "public, max-age=300"
+
+@app.get("/base-version/{base_id}")
+async def base_version(base_id: int):
+    # Brauzerdagi nusxani tekshirish uchun arzon so'rov: snapshot ETag'i (savollar yuborilmaydi)
+    if (await meta_cache.get(base_id, load_base_meta))["name"] is None:
+        return JSONResponse({"error": "not found"}, status_code=404)
+    payload = await payload_cache.get(("snapshot", base_id), load_snapshot_payload)
+    return JSONResponse({"base_id": base_id, "version": payload["etag"], "format": SNAPSHOT_VERSION},
+                        headers={"Cache-Control": "no-cache"})
+
+# Service worker ildizdan beriladi: uning doirasi (scope) /exam/ va /memorize/ sahifalarini qamrashi kerak
+with open(os.path.join("static", "sw.js"), "rb") as f:
+    service_worker_payload = make_payload(f.read(), media_type="text/javascript; charset=utf-8")
+
+@app.get("/sw.js")
+async def service_worker(request: Request):
+    return respond(request, service_worker_payload)
 
 @app.get("/exam/{base_id}", response_class=HTMLResponse)
 async def exam_page(request: Request, base_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM test_bases WHERE id = ?", (base_id,))
-    res = cursor.fetchone()
-    conn.close()
-    subject_name = res[0] if res else "Imtihon"
-    
-    return templates.TemplateResponse("index.html", {
-        "request": request, 
-        "base_id": base_id, 
-        "mode": "exam",
-        "subject_name": subject_name
-    })
+    return respond(request, await payload_cache.get(("exam", base_id), load_page_payload), PAGE_CACHE_CONTROL)
 
 @app.get("/memorize/{base_id}", response_class=HTMLResponse)
 async def memorize_page(request: Request, base_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM test_bases WHERE id = ?", (base_id,))
-    res = cursor.fetchone()
-    conn.close()
-    subject_name = res[0] if res else "Yodlash"
-
-    return templates.TemplateResponse("index.html", {
-        "request": request, 
-        "base_id": base_id, 
-        "mode": "memorize",
-        "subject_name": subject_name
-    })
+    return respond(request, await payload_cache.get(("memorize", base_id), load_page_payload), PAGE_CACHE_CONTROL)
+
+# Webhook: Telegram yangilanishi darhol 200 bilan qabul qilinadi, ishlov fonda
+_webhook_tasks = set()
+
+@app.post(WEBHOOK_PATH)
+async def telegram_webhook(request: Request):
+    if request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+        return JSONResponse({"ok": False}, status_code=403)
+    update = types.Update.model_validate(await request.json(), context={"bot": bot})
+    task = asyncio.create_task(dp.feed_update(bot, update))
+    _webhook_tasks.add(task)
+    task.add_done_callback(_webhook_tasks.discard)
+    return {"ok": True}
 
 async def run_all():
     init_db()
@@ -882,8 +1402,10 @@ async def run_all():
     print("Code ichida WEB_APP_URL ni yangilang!")
     print("="*50 + "\n")
 
-    # Pollingni alohida task sifatida ishga tushiramiz
-    asyncio.create_task(dp.start_polling(bot))
+    if BOT_MODE != "webhook":
+        # Pollingni alohida task sifatida ishga tushiramiz
+        await bot.delete_webhook()
+        asyncio.create_task(dp.start_polling(bot))
     # Uvicorn serverini ishga tushiramiz
     config = uvicorn.Config(app, host="0.0.0.0", port=PORT, log_level="info")
     server = uvicorn.Server(config)
@@ -891,7 +1413,11 @@ async def run_all():
 
 if __name__ == "__main__":
     try:
-        asyncio.run(run_all())
+        if BOT_MODE == "webhook" and WEB_WORKERS > 1:
+            # Har bir worker main:app ni alohida jarayonda yuklaydi
+            uvicorn.run("main:app", host="0.0.0.0", port=PORT, workers=WEB_WORKERS, log_level="info")
+        else:
+            asyncio.run(run_all())
     except (KeyboardInterrupt, SystemExit):
         pass
 
@@ -0,0 +1,166 @@
+# --- METRIKALAR (PROMETHEUS MATN FORMATI) ---
+# Tashqi kutubxonasiz: Counter, Gauge va Histogram /metrics da Prometheus
+# "text exposition" formatida chiqariladi. Qiymatlar jarayon ichida saqlanadi
+# (WEB_WORKERS > 1 bo'lsa har bir worker o'z metrikalarini beradi).
+# DB funksiyalari pool threadlarida ishlaydi, shuning uchun yozish qulf bilan.
+
+import asyncio
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Soniyalar: 1 ms dan 10 s gacha
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + [f'{n}="{v}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labels=(), collect=None):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        # collect() -> {label_qiymatlari_tuple: qiymat}; boshqa joyda hisoblanadigan
+        # qiymatlar (kesh statistikasi ...) /metrics so'ralganda shundan olinadi
+        self.collect = collect
+        self._lock = threading.Lock()
+        self._values = {}
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(n, "") for n in self.labels)
+
+    def render(self):
+        if self.collect is not None:
+            values = dict(self.collect())
+            with self._lock:
+                self._values = values
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in sorted(items):
+            lines.append(f"{self.name}{_labels_text(self.labels, key)} {_number(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = [(key, (list(s[0]), s[1], s[2])) for key, s in self._values.items()]
+        for key, (counts, total, count) in sorted(items):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = _labels_text(self.labels, key, [("le", _number(bound))])
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _labels_text(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {total!r}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- umumiy metrikalar ---
+
+handler_seconds = Histogram("bot_handler_seconds", "aiogram handler bajarilish vaqti", ("event", "handler"))
+handler_errors = Counter("bot_handler_errors_total", "aiogram handlerdagi xatolar", ("event", "handler", "error"))
+http_seconds = Histogram("http_request_seconds", "HTTP so'rovlar vaqti", ("method", "route", "status"))
+db_seconds = Histogram("sqlite_query_seconds", "SQLite so'rovlari (pool threadida) bajarilish vaqti", ("query",))
+db_errors = Counter("sqlite_query_errors_total", "SQLite so'rovlaridagi xatolar", ("query", "error"))
+telegram_seconds = Histogram("telegram_api_seconds", "Telegram Bot API chaqiruvlari kechikishi", ("method",),
+                             buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+telegram_errors = Counter("telegram_api_errors_total", "Telegram Bot API xatolari", ("method", "error"))
+loop_lag = Histogram("event_loop_lag_seconds", "Event loop kechikishi (rejalashtirilgan uyg'onishdan farq)",
+                     buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+
+
+class LoopLagMonitor:
+    # Har interval soniyada uxlab, qancha kech uyg'onganini o'lchaydi
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            loop_lag.observe(max(0.0, loop.time() - started - self.interval))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,172 @@
+# --- XABAR YUBORISH NAVBATI ---
+# Handlerlar bot.send_message ni to'g'ridan-to'g'ri chaqirmaydi: xabar navbatga
+# qo'yiladi va fon ishchisi Telegram limitlariga rioya qilib yuboradi
+# (umumiy ~25 xabar/s, bitta chatga ~1 xabar/s, RetryAfter bo'lsa kutish).
+# Adminga keladigan bir xil bildirishnomalar (yangi foydalanuvchi) bitta
+# "digest" xabarga jamlanadi; har bir qatorning tugmalari (ruxsat/bloklash)
+# xabar klaviaturasida qoladi, ro'yxat uzun bo'lsa bir necha xabarga bo'linadi.
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import Counter, deque
+
+from aiogram.exceptions import (TelegramBadRequest, TelegramForbiddenError,
+                                TelegramRetryAfter)
+from aiogram.types import InlineKeyboardMarkup
+
+log = logging.getLogger(__name__)
+
+# Bitta digest xabaridagi qatorlar: Telegram klaviaturasi 100 tugma,
+# matn 4096 belgi bilan cheklangan (qator boshiga 2 tugma, ~150 belgi)
+DIGEST_MAX_LINES = 25
+
+
+class Notifier:
+    def __init__(self, bot, rate=25.0, per_chat_interval=1.0, digest_window=15.0,
+                 max_inflight=8, max_retries=3):
+        self.bot = bot
+        self.rate = rate
+        self.per_chat_interval = per_chat_interval
+        self.digest_window = digest_window
+        self.max_retries = max_retries
+        self.stats = Counter()
+        self._queues = {}         # chat_id -> deque(xabarlar)
+        self._heap = []           # (ready_at, seq, chat_id)
+        self._scheduled = set()   # navbatda yoki yuborilayotgan chatlar
+        self._seq = itertools.count()
+        self._next_slot = 0.0
+        self._paused_until = 0.0
+        self._digests = {}
+        self._inflight = asyncio.Semaphore(max_inflight)
+        self._tasks = set()
+        self._wakeup = None
+        self._worker = None
+
+    # --- ommaviy API ---
+
+    def send(self, chat_id, text, **kwargs):
+        queue = self._queues.setdefault(chat_id, deque())
+        queue.append({"text": text, "kwargs": kwargs, "attempt": 0})
+        self.stats["queued"] += 1
+        if chat_id not in self._scheduled:
+            self._schedule(chat_id, time.monotonic())
+
+    def send_digest(self, chat_id, key, line, text, title, buttons=(), **kwargs):
+        # Birinchi hodisa darhol to'liq xabar bo'lib ketadi; digest_window ichida
+        # kelgan keyingilari bitta ro'yxat qilib yuboriladi. buttons - shu qator
+        # uchun klaviatura qatori (InlineKeyboardButton ro'yxati)
+        digest = self._digests.get((chat_id, key))
+        if digest is None:
+            self.send(chat_id, text, **kwargs)
+            self._digests[(chat_id, key)] = {"title": title, "lines": [], "rows": []}
+            self._spawn(self._flush_digest(chat_id, key))
+        else:
+            digest["lines"].append(line)
+            digest["rows"].append(list(buttons))
+
+    def pending(self):
+        return sum(len(q) for q in self._queues.values())
+
+    def start(self):
+        if self._worker is None:
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self, drain_timeout=5.0):
+        # Navbatdagi xabarlarni qisqa vaqt yuborishga urinamiz
+        deadline = time.monotonic() + drain_timeout
+        while self.pending() and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        for task in list(self._tasks):
+            task.cancel()
+
+    # --- ichki qism ---
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _schedule(self, chat_id, at):
+        heapq.heappush(self._heap, (at, next(self._seq), chat_id))
+        self._scheduled.add(chat_id)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _flush_digest(self, chat_id, key):
+        await asyncio.sleep(self.digest_window)
+        digest = self._digests.pop((chat_id, key), None)
+        if not digest or not digest["lines"]:
+            return
+        lines, rows = digest["lines"], digest["rows"]
+        for start in range(0, len(lines), DIGEST_MAX_LINES):
+            chunk = lines[start:start + DIGEST_MAX_LINES]
+            text = f"{digest['title']} ({len(chunk)})\n\n" + "\n".join(chunk)
+            keyboard = [row for row in rows[start:start + DIGEST_MAX_LINES] if row]
+            markup = InlineKeyboardMarkup(inline_keyboard=keyboard) if keyboard else None
+            self.send(chat_id, text, parse_mode="HTML", reply_markup=markup)
+        self.stats["digested"] += len(lines)
+
+    async def _sleep_or_wakeup(self, delay):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        while True:
+            if not self._heap:
+                await self._sleep_or_wakeup(None)
+                continue
+            now = time.monotonic()
+            ready_at = max(self._heap[0][0], self._paused_until, self._next_slot)
+            if ready_at > now:
+                await self._sleep_or_wakeup(ready_at - now)
+                continue
+            await self._inflight.acquire()
+            _, _, chat_id = heapq.heappop(self._heap)
+            self._next_slot = max(now, self._next_slot) + 1.0 / self.rate
+            self._spawn(self._deliver(chat_id))
+
+    async def _deliver(self, chat_id):
+        queue = self._queues[chat_id]
+        msg = queue[0]
+        next_at = time.monotonic() + self.per_chat_interval
+        try:
+            await self.bot.send_message(chat_id, msg["text"], **msg["kwargs"])
+            queue.popleft()
+            self.stats["sent"] += 1
+        except TelegramRetryAfter as e:
+            # Flood limit butun bot uchun: hamma yuborishni to'xtatib turamiz
+            self.stats["retry_after"] += 1
+            self._paused_until = time.monotonic() + e.retry_after
+            next_at = self._paused_until
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            # Foydalanuvchi botni bloklagan yoki chat yo'q - qayta urinish foydasiz
+            queue.popleft()
+            self.stats["dropped"] += 1
+            log.info("Xabar %s ga yetmadi: %s", chat_id, e)
+        except Exception as e:
+            msg["attempt"] += 1
+            if msg["attempt"] >= self.max_retries:
+                queue.popleft()
+                self.stats["failed"] += 1
+                log.warning("Xabar %s ga yuborilmadi: %s", chat_id, e)
+            else:
+                self.stats["retried"] += 1
+                next_at = time.monotonic() + 2 ** msg["attempt"]
+        finally:
+            self._inflight.release()
+            if queue:
+                self._schedule(chat_id, next_at)
+            else:
+                del self._queues[chat_id]
+                self._scheduled.discard(chat_id)
@@ -0,0 +1,202 @@
+# --- TEST FAYLLARINI TAHLIL QILISH ---
+# Savol matni fayl yuklanganda bir marta ajratiladi (savol + variantlar)
+# va bazaga tayyor holda yoziladi, /get-tests uni qayta parse qilmaydi.
+
+import codecs
+import itertools
+import re
+
+# A-D har doim variant; E-H faqat variantlar boshlangandan keyin
+OPTION_RE = re.compile(r'^([A-H])[.)]\s*(.*)$')
+# Bir qatordagi variantlar: "A) x B) y" (variant qatorining davomi - "A. x B. y" ham)
+INLINE_OPTION_RE = re.compile(r'(?:^|(?<=\s))([A-H])[.)]\s+')
+# Savol qatorining o'zida faqat "X)" shakli: "A. Qodiriy, B. Navoiy" kabi ismlar variant emas
+INLINE_STEM_OPTION_RE = re.compile(r'(?:^|(?<=\s))([A-H])\)\s+')
+OPTION_LETTERS = "ABCDEFGH"
+BASE_LETTERS = ("A", "B", "C", "D")
+CHUNK_SIZE = 64 * 1024
+# O'zbekcha apostrof variantlari (o'/o‘/oʻ/oʼ ...)
+APOSTROPHES = "'‘’ʻʼ`´"
+
+
+class ParseError(ValueError):
+    # Faylni umuman o'qib bo'lmadi (buzilgan docx, noto'g'ri JSON ...)
+    pass
+
+
+def split_inline(line, first="A", pattern=INLINE_OPTION_RE):
+    # first harfidan boshlab ketma-ket kelgan variantlar: (variantlardan oldingi matn, {harf: matn})
+    picked = []
+    expected = first
+    for m in pattern.finditer(line):
+        if m.group(1) == expected:
+            picked.append(m)
+            expected = chr(ord(expected) + 1)
+    if not picked or (first == "A" and len(picked) < 2):
+        return line, {}
+    options = {}
+    for m, nxt in zip(picked, picked[1:] + [None]):
+        options[m.group(1)] = line[m.end():nxt.start() if nxt else len(line)].strip()
+    return line[:picked[0].start()].strip(), options
+
+
+def split_question(full_text):
+    stem = []
+    options = {L: "" for L in BASE_LETTERS}
+    started = False
+    lines = [line.strip() for line in full_text.split('\n')]
+    # Variantlar alohida qatorlarda bo'lsa savol qatori bo'linmaydi
+    option_lines = any((m := OPTION_RE.match(line)) and m.group(1) in BASE_LETTERS for line in lines)
+    for line in lines:
+        if not line:
+            continue
+        m = OPTION_RE.match(line)
+        if m and (m.group(1) in BASE_LETTERS or started):
+            # "A) x   B) y" - bitta qatorda bir nechta variant bo'lishi mumkin
+            options.update(split_inline(line, m.group(1))[1] or {m.group(1): m.group(2).strip()})
+            started = True
+        elif "ANSWER:" not in line:
+            # Agar ANSWER: qatori bo'lsa uni savol matniga qo'shmaymiz
+            if not started and not option_lines:
+                head, inline = split_inline(line, pattern=INLINE_STEM_OPTION_RE)
+                if inline:
+                    if head:
+                        stem.append(head)
+                    options.update(inline)
+                    started = True
+                    continue
+            stem.append(line)
+    return " ".join(stem), options
+
+
+def make_test(stem, options, answer):
+    # CSV/JSON kabi tuzilgan manbalardan: matnli fayldagi kabi yozuv (full - xesh va qidiruv uchun)
+    stem = " ".join((stem or "").split())
+    merged = {L: "" for L in BASE_LETTERS}
+    merged.update({L: " ".join(str(v).split()) for L, v in options.items() if v is not None})
+    full = "\n".join([stem] + [f"{L}) {v}" for L, v in merged.items() if v])
+    return {"q": stem[:50] or "Savol", "full": full, "ans": answer, "stem": stem, "options": merged}
+
+
+def validate_test(t):
+    # Xato matni yoki None
+    if not t["stem"]:
+        return "savol matni bo'sh"
+    letter = (t["ans"] or "").strip()[:1].upper()
+    if not letter or letter not in OPTION_LETTERS:
+        return f"javob harfi noto'g'ri: {t['ans']!r}" if t["ans"] else "javob ko'rsatilmagan"
+    if sum(1 for v in t["options"].values() if v) < 2:
+        return "variantlar topilmadi (kamida 2 ta kerak)"
+    if not t["options"].get(letter):
+        return f"javob {letter} varianti yo'q"
+    return None
+
+
+class ImportReport:
+    # Qabul qilingan savollar soni va xatolar (joyi bilan); faqat birinchi MAX_ERRORS tasi saqlanadi
+    MAX_ERRORS = 50
+
+    def __init__(self):
+        self.accepted = 0
+        self.error_count = 0
+        self.errors = []
+
+    def error(self, where, message):
+        self.error_count += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append((where, message))
+
+    def check(self, where, test):
+        problem = validate_test(test)
+        if problem:
+            self.error(where, problem)
+            return False
+        self.accepted += 1
+        return True
+
+
+def iter_chunks(fileobj, size=CHUNK_SIZE):
+    return iter(lambda: fileobj.read(size), b"")
+
+
+def detect_encoding(head):
+    # head - faylning boshi (bir necha KB). BOM, BOM'siz UTF-16 (har ikkinchi bayt 0),
+    # keyin UTF-8; bo'lmasa Windows Word eksportlarida ko'p uchraydigan cp1251
+    for bom, encoding in ((codecs.BOM_UTF32_LE, "utf-32"), (codecs.BOM_UTF32_BE, "utf-32"),
+                          (codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"),
+                          (codecs.BOM_UTF16_BE, "utf-16")):
+        if head.startswith(bom):
+            return encoding
+    sample = head[:4096]
+    if len(sample) >= 4:
+        half = len(sample) // 2
+        if sample[1::2].count(0) > half * 0.3:
+            return "utf-16-le"
+        if sample[0::2].count(0) > half * 0.3:
+            return "utf-16-be"
+    try:
+        # Oxiridagi chala UTF-8 belgisi xato emas (final=False)
+        codecs.getincrementaldecoder("utf-8")().decode(head)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp1251"
+
+
+def iter_text(chunks, encoding=None):
+    # Baytlar -> matn bo'laklari. Kodlash birinchi bo'lakdan aniqlanadi; UTF-8 deb
+    # topilgan fayl keyinroq buzilsa, qolgan qismi cp1251 sifatida o'qiladi
+    chunks = iter(chunks)
+    first = next(chunks, b"")
+    encoding = encoding or detect_encoding(first)
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for chunk in itertools.chain([first], chunks):
+        try:
+            yield decoder.decode(chunk)
+        except UnicodeDecodeError:
+            if encoding != "utf-8":
+                raise
+            pending = decoder.getstate()[0]
+            encoding = "cp1251"
+            decoder = codecs.getincrementaldecoder(encoding)()
+            yield decoder.decode(pending + chunk)
+    yield decoder.decode(b"", final=True)
+
+
+def iter_lines(chunks, encoding=None):
+    # Baytlar oqimini qatorlarga bo'lish; butun fayl xotirada bitta satr bo'lmaydi
+    tail = ""
+    for text in iter_text(chunks, encoding):
+        lines = (tail + text).split('\n')
+        tail = lines.pop()
+        for line in lines:
+            yield line.rstrip('\r')
+    yield tail.rstrip('\r')
+
+
+def iter_tests(lines, report=None, unit="qator"):
+    # Har bir "ANSWER:" qatorida bitta savol tayyor bo'ladi. report berilsa savollar
+    # tekshiriladi: yaroqsizlari o'tkazib yuboriladi va savol boshlangan joy bilan yoziladi
+    buf = []
+    start = None
+    for number, line in enumerate(lines, 1):
+        if "ANSWER:" in line:
+            correct = line.split("ANSWER:")[1].strip()
+            full_text = "\n".join(buf).strip()
+            q_title = full_text.split('\n')[0][:50] if full_text else "Savol"
+            stem, options = split_question(full_text)
+            test = {"q": q_title, "full": full_text, "ans": correct,
+                    "stem": stem, "options": options}
+            if report is None or report.check(f"{start or number}-{unit}", test):
+                yield test
+            buf = []
+            start = None
+        else:
+            if start is None and line.strip():
+                start = number
+            buf.append(line)
+    if report is not None and start is not None:
+        report.error(f"{start}-{unit}", "ANSWER: qatori topilmadi")
+
+
+def parse_test_file(content):
+    return list(iter_tests(content.split('\n')))
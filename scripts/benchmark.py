@@ -0,0 +1,322 @@
+# Offlayn yuklama sinovi: sintetik baza yaratadi, soxta Telegram Update'larni
+# haqiqiy Dispatcher (dp) orqali o'tkazadi va web app yo'llarini parallel
+# so'rovlar bilan tekshiradi. Telegram ham, tarmoq ham kerak emas: bot
+# fakebot.FakeSession bilan, HTTP esa ASGI ilovasini to'g'ridan-to'g'ri chaqiradi.
+#
+#   python scripts/benchmark.py --bases 20 --questions 500 --users 200 --output before.json
+#   python scripts/benchmark.py ... --output after.json --compare before.json
+#
+# Natija JSON: har bir handler va yo'l uchun p50/p95/p99 (ms) va so'rov/soniya.
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORDS = ("hujayra membrana oqsil ferment genetik kod xromosoma mitoz meyoz fotosintez nafas olish "
+         "energiya molekula atom elektron yadro reaksiya tezlik harorat bosim hajm massa kuch tezlanish "
+         "impuls ish quvvat tok kuchlanish qarshilik magnit maydon to'lqin chastota davr amplituda "
+         "tenglama funksiya hosila integral limit matritsa vektor determinant ehtimollik statistika "
+         "tarix davlat qonun iqtisod bozor narx talab taklif inflyatsiya soliq byudjet eksport import").split()
+
+# token - shu baza uchun imtihon urinish tokeni (main.new_exam_attempt)
+ENDPOINTS = {
+    "get-tests/exam": lambda base_id, token: f"/get-tests?base_id={base_id}&mode=exam&token={token}",
+    "get-tests/memorize": lambda base_id, token: f"/get-tests?base_id={base_id}&mode=memorize",
+    "get-tests/memorize-bin": lambda base_id, token: f"/get-tests?base_id={base_id}&mode=memorize&format=bin",
+    "exam": lambda base_id, token: f"/exam/{base_id}",
+    "memorize": lambda base_id, token: f"/memorize/{base_id}",
+}
+EXAM_TOKENS_PER_BASE = 20
+
+
+def percentile(sorted_values, p):
+    # Eng yaqin rang usuli; sorted_values bo'sh bo'lmasligi kerak
+    index = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    values = sorted(latencies)
+    result = {"count": len(values), "errors": errors,
+              "rps": round(len(values) / elapsed, 1) if elapsed else 0.0}
+    if values:
+        result.update({
+            "mean_ms": round(sum(values) / len(values) * 1000, 3),
+            "p50_ms": round(percentile(values, 50) * 1000, 3),
+            "p95_ms": round(percentile(values, 95) * 1000, 3),
+            "p99_ms": round(percentile(values, 99) * 1000, 3),
+            "max_ms": round(values[-1] * 1000, 3),
+        })
+    return result
+
+
+# --- SINTETIK BAZA ---
+
+def synthetic_lines(rnd, count):
+    # parsing.iter_tests kutadigan format: savol, A)-D) variantlar, "ANSWER: X"
+    for i in range(count):
+        yield f"{i + 1}. {' '.join(rnd.choices(WORDS, k=rnd.randint(8, 16))).capitalize()}?"
+        for letter in "ABCD":
+            yield f"{letter}) {' '.join(rnd.choices(WORDS, k=rnd.randint(1, 4)))}"
+        yield f"ANSWER: {rnd.choice('ABCD')}"
+
+
+async def generate(args, rnd):
+    import db
+    from parsing import iter_tests
+
+    started = time.perf_counter()
+    base_ids = []
+    for n in range(args.bases):
+        base_id, _, _ = await db.create_base(f"Bench {n + 1}", 1, 0,
+                                             iter_tests(synthetic_lines(rnd, args.questions)))
+        base_ids.append(base_id)
+    user_ids = list(range(100000, 100000 + args.users))
+    for user_id in user_ids:
+        await db.upsert_user(user_id, f"Bench {user_id}", f"bench{user_id}", 1)
+    return base_ids, user_ids, time.perf_counter() - started
+
+
+# --- BOT: UPDATE'LARNI DISPATCHER ORQALI O'TKAZISH ---
+
+def user_script(user_id, base_ids, max_question_id, rnd):
+    # Bitta foydalanuvchining odatiy seansi; FSM tartibi uchun ketma-ket yuboriladi
+    from fake_update import make_callback_update, make_message_update
+
+    base_id = rnd.choice(base_ids)
+    word = rnd.choice(WORDS)
+    # (yorliq, update): yorliq bo'yicha kechikishlar alohida yig'iladi
+    return [
+        ("message:/start", make_message_update(user_id, "/start")),
+        ("message:bazalar", make_message_update(user_id, "📚 Mavjud bazalar")),
+        ("callback:bset_", make_callback_update(user_id, f"bset_{base_id}")),
+        ("message:qidiruv (baza)", make_message_update(user_id, word)),
+        ("callback:q_", make_callback_update(user_id, f"q_{rnd.randint(1, max_question_id)}")),
+        ("message:test izlash", make_message_update(user_id, "🔍 Test izlash")),
+        ("message:qidiruv (hammasi)", make_message_update(user_id, word)),
+        ("message:imtihon", make_message_update(user_id, "📝 Imtihon topshirish")),
+        ("message:yodlash", make_message_update(user_id, "🧠 Yodlash rejimi")),
+        ("message:/stats", make_message_update(user_id, f"/stats {base_id}")),
+    ]
+
+
+async def run_bot(args, base_ids, user_ids, rnd):
+    import main
+    from aiogram import types
+
+    scripts = [user_script(user_id, base_ids, args.bases * args.questions, rnd)
+               for _ in range(args.rounds) for user_id in user_ids]
+    latencies = {}
+    errors = {}
+    queue = asyncio.Queue()
+    for script in scripts:
+        queue.put_nowait(script)
+
+    async def worker():
+        while not queue.empty():
+            for label, raw in queue.get_nowait():
+                update = types.Update.model_validate(raw, context={"bot": main.bot})
+                started = time.perf_counter()
+                try:
+                    await main.dp.feed_update(main.bot, update)
+                except Exception:
+                    errors[label] = errors.get(label, 0) + 1
+                latencies.setdefault(label, []).append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    total = [t for values in latencies.values() for t in values]
+    result = {"total": summarize(total, sum(errors.values()), elapsed)}
+    for label in sorted(latencies):
+        result[label] = summarize(latencies[label], errors.get(label, 0), elapsed)
+    result["telegram_calls"] = len(main.bot.session.requests)
+    return result
+
+
+# --- HTTP: ASGI ILOVASINI TO'G'RIDAN-TO'G'RI CHAQIRISH ---
+
+async def asgi_get(app, path, headers):
+    # Tarmoq qatlamisiz bitta GET; (status, javob hajmi) qaytadi
+    raw_path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": raw_path, "raw_path": raw_path.encode(), "root_path": "",
+        "query_string": query.encode(), "server": ("bench", 80), "client": ("127.0.0.1", 50000),
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+    }
+    response = {"status": 0, "size": 0}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["size"] += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return response["status"], response["size"]
+
+
+async def run_http(args, base_ids, rnd):
+    import main
+
+    headers = {"host": "bench", "accept-encoding": args.accept_encoding}
+    # Har bir token o'z savollar tanlovini beradi
+    tokens = {base_id: [await main.new_exam_attempt(1, base_id) for _ in range(EXAM_TOKENS_PER_BASE)]
+              for base_id in base_ids}
+    results = {}
+    # Har bir yo'l alohida o'lchanadi: so'rov/soniya boshqa yo'llarga bog'liq bo'lmaydi
+    for name, make_path in ENDPOINTS.items():
+        paths = []
+        for _ in range(args.requests):
+            base_id = rnd.choice(base_ids)
+            paths.append(make_path(base_id, rnd.choice(tokens[base_id])))
+        latencies = []
+        errors = 0
+        sizes = 0
+        iterator = iter(paths)
+
+        async def worker():
+            nonlocal errors, sizes
+            for path in iterator:
+                started = time.perf_counter()
+                status, size = await asgi_get(main.app, path, headers)
+                latencies.append(time.perf_counter() - started)
+                sizes += size
+                if status != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        results[name] = summarize(latencies, errors, time.perf_counter() - started)
+        results[name]["mean_bytes"] = sizes // max(1, len(latencies))
+    return results
+
+
+# --- QIDIRUV: BUTUN KORPUS VA BITTA BAZA ---
+
+async def run_search(args, base_ids, rnd):
+    # Bazadagi qidiruv korpus hajmiga emas, baza hajmiga bog'liq bo'lishi kerak:
+    # "baza" ustuni "hammasi" dan sezilarli tez bo'lmasa, FTS butun korpusni o'qiyapti
+    import db
+
+    results = {}
+    for name, scope in (("search/global", lambda: None), ("search/base", lambda: rnd.choice(base_ids))):
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(args.requests):
+            word, base_id = rnd.choice(WORDS)[:rnd.randint(3, 5)], scope()
+            t = time.perf_counter()
+            await db.search_questions(word, base_id=base_id)
+            latencies.append(time.perf_counter() - t)
+        results[name] = summarize(latencies, 0, time.perf_counter() - started)
+    return results
+
+
+# --- NATIJALAR ---
+
+def print_table(title, section, baseline=None):
+    print(f"\n{title}", file=sys.stderr)
+    print(f"  {'':32} {'count':>7} {'err':>5} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9}", file=sys.stderr)
+    for label, s in section.items():
+        if not isinstance(s, dict) or not s.get("count"):
+            continue
+        line = (f"  {label[:32]:32} {s['count']:>7} {s['errors']:>5} {s['rps']:>9} "
+                f"{s['p50_ms']:>9} {s['p95_ms']:>9} {s['p99_ms']:>9}")
+        old = (baseline or {}).get(label)
+        if old and old.get("count"):
+            # Avvalgi natijaga nisbatan: p95 va rps o'zgarishi
+            line += (f"   p95 {(s['p95_ms'] / old['p95_ms'] - 1) * 100 if old['p95_ms'] else 0:+.0f}%"
+                     f" rps {(s['rps'] / old['rps'] - 1) * 100 if old['rps'] else 0:+.0f}%")
+        print(line, file=sys.stderr)
+
+
+async def run(args):
+    import main
+
+    rnd = random.Random(args.seed)
+    async with main.lifespan(main.app):
+        base_ids, user_ids, generate_seconds = await generate(args, rnd)
+        bot_results = await run_bot(args, base_ids, user_ids, rnd)
+        http_results = await run_http(args, base_ids, rnd)
+        search_results = await run_search(args, base_ids, rnd)
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "data_dir", "keep")},
+        "environment": {"python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                        "platform": platform.platform()},
+        "setup": {"generate_seconds": round(generate_seconds, 3),
+                  "questions": len(base_ids) * args.questions},
+        "bot": bot_results,
+        "http": http_results,
+        "search": search_results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bases", type=int, default=10)
+    parser.add_argument("--questions", type=int, default=300, help="har bir bazadagi savollar soni")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=1, help="har bir foydalanuvchi seanslari soni")
+    parser.add_argument("--requests", type=int, default=500, help="har bir HTTP yo'l uchun so'rovlar")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--accept-encoding", default="gzip, br")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--data-dir", help="sintetik baza uchun papka (standart: vaqtinchalik)")
+    parser.add_argument("--keep", action="store_true", help="vaqtinchalik bazani o'chirmaslik")
+    parser.add_argument("--output", help="JSON natija fayli (standart: stdout)")
+    parser.add_argument("--compare", help="avvalgi JSON natija bilan solishtirish")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="studyhelper-bench-")
+    if os.path.exists(os.path.join(data_dir, "test_bot.db")):
+        parser.error(f"{data_dir} da test_bot.db bor - bo'sh papka bering")
+    # main import qilinishidan oldin: Telegram'siz, polling rejimi (webhook o'rnatilmaydi)
+    os.environ.update({"DATA_DIR": data_dir, "FAKE_TELEGRAM": "1", "BOT_MODE": "polling"})
+    os.environ.pop("BOT_TOKEN", None)
+    os.chdir(ROOT)
+    sys.path[:0] = [ROOT, os.path.join(ROOT, "scripts")]
+
+    import main as app_main
+    logging.disable(logging.WARNING)
+    app_main.bot.session.log = False
+
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if not args.data_dir and not args.keep:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print(f"Baza: {results['setup']['questions']} savol, {results['setup']['generate_seconds']} s", file=sys.stderr)
+    print_table("Bot (Dispatcher.feed_update), ms", results["bot"], baseline.get("bot"))
+    print_table("HTTP (ASGI), ms", results["http"], baseline.get("http"))
+    print_table("Qidiruv (db.search_questions), ms", results["search"], baseline.get("search"))
+
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
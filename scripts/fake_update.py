@@ -0,0 +1,100 @@
+# Webhook rejimini lokal sinash: soxta Telegram Update'larni /webhook ga POST qiladi.
+#
+#   FAKE_TELEGRAM=1 BOT_MODE=webhook WEB_APP_URL=http://localhost:8000 python main.py
+#   python scripts/fake_update.py --text /start --user-id 42
+#   python scripts/fake_update.py --callback user_list --user-id 42 --count 100 --concurrency 20
+#
+# WEBHOOK_SECRET main.py dagi kabi hisoblanadi (yoki muhit o'zgaruvchisidan olinadi).
+
+import argparse
+import hashlib
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+_update_ids = itertools.count(int(time.time()))
+
+
+def make_user(user_id):
+    return {"id": user_id, "is_bot": False, "first_name": f"Test {user_id}", "username": f"test{user_id}"}
+
+
+def make_message_update(user_id, text):
+    update_id = next(_update_ids)
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": make_user(user_id),
+            "text": text,
+        },
+    }
+
+
+def make_callback_update(user_id, data):
+    update_id = next(_update_ids)
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": make_user(user_id),
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": 1,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "text": "",
+            },
+        },
+    }
+
+
+def default_secret():
+    secret = os.getenv("WEBHOOK_SECRET")
+    if secret:
+        return secret
+    return hashlib.sha256(os.getenv("BOT_TOKEN", "").encode()).hexdigest()[:32]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000/webhook")
+    parser.add_argument("--secret", default=default_secret())
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--text", default="/start")
+    parser.add_argument("--callback", help="matn o'rniga callback_query yuborish")
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+
+    headers = {"X-Telegram-Bot-Api-Secret-Token": args.secret}
+
+    def post(i):
+        user_id = args.user_id + i
+        if args.callback:
+            update = make_callback_update(user_id, args.callback)
+        else:
+            update = make_message_update(user_id, args.text)
+        started = time.perf_counter()
+        resp = requests.post(args.url, json=update, headers=headers, timeout=30)
+        return resp.status_code, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(post, range(args.count)))
+    elapsed = time.perf_counter() - started
+
+    ok = sum(1 for status, _ in results if status == 200)
+    latencies = sorted(t for _, t in results)
+    print(f"{ok}/{len(results)} OK, {len(results) / elapsed:.1f} req/s, "
+          f"p50={latencies[len(latencies) // 2] * 1000:.1f} ms, max={latencies[-1] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
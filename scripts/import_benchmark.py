@@ -0,0 +1,171 @@
+# Import parserlari uchun benchmark: har bir formatda (txt, txt cp1251, txt bir
+# qatorli variantlar, docx, csv, json, jsonl) katta sintetik fayl yaratadi va
+# tahlil vaqtini o'lchaydi; --db bilan bazaga yozish (db.create_base) ham.
+#
+#   python scripts/import_benchmark.py --questions 10000
+#   python scripts/import_benchmark.py --questions 10000 --db --output import.json
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from xml.sax.saxutils import escape
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "scripts")]
+
+from benchmark import WORDS  # noqa: E402
+
+
+def synthetic_questions(rnd, count):
+    for i in range(count):
+        stem = f"{i + 1}. {' '.join(rnd.choices(WORDS, k=rnd.randint(8, 16))).capitalize()}?"
+        options = [" ".join(rnd.choices(WORDS, k=rnd.randint(1, 4))) for _ in range(4)]
+        yield stem, options, rnd.choice("ABCD")
+
+
+def write_txt(path, questions, encoding="utf-8", inline=False):
+    with open(path, "w", encoding=encoding, newline="") as f:
+        for stem, options, answer in questions:
+            if inline:
+                f.write(stem + " " + " ".join(f"{L}) {o}" for L, o in zip("ABCD", options)) + "\r\n")
+            else:
+                f.write(stem + "\r\n" + "".join(f"{L}) {o}\r\n" for L, o in zip("ABCD", options)))
+            f.write(f"ANSWER: {answer}\r\n")
+
+
+def write_csv(path, questions):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(["savol", "A", "B", "C", "D", "javob"])
+        for stem, options, answer in questions:
+            writer.writerow([stem, *options, answer])
+
+
+def write_json(path, questions, lines=False):
+    items = ({"question": stem, "options": options, "answer": "ABCD".index(answer) + 1}
+             for stem, options, answer in questions)
+    with open(path, "w", encoding="utf-8") as f:
+        if lines:
+            for item in items:
+                f.write(json.dumps(item, ensure_ascii=False) + "\n")
+        else:
+            json.dump({"questions": list(items)}, f, ensure_ascii=False)
+
+
+def write_docx(path, questions):
+    # Eng kichik yaroqli docx: savol va variantlar alohida paragraflar
+    ns = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+    body = io.StringIO()
+    for stem, options, answer in questions:
+        for text in [stem, *(f"{L}) {o}" for L, o in zip("ABCD", options)), f"ANSWER: {answer}"]:
+            body.write(f"<w:p><w:r><w:t xml:space=\"preserve\">{escape(text)}</w:t></w:r></w:p>")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml",
+                   '<?xml version="1.0" encoding="UTF-8"?><Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                   '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                   '<Default Extension="xml" ContentType="application/xml"/>'
+                   '<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+                   '</Types>')
+        z.writestr("_rels/.rels",
+                   '<?xml version="1.0" encoding="UTF-8"?><Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                   '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>'
+                   '</Relationships>')
+        z.writestr("word/document.xml",
+                   f'<?xml version="1.0" encoding="UTF-8"?><w:document xmlns:w="{ns}"><w:body>{body.getvalue()}</w:body></w:document>')
+
+
+SAMPLES = {
+    "txt": ("bank.txt", lambda p, q: write_txt(p, q)),
+    "txt-cp1251": ("bank-cp1251.txt", lambda p, q: write_txt(p, q, encoding="cp1251")),
+    "txt-utf16": ("bank-utf16.txt", lambda p, q: write_txt(p, q, encoding="utf-16")),
+    "txt-inline": ("bank-inline.txt", lambda p, q: write_txt(p, q, inline=True)),
+    "docx": ("bank.docx", write_docx),
+    "csv": ("bank.csv", write_csv),
+    "json": ("bank.json", write_json),
+    "jsonl": ("bank.jsonl", lambda p, q: write_json(p, q, lines=True)),
+}
+
+
+def parse_file(path):
+    from importers import iter_file
+    from parsing import ImportReport
+
+    report = ImportReport()
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        count = sum(1 for _ in iter_file(path, f, report))
+    return count, report, time.perf_counter() - started
+
+
+async def import_file(path, n):
+    import db
+    from importers import iter_file
+    from parsing import ImportReport
+
+    report = ImportReport()
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        base_id, count, _ = await db.create_base(f"Import {n}", 1, 0, iter_file(path, f, report))
+    return count, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=10000)
+    parser.add_argument("--formats", default=",".join(SAMPLES), help="vergul bilan: " + ",".join(SAMPLES))
+    parser.add_argument("--db", action="store_true", help="bazaga yozishni ham o'lchash (vaqtinchalik baza)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="JSON natija fayli (standart: stdout)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="studyhelper-import-")
+    results = {"questions": args.questions, "formats": {}}
+    try:
+        for name in args.formats.split(","):
+            filename, writer = SAMPLES[name]
+            path = os.path.join(workdir, filename)
+            # Har bir format bir xil savollardan (seed bir xil)
+            writer(path, synthetic_questions(random.Random(args.seed), args.questions))
+            count, report, seconds = parse_file(path)
+            results["formats"][name] = {
+                "bytes": os.path.getsize(path),
+                "parsed": count,
+                "errors": report.error_count,
+                "parse_seconds": round(seconds, 3),
+                "questions_per_second": round(count / seconds) if seconds else 0,
+            }
+            print(f"{name:12} {count:>7} savol  {report.error_count:>4} xato  {seconds:7.3f} s  "
+                  f"{os.path.getsize(path) / 1e6:6.1f} MB", file=sys.stderr)
+
+        if args.db:
+            import db
+            db.init(os.path.join(workdir, "test_bot.db"))
+            try:
+                for n, name in enumerate(args.formats.split(",")):
+                    count, seconds = asyncio.run(import_file(os.path.join(workdir, SAMPLES[name][0]), n))
+                    results["formats"][name]["import_seconds"] = round(seconds, 3)
+                    print(f"{name:12} bazaga yozish: {seconds:7.3f} s", file=sys.stderr)
+            finally:
+                db.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# --- BAZA SNAPSHOTLARI (IXCHAM BINAR FORMAT) ---
+# Yodlash rejimi butun bazani yuklaydi. JSON'da har bir savol uchun
+# "question", "options", "A".."D", "ans" kalitlari takrorlanadi; snapshot
+# faylida faqat matnlar (uzunlik + UTF-8) va kichik sonlar qoladi. Fayl
+# baza yuklanganda bir marta yoziladi va so'rovda diskdan o'qiladi (bazaga
+# murojaat yo'q). templates/index.html dagi decodeSnapshot shu formatni o'qiydi.
+#
+# Format (barcha sonlar - unsigned LEB128 varint):
+#   "SHB" + versiya bayti
+#   savollar soni
+#   har bir savol: id farqi (zigzag, oldingi id dan), javob (harf indeksi + 1, 0 - yo'q),
+#                  savol matni, variantlar soni, har bir variant: harf indeksi, matn
+#   matn: bayt uzunligi + UTF-8
+
+import glob
+import os
+
+from attempts import answer_letter
+from parsing import OPTION_LETTERS
+
+# Format o'zgarsa versiyani oshiring (templates/index.html dagi SNAPSHOT_VERSION ham).
+# 2: javob answer_letter bilan normallashtiriladi ("b", "B)", " A" ham)
+SNAPSHOT_VERSION = 2
+MAGIC = b"SHB"
+MEDIA_TYPE = "application/octet-stream"
+
+
+def _varint(out, n):
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _string(out, text):
+    data = (text or "").encode()
+    _varint(out, len(data))
+    out += data
+
+
+def _letter(value):
+    # "A".."H" -> 0..7 (imtihon baholashdagi kabi: birinchi belgi, katta harf); boshqasi None
+    letter = answer_letter(value) if isinstance(value, str) else ""
+    return OPTION_LETTERS.index(letter) if letter and letter in OPTION_LETTERS else None
+
+
+def encode(questions):
+    # questions: main.question_dict yozuvlari ({"id", "question", "options", "ans"})
+    out = bytearray(MAGIC)
+    out.append(SNAPSHOT_VERSION)
+    _varint(out, len(questions))
+    previous = 0
+    for q in questions:
+        delta = q["id"] - previous
+        previous = q["id"]
+        _varint(out, delta * 2 if delta >= 0 else -delta * 2 - 1)
+        answer = _letter(q.get("ans"))
+        _varint(out, 0 if answer is None else answer + 1)
+        _string(out, q["question"])
+        options = [(_letter(L), text) for L, text in (q["options"] or {}).items()]
+        options = [(i, text) for i, text in options if i is not None]
+        _varint(out, len(options))
+        for i, text in options:
+            _varint(out, i)
+            _string(out, text)
+    return bytes(out)
+
+
+def decode(data):
+    # Python tomonidagi o'quvchi (tekshirish va skriptlar uchun), JS decodeSnapshot bilan bir xil
+    if data[:3] != MAGIC or data[3] != SNAPSHOT_VERSION:
+        raise ValueError("snapshot formati noma'lum")
+    pos = 4
+
+    def varint():
+        nonlocal pos
+        n = shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            n |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return n
+            shift += 7
+
+    def string():
+        nonlocal pos
+        size = varint()
+        pos += size
+        return data[pos - size:pos].decode()
+
+    questions = []
+    previous = 0
+    for _ in range(varint()):
+        z = varint()
+        previous += z // 2 if z % 2 == 0 else -(z + 1) // 2
+        answer = varint()
+        stem = string()
+        options = {}
+        for _ in range(varint()):
+            letter = OPTION_LETTERS[varint()]
+            options[letter] = string()
+        questions.append({"id": previous, "question": stem, "options": options,
+                          "ans": OPTION_LETTERS[answer - 1] if answer else ""})
+    return questions
+
+
+class SnapshotStore:
+    # DATA_DIR/snapshots/<base_id>.v<versiya>.bin; barcha workerlar bir papkani ko'radi
+    def __init__(self, directory):
+        self.directory = directory
+        self.stats = {"written": 0, "read": 0, "missing": 0, "deleted": 0}
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, base_id):
+        return os.path.join(self.directory, f"{int(base_id)}.v{SNAPSHOT_VERSION}.bin")
+
+    def write(self, base_id, questions):
+        # Sinxron (thread'da chaqiriladi); o'quvchi hech qachon chala faylni ko'rmaydi
+        data = encode(questions)
+        path = self.path(base_id)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self.stats["written"] += 1
+        return data
+
+    def read(self, base_id):
+        try:
+            with open(self.path(base_id), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            self.stats["missing"] += 1
+            return None
+        self.stats["read"] += 1
+        return data
+
+    def delete(self, base_id):
+        # Barcha versiyalari
+        for path in glob.glob(os.path.join(self.directory, f"{int(base_id)}.v*.bin")):
+            try:
+                os.unlink(path)
+                self.stats["deleted"] += 1
+            except FileNotFoundError:
+                pass
+
+    def prune(self):
+        # Ishga tushganda: eski versiya fayllari (yangi format birinchi so'rovda qayta yoziladi)
+        suffix = f".v{SNAPSHOT_VERSION}.bin"
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".bin") and not entry.name.endswith(suffix):
+                try:
+                    os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def info(self):
+        files = [e for e in os.scandir(self.directory) if e.name.endswith(".bin")]
+        return {**self.stats, "files": len(files), "bytes": sum(e.stat().st_size for e in files),
+                "version": SNAPSHOT_VERSION}
@@ -0,0 +1,36 @@
+# --- TAKRORLASH JADVALI (SM-2) ---
+# Yodlash rejimida har bir (foydalanuvchi, savol) uchun holat saqlanadi:
+# ease (osonlik koeffitsienti), interval (kun), reps (ketma-ket to'g'ri javoblar).
+# Web app faqat vaqti kelgan savollarni oladi va javoblarni to'plab yuboradi.
+
+DAY = 24 * 60 * 60
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+# Xato javob berilgan savol shu sessiyada yoki keyingisida yana chiqishi uchun
+RELEARN_DELAY = 10 * 60
+
+
+def quality_of(correct, quality=None):
+    # Web app faqat to'g'ri/noto'g'ri yuboradi; aniq baho (0-5) berilsa o'sha olinadi
+    if quality is not None:
+        return max(0, min(5, int(quality)))
+    return 4 if correct else 1
+
+
+def sm2(ease, interval, reps, quality):
+    # Klassik SM-2: (ease, interval_kun, reps) -> yangi holat va keyingi takrorgacha soniya
+    if quality < 3:
+        reps = 0
+        interval = 0
+        delay = RELEARN_DELAY
+    else:
+        reps += 1
+        if reps == 1:
+            interval = 1
+        elif reps == 2:
+            interval = 6
+        else:
+            interval = round(interval * ease)
+        delay = interval * DAY
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    return ease, interval, reps, delay
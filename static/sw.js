@@ -0,0 +1,58 @@
+// --- SERVICE WORKER: WEB APP QOBIG'I ---
+// Sahifalar (/exam/{id}, /memorize/{id}) va telegram-web-app.js keshdan darhol
+// beriladi va fonda yangilanadi (stale-while-revalidate). API javoblari
+// (savollar, natijalar) bu yerda keshlanmaydi: yodlash bazasi sahifaning
+// o'zida IndexedDB'da versiyasi bilan saqlanadi (templates/index.html).
+// Qobiq o'zgarsa SHELL_CACHE versiyasini oshiring - eski kesh o'chadi.
+
+const SHELL_CACHE = 'studyhelper-shell-v2';
+const TELEGRAM_JS = 'https://telegram.org/js/telegram-web-app.js';
+const PAGE_RE = /^\/(exam|memorize)\/\d+$/;
+
+self.addEventListener('install', event => {
+    // Telegram skripti oldindan olinadi; bo'lmasa birinchi ochilishda keshga tushadi
+    event.waitUntil(
+        caches.open(SHELL_CACHE)
+            .then(cache => cache.add(new Request(TELEGRAM_JS, { mode: 'no-cors' })))
+            .catch(() => {})
+    );
+    self.skipWaiting();
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys
+                .filter(key => key.startsWith('studyhelper-shell-') && key !== SHELL_CACHE)
+                .map(key => caches.delete(key))))
+            .then(() => self.clients.claim())
+    );
+});
+
+function shellKey(url) {
+    if (url.href === TELEGRAM_JS) return TELEGRAM_JS;
+    // So'rov qatori (?...) sahifa mazmunini o'zgartirmaydi
+    if (url.origin === self.location.origin && PAGE_RE.test(url.pathname)) return url.origin + url.pathname;
+    return null;
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+    const key = shellKey(new URL(request.url));
+    if (!key) return;
+
+    event.respondWith((async () => {
+        const cache = await caches.open(SHELL_CACHE);
+        const cached = await cache.match(key);
+        const network = fetch(request).then(response => {
+            if (response.ok || response.type === 'opaque') cache.put(key, response.clone());
+            return response;
+        });
+        if (cached) {
+            event.waitUntil(network.catch(() => {}));
+            return cached;
+        }
+        return network;
+    })());
+});
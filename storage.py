@@ -0,0 +1,234 @@
+# --- UMUMIY SAQLASH (FSM HOLATI VA KESHLAR) ---
+# Bir nechta worker yoki instansiya ishlaganda FSM holati (qidiruv, fayl
+# yuklash bosqichlari) va keshlarni bekor qilish barcha jarayonlarga
+# ko'rinishi kerak. Hammasi oddiy kalit-qiymat (KV) interfeysi ustida:
+# get / set(ttl) / delete / incr / take. Standart - SQLite (bot bazasidagi kv
+# jadvali), STORAGE_URL=redis://... bo'lsa Redis (pip install redis).
+# local:// - jarayon ichidagi Redis o'rnini bosuvchi (sinov uchun).
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder
+
+import db
+
+log = logging.getLogger(__name__)
+
+
+class SQLiteKV:
+    async def get(self, key):
+        return await db.kv_get(key)
+
+    async def set(self, key, value, ttl=None):
+        await db.kv_set(key, value, ttl)
+
+    async def delete(self, *keys):
+        await db.kv_delete(keys)
+
+    async def incr(self, key):
+        return await db.kv_incr(key)
+
+    async def take(self, key):
+        # get + delete atomik (bir martalik tokenlar uchun)
+        return await db.kv_take(key)
+
+    async def close(self):
+        # Ulanishlar db pool'iga tegishli, u alohida yopiladi
+        pass
+
+
+class RedisKV:
+    # client - redis.asyncio.Redis (decode_responses=True) yoki LocalRedis
+    def __init__(self, client):
+        self.client = client
+
+    async def get(self, key):
+        return await self.client.get(key)
+
+    async def set(self, key, value, ttl=None):
+        await self.client.set(key, value, ex=ttl)
+
+    async def delete(self, *keys):
+        if keys:
+            await self.client.delete(*keys)
+
+    async def incr(self, key):
+        return await self.client.incr(key)
+
+    async def take(self, key):
+        return await self.client.getdel(key)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class LocalRedis:
+    # redis.asyncio.Redis'ning ishlatiladigan qismi (get/set ex=/delete/incr/getdel),
+    # jarayon ichida. Faqat sinov va lokal ishga tushirish uchun: jarayonlar o'rtasida umumiy emas.
+    def __init__(self):
+        self._data = {}  # key -> (value, expires_at | None)
+
+    def _alive(self, key):
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self._data[key]
+            return None
+        return entry
+
+    async def get(self, key):
+        entry = self._alive(key)
+        return entry[0] if entry else None
+
+    async def set(self, key, value, ex=None):
+        self._data[key] = (str(value), time.monotonic() + ex if ex else None)
+        return True
+
+    async def delete(self, *keys):
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+    async def incr(self, key):
+        entry = self._alive(key)
+        value = int(entry[0]) + 1 if entry else 1
+        self._data[key] = (str(value), entry[1] if entry else None)
+        return value
+
+    async def getdel(self, key):
+        entry = self._alive(key)
+        self._data.pop(key, None)
+        return entry[0] if entry else None
+
+    async def aclose(self):
+        self._data.clear()
+
+
+def open_kv(url):
+    if not url or url == "sqlite":
+        return SQLiteKV()
+    if url.startswith("local://"):
+        return RedisKV(LocalRedis())
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("STORAGE_URL Redis uchun: pip install redis")
+        return RedisKV(redis.from_url(url, decode_responses=True))
+    raise ValueError(f"Noma'lum STORAGE_URL: {url}")
+
+
+# --- FSM ---
+
+class KVStorage(BaseStorage):
+    # aiogram FSM holati KV'da: restart yoki boshqa workerga tushgan update holatni yo'qotmaydi.
+    # ttl - tashlab ketilgan holatlar (chala yuklash) shuncha soniyadan keyin o'chadi
+    def __init__(self, kv, ttl=None, key_builder=None):
+        self.kv = kv
+        self.ttl = ttl
+        self.key_builder = key_builder or DefaultKeyBuilder(prefix="fsm")
+
+    async def set_state(self, key, state=None):
+        state = state.state if isinstance(state, State) else state
+        name = self.key_builder.build(key, "state")
+        if state is None:
+            await self.kv.delete(name)
+        else:
+            await self.kv.set(name, state, self.ttl)
+
+    async def get_state(self, key):
+        return await self.kv.get(self.key_builder.build(key, "state"))
+
+    async def set_data(self, key, data):
+        if not isinstance(data, dict):
+            raise TypeError(f"FSM data dict bo'lishi kerak, {type(data).__name__} berildi")
+        name = self.key_builder.build(key, "data")
+        if not data:
+            await self.kv.delete(name)
+        else:
+            await self.kv.set(name, json.dumps(data, ensure_ascii=False), self.ttl)
+
+    async def get_data(self, key):
+        value = await self.kv.get(self.key_builder.build(key, "data"))
+        return json.loads(value) if value else {}
+
+    async def close(self):
+        await self.kv.close()
+
+
+# --- KESHLARNI BEKOR QILISH ---
+
+class CacheInvalidator:
+    # Xotiradagi keshlar har bir jarayonda alohida qoladi (tez), lekin o'zgarish
+    # haqidagi xabar KV orqali tarqaladi: inval:seq hisoblagichi va inval:<n>
+    # yozuvlari. Har bir jarayon interval soniyada bir marta hisoblagichni o'qiydi,
+    # ya'ni boshqa workerdagi eski qiymat ko'pi bilan interval soniya yashaydi.
+    # publish() avval hisoblagichni oshiradi, keyin yozuvni yozadi: oraliqda o'qilgan
+    # yo'q yozuv grace soniya davomida qayta o'qiladi, shundan keyingina tashlab ketiladi.
+    def __init__(self, kv, interval=1.0, ttl=300, grace=5.0):
+        self.kv = kv
+        self.interval = interval
+        self.ttl = ttl
+        self.grace = grace
+        self.origin = uuid.uuid4().hex
+        self.handlers = {}
+        self.stats = {"published": 0, "applied": 0, "lost": 0}
+        self._seq = 0
+        self._gap_since = None
+        self._task = None
+
+    def on(self, kind, handler):
+        # handler(key) - sinxron, faqat shu jarayon keshini tozalaydi
+        self.handlers[kind] = handler
+
+    async def publish(self, kind, key=None):
+        # Shu jarayon keshi chaqiruvchi tomonidan allaqachon yangilangan, faqat boshqalarga xabar
+        seq = await self.kv.incr("inval:seq")
+        await self.kv.set(f"inval:{seq}", json.dumps([kind, key, self.origin]), self.ttl)
+        self.stats["published"] += 1
+
+    async def poll(self):
+        seq = int(await self.kv.get("inval:seq") or 0)
+        giving_up = False
+        for n in range(self._seq + 1, seq + 1):
+            value = await self.kv.get(f"inval:{n}")
+            if value is None:
+                # Hali yozilmagan (publish yarmida) yoki ttl o'tib o'chgan
+                if not giving_up:
+                    now = time.monotonic()
+                    if self._gap_since is None:
+                        self._gap_since = now
+                    if now - self._gap_since < self.grace:
+                        return
+                    # Ketma-ket yo'q yozuvlar birga tashlab ketiladi (har biri alohida kutilmaydi)
+                    giving_up = True
+                self.stats["lost"] += 1
+            else:
+                giving_up = False
+                kind, key, origin = json.loads(value)
+                if origin != self.origin and kind in self.handlers:
+                    self.handlers[kind](key)
+                    self.stats["applied"] += 1
+            self._seq = n
+            self._gap_since = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.poll()
+            except Exception:
+                log.exception("Kesh xabarlarini o'qishda xatolik")
+
+    async def start(self):
+        if self._task is None:
+            # Ishga tushishdan oldingi xabarlar kerak emas: kesh hali bo'sh
+            self._seq = int(await self.kv.get("inval:seq") or 0)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
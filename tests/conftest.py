@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+# Modullar repo ildizida (paket emas)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    # Repo'dagi test_bot.db ga tegmaslik uchun vaqtinchalik DATA_DIR, Telegram'siz bot (fakebot)
+    os.environ["DATA_DIR"] = str(tmp_path_factory.mktemp("data"))
+    os.environ["FAKE_TELEGRAM"] = "1"
+    os.environ.pop("BOT_TOKEN", None)
+    os.environ.pop("WEB_APP_URL", None)
+    from fastapi.testclient import TestClient
+
+    import main
+    with TestClient(main.app) as client:
+        yield main, client
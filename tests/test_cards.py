@@ -0,0 +1,53 @@
+import asyncio
+import os
+import time
+
+from cards import CardCache
+
+
+def write(path, size, age=0):
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    if age:
+        past = time.time() - age
+        os.utime(path, (past, past))
+
+
+def test_open_removes_only_stale_tmp_files(tmp_path):
+    write(tmp_path / "a.jpg.123.tmp", 10)  # boshqa jarayon hozir yozmoqda
+    write(tmp_path / "b.jpg.456.tmp", 10, age=3600)
+    write(tmp_path / "c.jpg", 100)
+    cache = CardCache(str(tmp_path), 1000)
+    cache.open()
+    assert sorted(os.listdir(tmp_path)) == ["a.jpg.123.tmp", "c.jpg"]
+    assert cache.bytes == 100
+
+
+def test_eviction_counts_files_of_other_workers(tmp_path):
+    first, second = CardCache(str(tmp_path), 2500), CardCache(str(tmp_path), 2500)
+    first.open()
+    second.open()
+    for n, age in enumerate((400, 300, 200, 100)):
+        write(tmp_path / f"{n}.jpg", 1000, age=age)  # bittasi birinchi, qolganlari ikkinchi workerdan
+    asyncio.run(first._evict())
+    # Eng eski ishlatilganlari o'chadi, umumiy hajm chegarada
+    assert sorted(os.listdir(tmp_path)) == ["2.jpg", "3.jpg"]
+    assert first.bytes == 2000 and first.stats["evicted"] == 2
+
+
+def test_rendered_card_is_shared_between_workers(tmp_path):
+    async def scenario():
+        first, second = CardCache(str(tmp_path), 10 * 1024 * 1024), CardCache(str(tmp_path), 10 * 1024 * 1024)
+        first.open()
+        second.open()
+        try:
+            name = await first.get(40, 50, "12:30", 1, "Biologiya")
+            again = await second.get(40, 50, "12:30", 1, "Biologiya")
+        finally:
+            first.stop()
+            second.stop()
+        return name, again, first.stats, second.stats
+
+    name, again, first, second = asyncio.run(scenario())
+    assert name == again and (tmp_path / name).exists()
+    assert (first["rendered"], second["rendered"], second["hits"]) == (1, 0, 1)
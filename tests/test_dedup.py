@@ -0,0 +1,59 @@
+import pytest
+
+from dedup import content_hash, normalize
+
+
+@pytest.mark.parametrize("a, b", [
+    ("2x + 3 = 7 bo'lsa, x nechiga teng?", "2x - 3 = 7 bo'lsa, x nechiga teng?"),
+    ("i++ operatori nima qiladi?", "i-- operatori nima qiladi?"),
+    ("a > b shartini tanlang", "a < b shartini tanlang"),
+    ("10% ni toping", "10 ni toping"),
+])
+def test_operators_are_not_exact_duplicates(a, b):
+    assert normalize(a) == normalize(b)  # MinHash uchun o'xshash bo'lib qoladi
+    assert content_hash(a, "A") != content_hash(b, "A")
+
+
+def test_lossless_differences_are_duplicates():
+    assert content_hash("Oʻzbekiston  poytaxti?\nA) Toshkent", "a") == \
+        content_hash("o'zbekiston poytaxti? a) toshkent", "A) Toshkent")
+    assert content_hash("Savol?", "A") != content_hash("Savol?", "B")
+
+
+def near_duplicate_base(main, client, word):
+    from parsing import make_test
+
+    tests = [make_test(f"2x {op} 3 = 7 bo'lsa, x {word} teng?", {"A": "2", "B": "5", "C": "0", "D": "1"}, ans)
+             for op, ans in (("+", "A"), ("-", "B"))]
+    base_id, count, stats = client.portal.call(main.db.create_base, "Algebra", 1, 1, iter(tests))
+    assert count == 2
+    return base_id, stats
+
+
+def test_search_returns_every_near_duplicate(app):
+    main, client = app
+    _, stats = near_duplicate_base(main, client, "nechiga")
+    assert stats["near_duplicates"] == 1
+    rows, has_prev, has_next = client.portal.call(main.db.search_questions, "nechiga", 10)
+    assert sorted(r[3] for r in rows) == ["A", "B"]
+    assert (has_prev, has_next) == (False, False)
+    # Bitta natijali sahifalar: ikkinchisi keyingi sahifada, takrorlanmaydi
+    first, _, has_next = client.portal.call(main.db.search_questions, "nechiga", 1)
+    second, has_prev, more = client.portal.call(main.db.search_questions, "nechiga", 1, None, first[-1][4:6])
+    assert has_next and has_prev and not more
+    assert {first[0][3], second[0][3]} == {"A", "B"}
+
+
+def test_base_search_returns_every_near_duplicate(app):
+    main, client = app
+    base_id, stats = near_duplicate_base(main, client, "qanchaga")
+    assert stats["near_duplicates"] == 1
+    # Xuddi shu savollar boshqa bazada ham (matnlar umumiy)
+    other_id, stats = near_duplicate_base(main, client, "qanchaga")
+    assert stats["duplicates"] == 2
+    rows, has_prev, has_next = client.portal.call(main.db.search_questions, "qanchaga", 10, base_id)
+    assert sorted(r[3] for r in rows) == ["A", "B"]
+    assert (has_prev, has_next) == (False, False)
+    # Matni umumiy bo'lsa ham savol id si shu bazaniki
+    ids = client.portal.call(main.db.search_questions, "qanchaga", 10, other_id)[0]
+    assert {r[0] for r in rows}.isdisjoint(r[0] for r in ids)
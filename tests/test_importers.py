@@ -0,0 +1,23 @@
+import io
+import json
+
+from importers import answer_letter_of, parse_json
+from parsing import ImportReport
+
+
+def test_numeric_answers_are_one_based():
+    assert answer_letter_of(2, {}) == answer_letter_of("2", {}) == "B"
+    assert answer_letter_of(1, {}) == answer_letter_of("1", {}) == "A"
+    assert answer_letter_of(0, {}) is None
+    assert answer_letter_of("0", {}) is None
+
+
+def test_zero_answer_is_reported():
+    data = {"questions": [
+        {"question": "Poytaxt?", "options": ["Toshkent", "Samarqand"], "answer": 1},
+        {"question": "Daryo?", "options": ["Amudaryo", "Sirdaryo"], "answer": 0},
+    ]}
+    report = ImportReport()
+    tests = list(parse_json(io.BytesIO(json.dumps(data).encode()), report))
+    assert [t["ans"] for t in tests] == ["A"]
+    assert report.errors == [("2-element", "javob aniqlanmadi: 0")]
@@ -0,0 +1,56 @@
+import asyncio
+
+from aiogram import Bot
+from aiogram.methods import SendMessage
+from aiogram.types import InlineKeyboardButton
+
+from fakebot import FAKE_TOKEN, FakeSession
+from notify import DIGEST_MAX_LINES, Notifier
+
+
+def run_digest(events, wait):
+    async def scenario():
+        session = FakeSession(log=False)
+        notifier = Notifier(Bot(FAKE_TOKEN, session=session), per_chat_interval=0, digest_window=0.1)
+        notifier.start()
+        for user_id in events:
+            buttons = [InlineKeyboardButton(text=f"✅ {user_id}", callback_data=f"approve_{user_id}"),
+                       InlineKeyboardButton(text=f"🚫 {user_id}", callback_data=f"block_{user_id}")]
+            notifier.send_digest(99, "new_user", line=f"• {user_id}", text=f"Yangi: {user_id}", title="Yangilar",
+                                 buttons=buttons)
+        await asyncio.sleep(wait)
+        await notifier.stop()
+        return session.sent(SendMessage), notifier.stats
+
+    return asyncio.run(scenario())
+
+
+def test_digest_batches_notifications_in_window():
+    sent, stats = run_digest([1, 2, 3], 0.3)
+    # Birinchisi darhol, qolganlari oyna tugagach bitta xabarda
+    assert [m.text for m in sent] == ["Yangi: 1", "Yangilar (2)\n\n• 2\n• 3"]
+    assert all(m.chat_id == 99 for m in sent)
+    assert stats["digested"] == 2
+
+
+def test_single_notification_is_not_digested():
+    sent, stats = run_digest([1], 0.3)
+    assert [m.text for m in sent] == ["Yangi: 1"]
+    assert stats["digested"] == 0
+
+
+def test_digest_keeps_buttons_per_user():
+    sent, _ = run_digest([1, 2, 3], 0.3)
+    digest = sent[1]
+    assert [[b.callback_data for b in row] for row in digest.reply_markup.inline_keyboard] == [
+        ["approve_2", "block_2"], ["approve_3", "block_3"]]
+
+
+def test_long_digest_is_split_within_keyboard_limits():
+    count = DIGEST_MAX_LINES + 5
+    sent, stats = run_digest(range(count + 1), 0.5)
+    digests = sent[1:]
+    assert [len(m.reply_markup.inline_keyboard) for m in digests] == [DIGEST_MAX_LINES, 5]
+    assert all(sum(len(row) for row in m.reply_markup.inline_keyboard) <= 100 for m in digests)
+    assert digests[1].reply_markup.inline_keyboard[0][0].callback_data == f"approve_{DIGEST_MAX_LINES + 1}"
+    assert stats["digested"] == count
@@ -0,0 +1,26 @@
+from parsing import iter_tests, split_question
+
+
+def test_initials_in_stem_are_not_options():
+    stem, options = split_question("Roman muallifi A. Qodiriy, B. Navoiy emas. Kim?\nA) x\nB) y\nC) z\nD) w")
+    assert stem == "Roman muallifi A. Qodiriy, B. Navoiy emas. Kim?"
+    assert options == {"A": "x", "B": "y", "C": "z", "D": "w"}
+
+
+def test_initials_with_inline_options():
+    stem, options = split_question("Muallif A. Qodiriy va B. Navoiy asari? A) O'tkan kunlar B) Xamsa C) Boburnoma")
+    assert stem == "Muallif A. Qodiriy va B. Navoiy asari?"
+    assert options == {"A": "O'tkan kunlar", "B": "Xamsa", "C": "Boburnoma", "D": ""}
+
+
+def test_inline_options():
+    stem, options = split_question("1. Poytaxt? A) Toshkent B) Samarqand C) Buxoro D) Xiva")
+    assert stem == "1. Poytaxt?"
+    assert options == {"A": "Toshkent", "B": "Samarqand", "C": "Buxoro", "D": "Xiva"}
+
+
+def test_iter_tests_keeps_initials_in_stem():
+    lines = ["1. Roman muallifi A. Qodiriy, B. Navoiy emas. Kim?", "A) x", "B) y", "ANSWER: B"]
+    [test] = iter_tests(iter(lines))
+    assert test["stem"] == "1. Roman muallifi A. Qodiriy, B. Navoiy emas. Kim?"
+    assert test["ans"] == "B"
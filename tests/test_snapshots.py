@@ -0,0 +1,17 @@
+from snapshots import decode, encode
+
+
+def test_round_trip():
+    questions = [
+        {"id": 5, "question": "Savol?", "options": {"A": "bir", "B": "ikki"}, "ans": "B"},
+        {"id": 3, "question": "Ўзбек “matn” 😀", "options": {"A": "x", "C": "z"}, "ans": "C"},
+    ]
+    assert decode(encode(questions)) == questions
+
+
+def test_decorated_answers_are_normalized():
+    options = {"A": "a", "B": "b", "C": "c", "D": "d"}
+    answers = {"b": "B", "B) b": "B", " A": "A", "C - matn": "C", "d.": "D", "": "", "Z": ""}
+    questions = [{"id": i, "question": "Q", "options": options, "ans": raw}
+                 for i, raw in enumerate(answers, 1)]
+    assert [q["ans"] for q in decode(encode(questions))] == list(answers.values())
@@ -0,0 +1,96 @@
+import asyncio
+
+from aiogram.fsm.storage.base import StorageKey
+
+from storage import CacheInvalidator, KVStorage, LocalRedis, RedisKV
+
+KEY = StorageKey(bot_id=1, chat_id=42, user_id=42)
+
+
+def test_fsm_state_and_data_in_local_redis():
+    async def scenario():
+        storage = KVStorage(RedisKV(LocalRedis()), ttl=60)
+        await storage.set_state(KEY, "Upload:file")
+        await storage.set_data(KEY, {"name": "Fan", "count": 3})
+        saved = await storage.get_state(KEY), await storage.get_data(KEY)
+        await storage.set_state(KEY, None)
+        await storage.set_data(KEY, {})
+        cleared = await storage.get_state(KEY), await storage.get_data(KEY)
+        return saved, cleared
+
+    saved, cleared = asyncio.run(scenario())
+    assert saved == ("Upload:file", {"name": "Fan", "count": 3})
+    assert cleared == (None, {})
+
+
+def test_fsm_state_expires():
+    async def scenario():
+        storage = KVStorage(RedisKV(LocalRedis()), ttl=0.05)
+        await storage.set_state(KEY, "Upload:file")
+        await asyncio.sleep(0.1)
+        return await storage.get_state(KEY)
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_invalidation_skips_own_messages():
+    async def scenario():
+        kv = RedisKV(LocalRedis())
+        sender, receiver = CacheInvalidator(kv), CacheInvalidator(kv)
+        seen = {"sender": [], "receiver": []}
+        sender.on("base", seen["sender"].append)
+        receiver.on("base", seen["receiver"].append)
+        await sender.publish("base", 5)
+        await sender.publish("base", 6)
+        await sender.poll()
+        await receiver.poll()
+        await receiver.poll()  # bir xabar ikki marta qo'llanmaydi
+        return seen, receiver.stats
+
+    seen, stats = asyncio.run(scenario())
+    assert seen == {"sender": [], "receiver": [5, 6]}
+    assert stats["applied"] == 2
+
+
+def test_poll_between_incr_and_set_is_not_lost():
+    async def scenario():
+        kv = RedisKV(LocalRedis())
+        sender, receiver = CacheInvalidator(kv), CacheInvalidator(kv)
+        delivered = []
+        receiver.on("users", delivered.append)
+        await receiver.start()
+        await receiver.stop()
+
+        # publish(): incr va set orasida boshqa jarayon poll qiladi
+        original_set = kv.set
+
+        async def interleaved_set(key, value, ttl=None):
+            if key.startswith("inval:") and key != "inval:seq":
+                await receiver.poll()
+            await original_set(key, value, ttl)
+
+        kv.set = interleaved_set
+        await sender.publish("users", 42)
+        assert delivered == []
+        await receiver.poll()
+        return delivered, receiver
+
+    delivered, receiver = asyncio.run(scenario())
+    assert delivered == [42]
+    assert receiver.stats["lost"] == 0
+
+
+def test_missing_entry_is_skipped_after_grace():
+    async def scenario():
+        kv = RedisKV(LocalRedis())
+        sender, receiver = CacheInvalidator(kv), CacheInvalidator(kv, grace=0)
+        delivered = []
+        receiver.on("users", delivered.append)
+        await kv.incr("inval:seq")  # yozuvi hech qachon yozilmagan
+        await sender.publish("users", 7)
+        await receiver.poll()
+        return delivered, receiver
+
+    delivered, receiver = asyncio.run(scenario())
+    assert delivered == [7]
+    assert receiver.stats["lost"] == 1
@@ -0,0 +1,144 @@
+import hashlib
+import hmac
+import json
+import sqlite3
+import time
+import urllib.parse
+
+import pytest
+
+
+def init_data(main, user_id):
+    data = {"auth_date": str(int(time.time())), "user": json.dumps({"id": user_id, "first_name": "Test"})}
+    check = "\n".join(f"{k}={v}" for k, v in sorted(data.items()))
+    secret = hmac.new(b"WebAppData", main.bot.token.encode(), hashlib.sha256).digest()
+    data["hash"] = hmac.new(secret, check.encode(), hashlib.sha256).hexdigest()
+    return urllib.parse.urlencode(data)
+
+
+def make_base(main, client, count=60):
+    def tests():
+        for i in range(count):
+            options = {L: f"{L.lower()} {i}" for L in "ABCD"}
+            yield {"q": f"Savol {i}?", "full": f"Savol {i}?\n" + "\n".join(f"{L}) {v}" for L, v in options.items()),
+                   "ans": "B", "stem": f"Savol {i}?", "options": options}
+    base_id, _, _ = client.portal.call(main.db.create_base, "Fan", 1, 1, tests())
+    return base_id
+
+
+def test_exam_token_scores_once(app):
+    main, client = app
+    base_id = make_base(main, client)
+    user = init_data(main, 1001)
+    start = client.post("/exam-start", json={"init_data": user, "base_id": base_id}).json()
+    questions = client.get(f"/get-tests?base_id={base_id}&mode=exam&token={start['token']}").json()
+    submission = {"init_data": user, "base_id": base_id, "token": start["token"],
+                  "answers": {q["id"]: "A" for q in questions}}
+
+    first = client.post("/submit-exam", json=submission)
+    assert first.status_code == 200
+    assert first.json()["correct"] == 0
+    # Javoblarni ko'rgandan keyin qayta topshirilsa - birinchi natija, qayta baholanmaydi
+    retry = client.post("/submit-exam", json={**submission, "answers": {q["id"]: "B" for q in questions}})
+    assert retry.status_code == 200
+    assert retry.json() == first.json()
+    assert client.post("/submit-exam", json={**submission, "token": "nomalum"}).status_code == 409
+
+    other = client.post("/exam-start", json={"init_data": user, "base_id": base_id}).json()
+    stolen = {**submission, "init_data": init_data(main, 1002), "token": other["token"]}
+    assert client.post("/submit-exam", json=stolen).status_code == 409
+    assert client.post("/exam-start", json={"init_data": "", "base_id": base_id}).status_code == 401
+
+
+def test_failed_submission_keeps_token(app, monkeypatch):
+    main, client = app
+    base_id = make_base(main, client)
+    user = init_data(main, 1201)
+    token = client.post("/exam-start", json={"init_data": user, "base_id": base_id}).json()["token"]
+    submission = {"init_data": user, "base_id": base_id, "token": token, "answers": {}}
+
+    async def broken(attempt):
+        raise RuntimeError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(main.attempt_writer, "add", broken)
+        with pytest.raises(RuntimeError):
+            client.post("/submit-exam", json=submission)
+    # Natija yozilmadi - token yaroqli, qayta urinish o'tadi
+    retry = client.post("/submit-exam", json=submission)
+    assert retry.status_code == 200
+    assert retry.json()["attempt_id"]
+
+
+def test_attempts_cursor_uses_clamped_limit(app):
+    main, client = app
+    base_id = make_base(main, client, 10)
+    user = init_data(main, 2001)
+    for _ in range(101):
+        start = client.post("/exam-start", json={"init_data": user, "base_id": base_id}).json()
+        client.post("/submit-exam", json={"init_data": user, "base_id": base_id, "token": start["token"]})
+    page = client.get("/attempts?limit=500", headers={"X-Telegram-Init-Data": user}).json()
+    assert len(page["items"]) == 100
+    assert page["next_before_id"] == page["items"][-1]["id"]
+
+
+def test_legacy_share_tokens_are_rejected(app):
+    from aiogram.types import User
+
+    main, client = app
+    user = User(id=3001, is_bot=False, first_name="Test")
+    assert client.portal.call(main.resolve_share, "res_50_50_01:00_1", user) is None
+
+
+def test_stats_require_init_data(app):
+    main, client = app
+    base_id = make_base(main, client, 10)
+    assert client.get(f"/stats/{base_id}").status_code == 401
+    assert client.get(f"/stats/{base_id}", headers={"X-Telegram-Init-Data": "user=1&hash=0"}).status_code == 401
+    stats = client.get(f"/stats/{base_id}", headers={"X-Telegram-Init-Data": init_data(main, 4001)})
+    assert stats.status_code == 200
+    assert stats.json()["name"] == "Fan"
+
+
+def test_exam_questions_need_token(app):
+    main, client = app
+    base_id = make_base(main, client)
+    user = init_data(main, 1101)
+    start = client.post("/exam-start", json={"init_data": user, "base_id": base_id}).json()
+    # Seed brauzerga berilmaydi; savollar faqat token bo'yicha, javoblarsiz
+    assert set(start) == {"token"}
+    url = f"/get-tests?base_id={base_id}&mode=exam"
+    questions = client.get(f"{url}&token={start['token']}").json()
+    assert len(questions) == main.EXAM_SIZE and all("ans" not in q for q in questions)
+    assert client.get(f"{url}&token={start['token']}").json() == questions
+    assert client.get(url).status_code == 409
+    assert client.get(f"{url}&token=nomalum").status_code == 409
+    assert client.get(f"/get-tests?base_id={make_base(main, client)}&mode=exam&token={start['token']}").status_code == 409
+
+
+def test_base_hidden_until_upload_finishes(app):
+    main, client = app
+    created, seen = {}, {}
+
+    def tests():
+        for i in range(main.db.INSERT_BATCH + 10):
+            if i == main.db.INSERT_BATCH + 5:
+                # Birinchi partiya yozilgan, lekin baza hali ro'yxatda ham, qidiruvda ham yo'q
+                with sqlite3.connect(main.DB_PATH) as conn:
+                    seen["names"] = [r[0] for r in main.db.list_bases.sync(conn)]
+                    seen["name"] = main.db.get_base_name.sync(conn, created["base_id"])
+                    seen["found"] = main.db.search_questions.sync(conn, "Yashirin")[0]
+                raise RuntimeError("fayl uzildi")
+            yield {"q": f"Yashirin {i}?", "full": f"Yashirin {i}?\nA) a\nB) b", "ans": "A",
+                   "stem": f"Yashirin {i}?", "options": {"A": "a", "B": "b"}}
+
+    with pytest.raises(RuntimeError):
+        client.portal.call(lambda: main.db.create_base("Chala", 1, 0, tests(),
+                                                       on_created=lambda b: created.update(base_id=b)))
+    assert "Chala" not in seen["names"]
+    assert seen["name"] is None
+    assert seen["found"] == []
+    # Xato bo'lsa baza savollari bilan birga o'chiriladi
+    with sqlite3.connect(main.DB_PATH) as conn:
+        assert conn.execute("SELECT count(*) FROM test_bases WHERE id = ?", (created["base_id"],)).fetchone()[0] == 0
+        assert conn.execute("SELECT count(*) FROM questions WHERE base_id = ?", (created["base_id"],)).fetchone()[0] == 0
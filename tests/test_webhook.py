@@ -0,0 +1,40 @@
+import asyncio
+import os
+import sys
+
+from aiogram.methods import SendMessage
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+from fake_update import default_secret, make_callback_update, make_message_update  # noqa: E402
+
+
+def drain(main, client):
+    # Webhook 200 ni darhol qaytaradi, update fonda ishlanadi
+    async def wait():
+        await asyncio.gather(*main._webhook_tasks)
+    client.portal.call(wait)
+
+
+def replies(main, user_id):
+    return [m for m in main.bot.session.sent(SendMessage) if m.chat_id == user_id]
+
+
+def test_webhook_rejects_wrong_secret(app):
+    main, client = app
+    for headers in ({}, {"X-Telegram-Bot-Api-Secret-Token": "notogri"}):
+        resp = client.post("/webhook", json=make_message_update(5001, "/start"), headers=headers)
+        assert resp.status_code == 403
+        resp = client.post("/webhook", json=make_callback_update(5001, "user_list"), headers=headers)
+        assert resp.status_code == 403
+    drain(main, client)
+    assert replies(main, 5001) == []
+
+
+def test_webhook_feeds_update_with_secret(app):
+    main, client = app
+    headers = {"X-Telegram-Bot-Api-Secret-Token": default_secret()}
+    resp = client.post("/webhook", json=make_message_update(5002, "/start"), headers=headers)
+    assert resp.status_code == 200
+    drain(main, client)
+    assert replies(main, 5002)
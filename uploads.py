@@ -0,0 +1,106 @@
+# --- FAYL YUKLASH NAVBATI ---
+# Ko'p foydalanuvchi bir vaqtda fayl yuborganda hammasi birdan xotiraga
+# yuklanmaydi: bir vaqtda faqat max_active ta fayl yuklab olinadi va
+# tahlil qilinadi, qolganlari kelish tartibida navbat kutadi (har bir
+# foydalanuvchidan bittadan). Fayl bo'laklab vaqtinchalik faylga yoziladi,
+# hajmi chegaradan oshsa yuklash to'xtatiladi.
+
+import asyncio
+import logging
+import shutil
+from collections import deque
+from contextlib import asynccontextmanager
+
+from parsing import CHUNK_SIZE
+
+log = logging.getLogger(__name__)
+
+
+class UploadError(Exception):
+    # Foydalanuvchiga ko'rsatiladigan xabar
+    pass
+
+
+class UploadQueue:
+    def __init__(self, max_active=2, max_waiting=100):
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self._active = 0
+        self._waiting = deque()
+        self._users = set()
+        self.stats = {"accepted": 0, "rejected": 0, "waited": 0}
+
+    def pending(self):
+        return len(self._waiting)
+
+    def active(self):
+        return self._active
+
+    def _release(self):
+        # Bo'shagan joy navbatdagi birinchi kutayotganga o'tadi (active kamaymaydi)
+        while self._waiting:
+            waiter = self._waiting.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, user_id, on_wait=None):
+        # on_wait(o'rin) - navbatga tushganda bir marta chaqiriladi (xabar chiqarish uchun)
+        if user_id in self._users:
+            self.stats["rejected"] += 1
+            raise UploadError("Oldingi faylingiz hali ishlanmoqda, tugashini kuting.")
+        if len(self._waiting) >= self.max_waiting:
+            self.stats["rejected"] += 1
+            raise UploadError("Hozir yuklashlar juda ko'p, birozdan keyin qayta yuboring.")
+        self._users.add(user_id)
+        self.stats["accepted"] += 1
+        try:
+            if self._active < self.max_active and not self._waiting:
+                self._active += 1
+            else:
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiting.append(waiter)
+                self.stats["waited"] += 1
+                if on_wait:
+                    try:
+                        await on_wait(len(self._waiting))
+                    except Exception:
+                        log.debug("Navbat xabarini yuborib bo'lmadi", exc_info=True)
+                try:
+                    await waiter
+                except asyncio.CancelledError:
+                    # Joy berilgan bo'lsa keyingisiga o'tkaziladi, aks holda navbatdan chiqamiz
+                    if waiter.done() and not waiter.cancelled():
+                        self._release()
+                    else:
+                        self._waiting.remove(waiter)
+                    raise
+            try:
+                yield
+            finally:
+                self._release()
+        finally:
+            self._users.discard(user_id)
+
+
+async def download_to(bot, file_id, dest, max_bytes, chunk_size=CHUNK_SIZE):
+    # Telegram faylini dest (ochiq binary fayl) ga bo'laklab yozadi; yozilgan baytlar soni qaytadi
+    file = await bot.get_file(file_id)
+    if file.file_size and file.file_size > max_bytes:
+        raise UploadError(f"Fayl juda katta (ko'pi bilan {max_bytes // (1024 * 1024)} MB).")
+    if bot.session.api.is_local:
+        # Lokal Bot API server: fayl shu diskda
+        with open(file.file_path, "rb") as src:
+            await asyncio.to_thread(shutil.copyfileobj, src, dest, chunk_size)
+        return dest.tell()
+    url = bot.session.api.file_url(bot.token, file.file_path)
+    size = 0
+    async for chunk in bot.session.stream_content(url=url, timeout=60, chunk_size=chunk_size,
+                                                  raise_for_status=True):
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadError(f"Fayl juda katta (ko'pi bilan {max_bytes // (1024 * 1024)} MB).")
+        dest.write(chunk)
+    return size